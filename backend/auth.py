@@ -1,19 +1,31 @@
 from datetime import datetime, timedelta
-from typing import Optional, Union
+from typing import List, Optional, Union
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from jose import JWTError, jwt
 from passlib.context import CryptContext
+from sqlalchemy import delete, event, or_, select, update
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from pydantic import BaseModel
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
 import bcrypt
+import hashlib
+import hmac
 import os
-from database import get_db, User
+import secrets
+import time
+import uuid
+from database import get_async_db, AsyncSessionLocal, RefreshToken, User
+from cache import TTLCache
 
 # Configuration
 SECRET_KEY = os.getenv("SECRET_KEY", "your-secret-key-here-change-in-production")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
+REFRESH_TOKEN_EXPIRE_DAYS = int(os.getenv("REFRESH_TOKEN_EXPIRE_DAYS", "30"))
 
 # Password hashing
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
@@ -21,6 +33,26 @@ pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 # Security
 security = HTTPBearer()
 
+# Authenticated principals by access token. Entries never outlive their token,
+# and a per-user version number lets updates invalidate every cached token of
+# that user at once.
+PRINCIPAL_CACHE_TTL_SECONDS = float(os.getenv("PRINCIPAL_CACHE_TTL_SECONDS", "300"))
+principal_cache = TTLCache(
+    max_size=int(os.getenv("PRINCIPAL_CACHE_SIZE", "10000")),
+    ttl=PRINCIPAL_CACHE_TTL_SECONDS
+)
+_principal_versions = {}
+
+def invalidate_principal(user_id: int) -> None:
+    """Drop cached principals for a user, e.g. after an update or deactivation"""
+    _principal_versions[user_id] = _principal_versions.get(user_id, 0) + 1
+
+def _on_user_changed(mapper, connection, target: User) -> None:
+    invalidate_principal(target.id)
+
+event.listen(User, "after_update", _on_user_changed)
+event.listen(User, "after_delete", _on_user_changed)
+
 # Pydantic models for authentication
 class UserCreate(BaseModel):
     email: str
@@ -48,9 +80,14 @@ class Token(BaseModel):
     access_token: str
     token_type: str
     user: UserResponse
+    refresh_token: Optional[str] = None
+
+class RefreshRequest(BaseModel):
+    refresh_token: str
 
 class TokenData(BaseModel):
     email: Optional[str] = None
+    user_id: Optional[int] = None
 
 # Utility functions
 def verify_password(plain_password: str, hashed_password: str) -> bool:
@@ -61,6 +98,87 @@ def get_password_hash(password: str) -> str:
     """Generate password hash"""
     return pwd_context.hash(password)
 
+class PasswordHasher:
+    """Runs bcrypt on a bounded worker pool instead of the event loop.
+
+    bcrypt releases the GIL while hashing, so a thread pool sized to the CPU
+    count hashes in parallel. When more than `max_queue` calls are already
+    waiting for a worker, new calls fail fast with 503 and Retry-After rather
+    than piling up.
+    """
+
+    def __init__(self, workers: int, max_queue: int, retry_after: int = 1):
+        self.workers = workers
+        self.max_queue = max_queue
+        self.retry_after = retry_after
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="bcrypt")
+        self._in_flight = 0
+        self.calls = 0
+        self.rejected = 0
+        self.total_hash_seconds = 0.0
+        self.max_hash_seconds = 0.0
+        self.total_wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+
+    async def hash(self, password: str) -> str:
+        return await self._run(get_password_hash, password)
+
+    async def verify(self, plain_password: str, hashed_password: str) -> bool:
+        return await self._run(verify_password, plain_password, hashed_password)
+
+    def admit(self) -> None:
+        """Raise 503 if the queue is full; lets callers shed load before any DB work"""
+        if self._in_flight >= self.workers + self.max_queue:
+            self.rejected += 1
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Server is busy, please try again shortly",
+                headers={"Retry-After": str(self.retry_after)},
+            )
+
+    async def _run(self, func, *args):
+        self.admit()
+
+        submitted = time.perf_counter()
+
+        def timed():
+            started = time.perf_counter()
+            result = func(*args)
+            return result, started - submitted, time.perf_counter() - started
+
+        self._in_flight += 1
+        try:
+            loop = asyncio.get_running_loop()
+            result, wait, duration = await loop.run_in_executor(self._executor, timed)
+        finally:
+            self._in_flight -= 1
+
+        self.calls += 1
+        self.total_wait_seconds += wait
+        self.max_wait_seconds = max(self.max_wait_seconds, wait)
+        self.total_hash_seconds += duration
+        self.max_hash_seconds = max(self.max_hash_seconds, duration)
+        return result
+
+    def stats(self) -> dict:
+        return {
+            "workers": self.workers,
+            "max_queue": self.max_queue,
+            "in_flight": self._in_flight,
+            "queued": max(0, self._in_flight - self.workers),
+            "calls": self.calls,
+            "rejected": self.rejected,
+            "avg_hash_ms": round(1000 * self.total_hash_seconds / self.calls, 2) if self.calls else 0.0,
+            "max_hash_ms": round(1000 * self.max_hash_seconds, 2),
+            "avg_queue_wait_ms": round(1000 * self.total_wait_seconds / self.calls, 2) if self.calls else 0.0,
+            "max_queue_wait_ms": round(1000 * self.max_wait_seconds, 2)
+        }
+
+password_hasher = PasswordHasher(
+    workers=int(os.getenv("PASSWORD_HASH_WORKERS", str(os.cpu_count() or 1))),
+    max_queue=int(os.getenv("PASSWORD_HASH_MAX_QUEUE", "32"))
+)
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     """Create JWT access token"""
     to_encode = data.copy()
@@ -72,6 +190,116 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
+def _hash_refresh_token(token: str) -> str:
+    """Keyed SHA-256 of a refresh token; tokens are random, so bcrypt buys nothing"""
+    return hmac.new(SECRET_KEY.encode(), token.encode(), hashlib.sha256).hexdigest()
+
+async def issue_refresh_token_async(
+    db: AsyncSession,
+    user_id: int,
+    family_id: Optional[str] = None
+) -> str:
+    """Create and store a new refresh token, returning the raw token"""
+    token = secrets.token_urlsafe(32)
+    db.add(RefreshToken(
+        user_id=user_id,
+        token_hash=_hash_refresh_token(token),
+        family_id=family_id or str(uuid.uuid4()),
+        expires_at=datetime.utcnow() + timedelta(days=REFRESH_TOKEN_EXPIRE_DAYS)
+    ))
+    await db.commit()
+    return token
+
+async def rotate_refresh_token_async(db: AsyncSession, token: str) -> tuple:
+    """Exchange a refresh token for a new one, returning (user, new_token).
+
+    Each token works once. Presenting an already used token means it leaked,
+    so the whole token family is revoked.
+    """
+    invalid = HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="Invalid refresh token",
+        headers={"WWW-Authenticate": "Bearer"},
+    )
+    result = await db.execute(
+        select(RefreshToken).where(RefreshToken.token_hash == _hash_refresh_token(token))
+    )
+    stored = result.scalars().first()
+    if stored is None:
+        raise invalid
+
+    now = datetime.utcnow()
+    # Conditional update so two concurrent refreshes cannot both succeed
+    claimed = await db.execute(
+        update(RefreshToken).where(
+            RefreshToken.id == stored.id,
+            RefreshToken.revoked_at.is_(None)
+        ).values(revoked_at=now)
+    )
+    if claimed.rowcount != 1:
+        await revoke_refresh_family_async(db, stored.family_id)
+        raise invalid
+    if stored.expires_at < now:
+        await db.commit()
+        raise invalid
+
+    user = await get_user_by_id_async(db, stored.user_id)
+    if user is None or not user.is_active:
+        await db.commit()
+        raise invalid
+
+    new_token = await issue_refresh_token_async(db, user.id, family_id=stored.family_id)
+    return user, new_token
+
+async def revoke_refresh_family_async(db: AsyncSession, family_id: str) -> None:
+    """Revoke every token descended from one login"""
+    await db.execute(
+        update(RefreshToken).where(
+            RefreshToken.family_id == family_id,
+            RefreshToken.revoked_at.is_(None)
+        ).values(revoked_at=datetime.utcnow())
+    )
+    await db.commit()
+
+async def revoke_refresh_token_async(db: AsyncSession, token: str) -> None:
+    """Log out: revoke the presented token and its whole family"""
+    result = await db.execute(
+        select(RefreshToken.family_id).where(RefreshToken.token_hash == _hash_refresh_token(token))
+    )
+    family_id = result.scalars().first()
+    if family_id is not None:
+        await revoke_refresh_family_async(db, family_id)
+
+async def purge_refresh_tokens_async(db: AsyncSession) -> int:
+    """Delete expired tokens and families with no usable token left.
+
+    Revoked tokens of a family that still has a live token are kept, since
+    presenting one of them is how reuse is detected. Returns rows deleted.
+    """
+    now = datetime.utcnow()
+    live_families = select(RefreshToken.family_id).where(
+        RefreshToken.revoked_at.is_(None),
+        RefreshToken.expires_at >= now
+    )
+    result = await db.execute(
+        delete(RefreshToken).where(or_(
+            RefreshToken.expires_at < now,
+            RefreshToken.family_id.not_in(live_families)
+        ))
+    )
+    await db.commit()
+    return result.rowcount
+
+async def run_refresh_token_purges(interval: float) -> None:
+    """Purge dead refresh tokens now and every `interval` seconds until cancelled"""
+    while True:
+        try:
+            async with AsyncSessionLocal() as db:
+                await purge_refresh_tokens_async(db)
+        except Exception as e:
+            print(f"Refresh token purge error: {e}")
+        await asyncio.sleep(interval)
+
 def get_user_by_email(db: Session, email: str) -> Optional[User]:
     """Get user by email"""
     return db.query(User).filter(User.email == email).first()
@@ -84,6 +312,20 @@ def get_user_by_id(db: Session, user_id: int) -> Optional[User]:
     """Get user by ID"""
     return db.query(User).filter(User.id == user_id).first()
 
+async def get_user_by_email_async(db: AsyncSession, email: str) -> Optional[User]:
+    """Get user by email"""
+    result = await db.execute(select(User).where(User.email == email))
+    return result.scalars().first()
+
+async def get_user_by_username_async(db: AsyncSession, username: str) -> Optional[User]:
+    """Get user by username"""
+    result = await db.execute(select(User).where(User.username == username))
+    return result.scalars().first()
+
+async def get_user_by_id_async(db: AsyncSession, user_id: int) -> Optional[User]:
+    """Get user by ID"""
+    return await db.get(User, user_id)
+
 def authenticate_user(db: Session, email: str, password: str) -> Union[User, bool]:
     """Authenticate user with email and password"""
     user = get_user_by_email(db, email)
@@ -93,6 +335,55 @@ def authenticate_user(db: Session, email: str, password: str) -> Union[User, boo
         return False
     return user
 
+async def authenticate_user_async(db: AsyncSession, email: str, password: str) -> Union[User, bool]:
+    """Authenticate user with email and password"""
+    password_hasher.admit()
+    user = await get_user_by_email_async(db, email)
+    # End the read transaction so the pooled connection is not held while
+    # waiting for a bcrypt worker; otherwise the pool, not the hasher, limits
+    # concurrent logins and overload surfaces as pool timeouts instead of 503
+    await db.commit()
+    if not user:
+        return False
+    if not await password_hasher.verify(password, user.hashed_password):
+        return False
+    return user
+
+# How often signup retries when a concurrent signup takes the same username
+USERNAME_ALLOCATION_ATTEMPTS = 5
+
+def _usernames_with_prefix_query(base: str):
+    """All usernames starting with base, as an index range scan.
+
+    A range on the unique username index instead of LIKE, which SQLite
+    matches case-insensitively and cannot serve from that index.
+    """
+    return select(User.username).where(
+        User.username >= base,
+        User.username < base + "\U0010ffff"
+    )
+
+def _pick_username(base: str, taken: List[str]) -> str:
+    """base if free, else base followed by the smallest unused number from 1"""
+    taken = set(taken)
+    if base not in taken:
+        return base
+    used = set()
+    for name in taken:
+        suffix = name[len(base):]
+        if suffix.isdigit() and not suffix.startswith("0"):
+            used.add(int(suffix))
+    counter = 1
+    while counter in used:
+        counter += 1
+    return f"{base}{counter}"
+
+def _username_conflict() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_409_CONFLICT,
+        detail="Could not allocate a username, please try again"
+    )
+
 def create_user(db: Session, user: UserCreate) -> User:
     """Create new user"""
     # Check if user already exists
@@ -109,39 +400,86 @@ def create_user(db: Session, user: UserCreate) -> User:
             detail="Passwords do not match"
         )
     
-    # Create username from email (taking part before @)
-    username = user.email.split('@')[0]
+    # Create username from email (taking part before @), appending a number
+    # if it is taken
+    base = user.email.split('@')[0]
+    hashed_password = get_password_hash(user.password)
     
-    # Check if this generated username already exists, if so, append a number
-    existing_user = get_user_by_username(db, username)
-    if existing_user:
-        counter = 1
-        while get_user_by_username(db, f"{username}{counter}"):
-            counter += 1
-        username = f"{username}{counter}"
+    for _ in range(USERNAME_ALLOCATION_ATTEMPTS):
+        taken = db.execute(_usernames_with_prefix_query(base)).scalars().all()
+        db_user = _build_user(user, _pick_username(base, taken), hashed_password)
+        db.add(db_user)
+        try:
+            db.commit()
+        except IntegrityError:
+            # Lost a race with a concurrent signup: re-read and try again
+            db.rollback()
+            if get_user_by_email(db, user.email):
+                raise HTTPException(status_code=400, detail="Email already registered")
+            continue
+        db.refresh(db_user)
+        return db_user
+    raise _username_conflict()
+
+async def create_user_async(db: AsyncSession, user: UserCreate) -> User:
+    """Create new user"""
+    password_hasher.admit()
+    # Check if user already exists
+    if await get_user_by_email_async(db, user.email):
+        raise HTTPException(
+            status_code=400,
+            detail="Email already registered"
+        )
     
+    # Check password confirmation
+    if user.password != user.confirm_password:
+        raise HTTPException(
+            status_code=400,
+            detail="Passwords do not match"
+        )
+    
+    # Create username from email (taking part before @), appending a number
+    # if it is taken
+    base = user.email.split('@')[0]
+    # Release the connection while hashing, as in authenticate_user_async
+    await db.commit()
+    hashed_password = await password_hasher.hash(user.password)
+    
+    for _ in range(USERNAME_ALLOCATION_ATTEMPTS):
+        taken = (await db.execute(_usernames_with_prefix_query(base))).scalars().all()
+        db_user = _build_user(user, _pick_username(base, taken), hashed_password)
+        db.add(db_user)
+        try:
+            await db.commit()
+        except IntegrityError:
+            # Lost a race with a concurrent signup: re-read and try again
+            await db.rollback()
+            if await get_user_by_email_async(db, user.email):
+                raise HTTPException(status_code=400, detail="Email already registered")
+            continue
+        await db.refresh(db_user)
+        return db_user
+    raise _username_conflict()
+
+def _build_user(user: UserCreate, username: str, hashed_password: str) -> User:
+    """Build an unsaved User"""
     # Split fullname into first and last name
     name_parts = user.fullname.strip().split(' ', 1)
     first_name = name_parts[0] if name_parts else ''
     last_name = name_parts[1] if len(name_parts) > 1 else ''
     
     # Create new user
-    hashed_password = get_password_hash(user.password)
-    db_user = User(
+    return User(
         email=user.email,
         username=username,
         hashed_password=hashed_password,
         first_name=first_name,
         last_name=last_name
     )
-    db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
-    return db_user
 
 async def get_current_user(
     credentials: HTTPAuthorizationCredentials = Depends(security),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ) -> User:
     """Get current authenticated user"""
     credentials_exception = HTTPException(
@@ -150,18 +488,39 @@ async def get_current_user(
         headers={"WWW-Authenticate": "Bearer"},
     )
     
+    token = credentials.credentials
+    cached = principal_cache.get(token)
+    if cached is not None:
+        user, version = cached
+        if version == _principal_versions.get(user.id, 0):
+            return user
+        principal_cache.delete(token)
+    
     try:
-        payload = jwt.decode(credentials.credentials, SECRET_KEY, algorithms=[ALGORITHM])
+        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         email: str = payload.get("sub")
         if email is None:
             raise credentials_exception
-        token_data = TokenData(email=email)
+        token_data = TokenData(email=email, user_id=payload.get("uid"))
     except JWTError:
         raise credentials_exception
     
-    user = get_user_by_email(db, email=token_data.email)
+    if token_data.user_id is not None:
+        # Captured before the read so a concurrent update is never cached as current
+        version = _principal_versions.get(token_data.user_id, 0)
+        user = await get_user_by_id_async(db, token_data.user_id)
+        if user is not None and user.email != token_data.email:
+            user = None
+    else:
+        # Tokens issued before the uid claim existed
+        user = await get_user_by_email_async(db, email=token_data.email)
+        version = _principal_versions.get(user.id, 0) if user is not None else 0
     if user is None:
         raise credentials_exception
+    
+    ttl = min(PRINCIPAL_CACHE_TTL_SECONDS, payload.get("exp", 0) - time.time())
+    if ttl > 0:
+        principal_cache.set(token, (user, version), ttl=ttl)
     return user
 
 async def get_current_active_user(current_user: User = Depends(get_current_user)) -> User:
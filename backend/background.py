@@ -0,0 +1,89 @@
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Any, Callable, Dict, Optional, Set
+import asyncio
+from database import SessionLocal
+
+class BackgroundWriter:
+    """Runs non-critical database writes off the request path.
+
+    Each job gets its own session. SQLite allows a single writer at a time, so
+    by default jobs run one after another on a dedicated thread, in submission
+    order. Pending jobs are tracked so shutdown can wait until every accepted
+    write is flushed.
+
+    Fire-and-forget jobs are bounded: once `max_pending` of them are waiting,
+    further ones are dropped and logged rather than queued without limit.
+    Callers of run() wait for their job, so they are never dropped.
+    """
+
+    def __init__(self, max_workers: int = 1, max_pending: int = 1000):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="db-writer")
+        self.max_pending = max_pending
+        self._pending: Set[asyncio.Future] = set()
+        self._submitted: Set[asyncio.Future] = set()
+        self.dropped = 0
+
+    def submit(self, job: Callable, *args, **kwargs) -> Optional[asyncio.Future]:
+        """Schedule job(db, *args, **kwargs) and return without waiting for it.
+
+        Returns None if the job was dropped because the writer is backed up.
+        """
+        if len(self._submitted) >= self.max_pending:
+            self.dropped += 1
+            print(f"Background writer backed up, dropped {getattr(job, '__name__', job)} ({self.dropped} dropped)")
+            return None
+        loop = asyncio.get_running_loop()
+        future = loop.run_in_executor(self._executor, partial(self._run, job, args, kwargs))
+        self._pending.add(future)
+        self._submitted.add(future)
+        future.add_done_callback(self._pending.discard)
+        future.add_done_callback(self._submitted.discard)
+        return future
+
+    async def run(self, job: Callable, *args, **kwargs) -> Any:
+        """Run job(db, *args, **kwargs) on the writer thread and wait for it.
+
+        Unlike submit, errors are raised to the caller.
+        """
+        loop = asyncio.get_running_loop()
+        future = loop.run_in_executor(self._executor, partial(self._call, job, args, kwargs))
+        self._pending.add(future)
+        future.add_done_callback(self._pending.discard)
+        return await future
+
+    @staticmethod
+    def _call(job: Callable, args: tuple, kwargs: dict) -> Any:
+        db = SessionLocal()
+        try:
+            return job(db, *args, **kwargs)
+        finally:
+            db.close()
+
+    @staticmethod
+    def _run(job: Callable, args: tuple, kwargs: dict) -> None:
+        try:
+            BackgroundWriter._call(job, args, kwargs)
+        except Exception as e:
+            print(f"Background write error: {e}")
+
+    @property
+    def pending(self) -> int:
+        return len(self._pending)
+
+    def stats(self) -> Dict[str, int]:
+        """Counters for the /metrics endpoint"""
+        return {
+            "pending": len(self._pending),
+            "max_pending": self.max_pending,
+            "dropped": self.dropped
+        }
+
+    async def drain(self) -> None:
+        """Wait for every scheduled write to complete"""
+        while self._pending:
+            await asyncio.gather(*list(self._pending), return_exceptions=True)
+
+    async def shutdown(self) -> None:
+        await self.drain()
+        self._executor.shutdown(wait=True)
@@ -0,0 +1,73 @@
+"""/chat latency before and after the write-behind pipeline.
+
+Clients send a mix of standard-intent messages (canned reply, video lookup,
+recommendation and conversation writes) and messages that fall back to a
+stand-in Gemini model taking --gemini-delay seconds. Compares the commit
+before the change, the change itself (reply and video lookup under
+asyncio.gather), the last commit and the working tree.
+
+python bench/chat_pipeline.py [--duration 10] [--gemini-delay 0.5]
+"""
+import argparse
+import asyncio
+import uuid
+import httpx
+from common import BACKEND_DIR, add_ref_arguments, change_refs, register_users, remove_worktree, run_clients, server, summarize, timed, worktree
+
+CHANGE = "user-005"
+STANDARD_MESSAGES = ["I feel anxious all the time", "I am so stressed about work", "I cannot sleep at night"]
+
+async def measure(base_url: str, duration: float, standard_clients: int, gemini_clients: int) -> dict:
+    async with httpx.AsyncClient(base_url=base_url, timeout=60) as client:
+        tokens = await register_users(client, standard_clients + gemini_clients)
+        headers = [{"Authorization": f"Bearer {token}"} for token in tokens]
+        latencies = {"standard": [], "gemini": []}
+        errors = {"standard": 0, "gemini": 0}
+
+        async def chat(i: int) -> None:
+            if i < standard_clients:
+                kind, message = "standard", f"{STANDARD_MESSAGES[i % len(STANDARD_MESSAGES)]} {uuid.uuid4().hex[:6]}"
+            else:
+                kind, message = "gemini", f"what about therapy {uuid.uuid4().hex}"
+            try:
+                response = await timed(latencies[kind], client.post("/chat", json={"message": message}, headers=headers[i]))
+            except httpx.TimeoutException:
+                errors[kind] += 1
+                return
+            if response.status_code != 200:
+                errors[kind] += 1
+
+        elapsed = await run_clients(standard_clients + gemini_clients, duration, chat)
+        return {
+            kind: {**summarize(values, elapsed), "errors": errors[kind]}
+            for kind, values in latencies.items()
+        }
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--duration", type=float, default=10)
+    parser.add_argument("--gemini-delay", type=float, default=0.5)
+    parser.add_argument("--standard-clients", type=int, default=8)
+    parser.add_argument("--gemini-clients", type=int, default=2)
+    add_ref_arguments(parser, CHANGE)
+    args = parser.parse_args()
+    before, after = change_refs(CHANGE, args.before, args.after)
+
+    targets = [
+        ("before", worktree(before)),
+        ("after", worktree(after)),
+        ("HEAD", worktree("HEAD")),
+        ("current", BACKEND_DIR)
+    ]
+    try:
+        for label, app_dir in targets:
+            with server(app_dir, gemini_delay=args.gemini_delay) as base_url:
+                results = asyncio.run(measure(base_url, args.duration, args.standard_clients, args.gemini_clients))
+            for kind, stats in results.items():
+                print(f"{label:8} {kind:9} {stats}")
+    finally:
+        for label, app_dir in targets[:3]:
+            remove_worktree(app_dir)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""Messages per second of IntentClassifier.classify_many by batch size.
+
+Classifies the same messages in batches of 1, 64 and 4096 with
+classify_many, and one at a time with classify_intent for comparison.
+
+python bench/classify_many.py [--messages 8192] [--repeat 3]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from common import BACKEND_DIR
+
+sys.path.insert(0, BACKEND_DIR)
+from intent_classifier import IntentClassifier  # noqa: E402
+
+BATCH_SIZES = [1, 64, 4096]
+TEMPLATES = [
+    "I feel {} and {} about work",
+    "I can't sleep because of {}",
+    "everything is {} lately, I need some {}",
+    "what is the weather like today",
+    "my {} is getting worse and I feel {}",
+]
+
+def make_messages(classifier: IntentClassifier, count: int) -> list:
+    words = [keyword for data in classifier.intents.values() for keyword in data["keywords"]]
+    rng = random.Random(0)
+    messages = []
+    for _ in range(count):
+        template = rng.choice(TEMPLATES)
+        messages.append(template.format(*rng.choices(words, k=template.count("{}"))))
+    return messages
+
+def best_rate(run, count: int, repeat: int) -> float:
+    """Highest messages/second over repeat runs"""
+    best = 0.0
+    for _ in range(repeat):
+        started = time.perf_counter()
+        run()
+        best = max(best, count / (time.perf_counter() - started))
+    return best
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--messages", type=int, default=8192)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    os.chdir(BACKEND_DIR)
+    classifier = IntentClassifier()
+    classifier.load()
+    messages = make_messages(classifier, args.messages)
+
+    def scalar():
+        for message in messages:
+            classifier.classify_intent(message)
+
+    print(f"classify_intent    {best_rate(scalar, len(messages), args.repeat):10.0f} messages/s")
+    for size in BATCH_SIZES:
+        def batched():
+            for start in range(0, len(messages), size):
+                classifier.classify_many(messages[start:start + size])
+        print(f"classify_many {size:>4} {best_rate(batched, len(messages), args.repeat):10.0f} messages/s")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""Worker cold-start time and RSS, with and without the prebuilt intent model.
+
+Each run is a fresh interpreter that imports main and loads the intent model,
+which is what a worker does before serving its first request. Reports the
+wall time of the whole process, the import and model-load split, the RSS
+once started and the peak RSS, and whether scikit-learn was imported.
+Compares the commit before the artifact, the artifact commit and the working
+tree; the last two run once with a built artifact and once without (refit).
+
+python bench/cold_start.py [--runs 5]
+"""
+import argparse
+import json
+import os
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from common import BACKEND_DIR, add_ref_arguments, change_refs, remove_worktree, worktree
+
+CHANGE = "user-019"
+
+def run_target(app_dir: str) -> dict:
+    """Body of the child process: start a worker the way uvicorn would"""
+    started = time.perf_counter()
+    sys.path.insert(0, app_dir)
+    import main
+    imported = time.perf_counter()
+    load = getattr(main.intent_classifier, "load", None)
+    if load is not None:
+        load()
+    loaded = time.perf_counter()
+    with open("/proc/self/status") as f:
+        rss_kb = next(int(line.split()[1]) for line in f if line.startswith("VmRSS:"))
+    return {
+        "import_ms": round((imported - started) * 1000, 1),
+        "load_ms": round((loaded - imported) * 1000, 1),
+        "rss_mb": round(rss_kb / 1024, 1),
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        "sklearn": "sklearn" in sys.modules,
+    }
+
+def measure(app_dir: str, env: dict, runs: int) -> dict:
+    """Median of runs fresh worker processes"""
+    results = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        output = subprocess.run(
+            [sys.executable, __file__, "--app-dir", app_dir],
+            env=env, cwd=app_dir, check=True, capture_output=True, text=True
+        ).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        result["process_ms"] = (time.perf_counter() - started) * 1000
+        results.append(result)
+    summary = {
+        key: round(statistics.median(result[key] for result in results), 1)
+        for key in ["process_ms", "import_ms", "load_ms", "rss_mb", "peak_rss_mb"]
+    }
+    summary["sklearn"] = results[-1]["sklearn"]
+    return summary
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--app-dir", help=argparse.SUPPRESS)
+    add_ref_arguments(parser, CHANGE)
+    args = parser.parse_args()
+
+    if args.app_dir:
+        print(json.dumps(run_target(args.app_dir)))
+        return
+
+    before, after = change_refs(CHANGE, args.before, args.after)
+    before, after = worktree(before), worktree(after)
+    try:
+        for label, app_dir, artifact in [
+            ("before", before, False),
+            ("after", after, True), ("after", after, False),
+            ("current", BACKEND_DIR, True), ("current", BACKEND_DIR, False),
+        ]:
+            tmp = tempfile.mkdtemp(prefix="melvis-bench-")
+            env = {
+                **os.environ, "DATABASE_URL": f"sqlite:///{tmp}/bench.db",
+                "INTENT_MODEL_PATH": os.path.join(tmp, "intent_model"),
+                "GEMINI_API_KEY": "", "YOUTUBE_API_KEY": "",
+            }
+            if artifact:
+                subprocess.run(
+                    [sys.executable, "intent_classifier.py"],
+                    env=env, cwd=app_dir, check=True, capture_output=True
+                )
+            model = "artifact" if artifact else ("refit" if label != "before" else "fit at import")
+            print(f"{label:8} {model:13} {measure(app_dir, env, args.runs)}")
+    finally:
+        remove_worktree(before)
+        remove_worktree(after)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+"""Helpers shared by the benchmark scripts"""
+from contextlib import contextmanager
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+import argparse
+import asyncio
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import httpx
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+BACKEND_DIR = os.path.dirname(BENCH_DIR)
+
+def add_ref_arguments(parser: argparse.ArgumentParser, request_id: str) -> None:
+    """--before/--after git refs for the code a benchmark compares"""
+    parser.add_argument("--before", help=f"git ref before {request_id} (default: parent of its first commit)")
+    parser.add_argument("--after", help=f"git ref with {request_id} (default: its last commit, fixes included)")
+
+def change_refs(request_id: str, before: Optional[str] = None, after: Optional[str] = None) -> Tuple[str, str]:
+    """Refs to compare for a change, found by its "[request_id]" commit subjects.
+
+    Falls back to HEAD~1 and HEAD when no commit carries the tag, e.g. after
+    the series was squashed on merge.
+    """
+    if before is None or after is None:
+        log = subprocess.run(
+            ["git", "log", "--format=%H %s", "--fixed-strings", f"--grep=[{request_id}]"],
+            cwd=BACKEND_DIR, check=True, capture_output=True, text=True
+        ).stdout
+        commits = [line.split(" ", 1)[0] for line in log.splitlines() if line.split(" ", 1)[1].startswith(f"[{request_id}]")]
+        if commits:
+            before = before or commits[-1] + "^"
+            after = after or commits[0]
+        else:
+            print(f"No [{request_id}] commits found, comparing HEAD~1 with HEAD")
+            before, after = before or "HEAD~1", after or "HEAD"
+    return before, after
+
+def worktree(commit: str) -> str:
+    """Check out commit into a temporary git worktree and return its backend dir"""
+    path = tempfile.mkdtemp(prefix="melvis-bench-")
+    subprocess.run(
+        ["git", "worktree", "add", "--detach", path, commit],
+        cwd=BACKEND_DIR, check=True, capture_output=True
+    )
+    return os.path.join(path, "backend")
+
+def remove_worktree(app_dir: str) -> None:
+    subprocess.run(
+        ["git", "worktree", "remove", "--force", os.path.dirname(app_dir)],
+        cwd=BACKEND_DIR, check=False, capture_output=True
+    )
+
+@contextmanager
+def server(app_dir: str = BACKEND_DIR, port: int = 8100, gemini_delay: Optional[float] = None,
+           env: Optional[Dict[str, str]] = None):
+    """Run bench/server.py in a subprocess against a fresh database"""
+    db_dir = tempfile.mkdtemp(prefix="melvis-bench-db-")
+    command = [
+        sys.executable, os.path.join(BENCH_DIR, "server.py"),
+        "--app-dir", app_dir, "--port", str(port), "--db", os.path.join(db_dir, "bench.db")
+    ]
+    if gemini_delay is not None:
+        command += ["--gemini-delay", str(gemini_delay)]
+    process = subprocess.Popen(
+        command, env={**os.environ, **(env or {})},
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    try:
+        deadline = time.time() + 120
+        while True:
+            if process.poll() is not None:
+                raise RuntimeError(f"server exited with {process.returncode}")
+            try:
+                if httpx.get(base_url + "/", timeout=1).status_code == 200:
+                    break
+            except httpx.TransportError:
+                pass
+            if time.time() > deadline:
+                raise RuntimeError("server did not start")
+            time.sleep(0.2)
+        yield base_url
+    finally:
+        process.terminate()
+        try:
+            process.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+async def register_users(client: httpx.AsyncClient, count: int, prefix: str = "bench") -> List[str]:
+    """Register count users and return their access tokens"""
+    async def register(i: int) -> str:
+        while True:
+            response = await client.post("/auth/register", json={
+                "email": f"{prefix}{i}@example.com",
+                "fullname": f"Bench User {i}",
+                "password": "bench-password",
+                "confirm_password": "bench-password"
+            })
+            if response.status_code != 503:
+                break
+            # Password hashing is shedding load
+            await asyncio.sleep(float(response.headers.get("Retry-After", "1")))
+        response.raise_for_status()
+        return response.json()["access_token"]
+
+    tokens = []
+    # A few at a time: registration is bcrypt-bound
+    for start in range(0, count, 8):
+        tokens += await asyncio.gather(*(register(i) for i in range(start, min(start + 8, count))))
+    return tokens
+
+def percentile(values: List[float], p: float) -> float:
+    if not values:
+        return float("nan")
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(p / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+def summarize(latencies: List[float], elapsed: float) -> Dict[str, float]:
+    """Request count, throughput and latency percentiles in milliseconds"""
+    return {
+        "requests": len(latencies),
+        "rps": round(len(latencies) / elapsed, 1) if elapsed else 0.0,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 1),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 1),
+        "max_ms": round(max(latencies) * 1000, 1) if latencies else float("nan")
+    }
+
+async def timed(latencies: List[float], request: Awaitable[httpx.Response]) -> httpx.Response:
+    started = time.perf_counter()
+    response = await request
+    latencies.append(time.perf_counter() - started)
+    return response
+
+async def run_clients(count: int, duration: float, step: Callable[[int], Awaitable[None]]) -> float:
+    """Run count clients, each calling step(client_index) in a loop, for duration seconds"""
+    stop_at = time.perf_counter() + duration
+
+    async def client(index: int) -> None:
+        while time.perf_counter() < stop_at:
+            await step(index)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(client(i) for i in range(count)))
+    return time.perf_counter() - started
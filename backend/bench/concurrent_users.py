@@ -0,0 +1,66 @@
+"""/conversations and /chat throughput with many concurrent users.
+
+Each of --users users runs its own client loop: half of them read their
+conversation history, the other half send standard-intent chat messages.
+Compares the commit before the async session layer, the change itself and
+the working tree.
+
+python bench/concurrent_users.py [--users 120] [--duration 15]
+"""
+import argparse
+import asyncio
+import httpx
+from common import BACKEND_DIR, add_ref_arguments, change_refs, register_users, remove_worktree, run_clients, server, summarize, timed, worktree
+
+CHANGE = "user-007"
+MESSAGES = ["I feel anxious all the time", "I am so stressed about work", "I cannot sleep at night"]
+
+async def measure(base_url: str, users: int, duration: float) -> dict:
+    limits = httpx.Limits(max_connections=users + 10, max_keepalive_connections=users + 10)
+    async with httpx.AsyncClient(base_url=base_url, timeout=120, limits=limits) as client:
+        tokens = await register_users(client, users)
+        headers = [{"Authorization": f"Bearer {token}"} for token in tokens]
+        latencies = {"/conversations": [], "/chat": []}
+        errors = {"/conversations": 0, "/chat": 0}
+
+        async def user(i: int) -> None:
+            if i % 2:
+                path, request = "/conversations", client.get("/conversations", headers=headers[i])
+            else:
+                message = MESSAGES[i % len(MESSAGES)]
+                path, request = "/chat", client.post("/chat", json={"message": message}, headers=headers[i])
+            try:
+                response = await timed(latencies[path], request)
+            except httpx.TimeoutException:
+                errors[path] += 1
+                return
+            if response.status_code != 200:
+                errors[path] += 1
+
+        elapsed = await run_clients(users, duration, user)
+        return {
+            path: {**summarize(values, elapsed), "errors": errors[path]}
+            for path, values in latencies.items()
+        }
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=120)
+    parser.add_argument("--duration", type=float, default=15)
+    add_ref_arguments(parser, CHANGE)
+    args = parser.parse_args()
+    before, after = change_refs(CHANGE, args.before, args.after)
+
+    targets = [("before", worktree(before)), ("after", worktree(after)), ("current", BACKEND_DIR)]
+    try:
+        for label, app_dir in targets:
+            with server(app_dir) as base_url:
+                results = asyncio.run(measure(base_url, args.users, args.duration))
+            for path, stats in results.items():
+                print(f"{label:8} {path:15} {stats}")
+    finally:
+        for label, app_dir in targets[:2]:
+            remove_worktree(app_dir)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""SQLite read/write contention under each SQLITE_PROFILE.
+
+Writer threads insert one conversation turn per commit, like /chat did
+before write-behind logging, while reader threads load conversation
+history through the same engine. Each profile runs in its own process,
+because the profile is read when database.py is imported.
+
+python bench/db_contention.py [--duration 10] [--writers 4] [--readers 8]
+"""
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from common import BACKEND_DIR, summarize
+
+PROFILES = ["default", "production"]
+
+def run_profile(duration: float, writers: int, readers: int, users: int) -> dict:
+    """Body of the child process; the environment already selects the profile"""
+    sys.path.insert(0, BACKEND_DIR)
+    from sqlalchemy.exc import OperationalError
+    from database import Base, SessionLocal, User, engine
+    from services import ConversationService
+
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    db.add_all([
+        User(email=f"user{i}@example.com", username=f"user{i}", hashed_password="x")
+        for i in range(users)
+    ])
+    db.commit()
+    user_ids = [user.id for user in db.query(User).all()]
+    for user_id in user_ids:
+        for turn in range(20):
+            ConversationService.create_conversation(db, user_id, f"seed {turn}", "reply", "stress", 1.0, "seed")
+    db.close()
+
+    latencies = {"write": [], "read": []}
+    errors = {"write": 0, "read": 0}
+    lock = threading.Lock()
+    stop_at = time.perf_counter() + duration
+
+    def loop(kind: str) -> None:
+        rng = random.Random()
+        while time.perf_counter() < stop_at:
+            user_id = rng.choice(user_ids)
+            db = SessionLocal()
+            started = time.perf_counter()
+            try:
+                if kind == "write":
+                    ConversationService.create_conversation(db, user_id, "I feel stressed", "reply", "stress", 1.0, "bench")
+                else:
+                    ConversationService.get_user_conversations(db, user_id, 50)
+                elapsed = time.perf_counter() - started
+                with lock:
+                    latencies[kind].append(elapsed)
+            except OperationalError:
+                db.rollback()
+                with lock:
+                    errors[kind] += 1
+            finally:
+                db.close()
+
+    threads = [threading.Thread(target=loop, args=("write",)) for _ in range(writers)]
+    threads += [threading.Thread(target=loop, args=("read",)) for _ in range(readers)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    return {kind: {**summarize(values, elapsed), "errors": errors[kind]} for kind, values in latencies.items()}
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--duration", type=float, default=10)
+    parser.add_argument("--writers", type=int, default=4)
+    parser.add_argument("--readers", type=int, default=8)
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--profile", choices=PROFILES, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.profile:
+        print(json.dumps(run_profile(args.duration, args.writers, args.readers, args.users)))
+        return
+
+    for profile in PROFILES:
+        db_dir = tempfile.mkdtemp(prefix="melvis-bench-db-")
+        env = {**os.environ, "SQLITE_PROFILE": profile, "DATABASE_URL": f"sqlite:///{db_dir}/bench.db"}
+        output = subprocess.run(
+            [sys.executable, __file__, "--profile", profile, "--duration", str(args.duration),
+             "--writers", str(args.writers), "--readers", str(args.readers), "--users", str(args.users)],
+            env=env, check=True, capture_output=True, text=True
+        ).stdout
+        for kind, stats in json.loads(output.strip().splitlines()[-1]).items():
+            print(f"{profile:10} {kind:5} {stats}")
+
+if __name__ == "__main__":
+    main()
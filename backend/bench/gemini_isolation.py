@@ -0,0 +1,66 @@
+"""Latency of non-Gemini endpoints while Gemini calls are slow.
+
+Runs /auth/me and /assessments clients alone, then again while other clients
+keep sending messages that fall back to a stand-in Gemini model taking
+--gemini-delay seconds per call. Compares the commit before the change, the
+change itself and the working tree.
+
+python bench/gemini_isolation.py [--duration 10] [--gemini-delay 2]
+"""
+import argparse
+import asyncio
+import uuid
+import httpx
+from common import BACKEND_DIR, add_ref_arguments, change_refs, register_users, remove_worktree, run_clients, server, summarize, timed, worktree
+
+CHANGE = "user-001"
+
+async def measure(base_url: str, duration: float, gemini_clients: int, probe_clients: int) -> dict:
+    async with httpx.AsyncClient(base_url=base_url, timeout=60) as client:
+        tokens = await register_users(client, probe_clients + gemini_clients)
+        headers = [{"Authorization": f"Bearer {token}"} for token in tokens]
+
+        async def probe(i: int) -> None:
+            path = "/auth/me" if i % 2 else "/assessments"
+            await timed(latencies, client.get(path, headers=headers[i]))
+
+        async def gemini(i: int) -> None:
+            # Unique low-confidence, mental-health message: always routed to Gemini
+            message = f"what about therapy {uuid.uuid4().hex}"
+            await client.post("/chat", json={"message": message}, headers=headers[probe_clients + i])
+
+        results = {}
+        latencies = []
+        elapsed = await run_clients(probe_clients, duration, probe)
+        results["idle"] = summarize(latencies, elapsed)
+
+        latencies = []
+        gemini_task = asyncio.ensure_future(run_clients(gemini_clients, duration, gemini))
+        elapsed = await run_clients(probe_clients, duration, probe)
+        await gemini_task
+        results["gemini_slow"] = summarize(latencies, elapsed)
+        return results
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--duration", type=float, default=10)
+    parser.add_argument("--gemini-delay", type=float, default=2)
+    parser.add_argument("--gemini-clients", type=int, default=8)
+    parser.add_argument("--probe-clients", type=int, default=10)
+    add_ref_arguments(parser, CHANGE)
+    args = parser.parse_args()
+    before, after = change_refs(CHANGE, args.before, args.after)
+
+    targets = [("before", worktree(before)), ("after", worktree(after)), ("current", BACKEND_DIR)]
+    try:
+        for label, app_dir in targets:
+            with server(app_dir, gemini_delay=args.gemini_delay) as base_url:
+                results = asyncio.run(measure(base_url, args.duration, args.gemini_clients, args.probe_clients))
+            for phase, stats in results.items():
+                print(f"{label:8} {phase:12} {stats}")
+    finally:
+        for label, app_dir in targets[:2]:
+            remove_worktree(app_dir)
+
+if __name__ == "__main__":
+    main()
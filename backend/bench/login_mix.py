@@ -0,0 +1,73 @@
+"""Logins mixed with /chat, before and after bcrypt moved to a bounded pool.
+
+--login-clients users log in again and again while --chat-clients users
+keep posting chat messages. Reports both latencies and how many logins were
+shed with 503; a shed client waits out Retry-After before trying again. Compares the commit before the change, the change itself and
+the working tree.
+
+python bench/login_mix.py [--duration 10] [--login-clients 16] [--chat-clients 8] [--max-queue 32]
+"""
+import argparse
+import asyncio
+import httpx
+from common import BACKEND_DIR, add_ref_arguments, change_refs, register_users, remove_worktree, run_clients, server, summarize, timed, worktree
+
+CHANGE = "user-014"
+
+async def measure(base_url: str, duration: float, login_clients: int, chat_clients: int) -> dict:
+    limits = httpx.Limits(max_connections=login_clients + chat_clients + 10)
+    async with httpx.AsyncClient(base_url=base_url, timeout=120, limits=limits) as client:
+        tokens = await register_users(client, login_clients + chat_clients)
+        headers = [{"Authorization": f"Bearer {token}"} for token in tokens]
+        latencies = {"login": [], "/chat": []}
+        shed = 0
+        errors = 0
+
+        async def login(i: int) -> None:
+            nonlocal shed, errors
+            response = await timed(latencies["login"], client.post("/auth/login", json={
+                "email": f"bench{i}@example.com", "password": "bench-password"
+            }))
+            if response.status_code == 503:
+                shed += 1
+                # Well-behaved clients back off as told
+                await asyncio.sleep(float(response.headers.get("Retry-After", "1")))
+            elif response.status_code != 200:
+                errors += 1
+
+        async def chat(i: int) -> None:
+            await timed(latencies["/chat"], client.post(
+                "/chat", json={"message": "I am so stressed about work"}, headers=headers[login_clients + i]
+            ))
+
+        login_task = asyncio.ensure_future(run_clients(login_clients, duration, login))
+        elapsed = await run_clients(chat_clients, duration, chat)
+        await login_task
+        results = {kind: summarize(values, elapsed) for kind, values in latencies.items()}
+        results["login"].update(shed_503=shed, errors=errors)
+        return results
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--duration", type=float, default=10)
+    parser.add_argument("--login-clients", type=int, default=16)
+    parser.add_argument("--chat-clients", type=int, default=8)
+    parser.add_argument("--max-queue", type=int, default=None, help="PASSWORD_HASH_MAX_QUEUE for the server")
+    add_ref_arguments(parser, CHANGE)
+    args = parser.parse_args()
+    before, after = change_refs(CHANGE, args.before, args.after)
+    env = {} if args.max_queue is None else {"PASSWORD_HASH_MAX_QUEUE": str(args.max_queue)}
+
+    targets = [("before", worktree(before)), ("after", worktree(after)), ("current", BACKEND_DIR)]
+    try:
+        for label, app_dir in targets:
+            with server(app_dir, env=env) as base_url:
+                results = asyncio.run(measure(base_url, args.duration, args.login_clients, args.chat_clients))
+            for kind, stats in results.items():
+                print(f"{label:8} {kind:6} {stats}")
+    finally:
+        for label, app_dir in targets[:2]:
+            remove_worktree(app_dir)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+"""/auth/me latency and throughput with and without the principal cache.
+
+Runs --clients users calling /auth/me, first alone and then while other
+users keep posting chat messages, once with the cache at its default TTL and
+once with PRINCIPAL_CACHE_TTL_SECONDS=0, which turns it off.
+
+python bench/principal_cache.py [--duration 10] [--clients 50]
+"""
+import argparse
+import asyncio
+import httpx
+from common import register_users, run_clients, server, summarize, timed
+
+CONFIGS = [("cache", {}), ("no cache", {"PRINCIPAL_CACHE_TTL_SECONDS": "0"})]
+
+async def measure(base_url: str, duration: float, clients: int, chat_clients: int) -> dict:
+    limits = httpx.Limits(max_connections=clients + chat_clients + 10)
+    async with httpx.AsyncClient(base_url=base_url, timeout=60, limits=limits) as client:
+        tokens = await register_users(client, clients + chat_clients)
+        headers = [{"Authorization": f"Bearer {token}"} for token in tokens]
+
+        async def me(i: int) -> None:
+            await timed(latencies, client.get("/auth/me", headers=headers[i]))
+
+        async def chat(i: int) -> None:
+            await client.post("/chat", json={"message": "I am so stressed about work"}, headers=headers[clients + i])
+
+        results = {}
+        latencies = []
+        elapsed = await run_clients(clients, duration, me)
+        results["alone"] = summarize(latencies, elapsed)
+
+        latencies = []
+        chat_task = asyncio.ensure_future(run_clients(chat_clients, duration, chat))
+        elapsed = await run_clients(clients, duration, me)
+        await chat_task
+        results["with /chat"] = summarize(latencies, elapsed)
+        return results
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--duration", type=float, default=10)
+    parser.add_argument("--clients", type=int, default=50)
+    parser.add_argument("--chat-clients", type=int, default=8)
+    args = parser.parse_args()
+
+    for label, env in CONFIGS:
+        with server(env=env) as base_url:
+            results = asyncio.run(measure(base_url, args.duration, args.clients, args.chat_clients))
+        for phase, stats in results.items():
+            print(f"{label:9} {phase:11} {stats}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+"""Run the API for benchmarks, with a stand-in Gemini model.
+
+The stand-in blocks its calling thread for --gemini-delay seconds, like the
+real SDK does while waiting on the network. --app-dir can point at a git
+worktree of an older commit to measure the code before a change.
+
+python bench/server.py --app-dir . --port 8100 --db /tmp/bench.db --gemini-delay 2
+"""
+import argparse
+import os
+import sys
+import time
+
+class FakeChunk:
+    def __init__(self, text: str):
+        self.text = text
+
+class FakeGeminiModel:
+    """Answers every prompt after a fixed, thread-blocking delay"""
+
+    def __init__(self, delay: float):
+        self.delay = delay
+
+    def generate_content(self, prompt, stream=False):
+        time.sleep(self.delay)
+        reply = "It sounds like a lot is going on. Let's take it one step at a time."
+        if stream:
+            return iter([FakeChunk(word + " ") for word in reply.split()])
+        return FakeChunk(reply)
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--app-dir", default=os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+    parser.add_argument("--port", type=int, default=8100)
+    parser.add_argument("--db", required=True)
+    parser.add_argument("--gemini-delay", type=float, default=None)
+    args = parser.parse_args()
+
+    app_dir = os.path.abspath(args.app_dir)
+    os.environ["DATABASE_URL"] = f"sqlite:///{args.db}"
+    os.environ.pop("YOUTUBE_API_KEY", None)
+    if args.gemini_delay is not None:
+        os.environ["GEMINI_API_KEY"] = "bench"
+    else:
+        os.environ.pop("GEMINI_API_KEY", None)
+    os.chdir(app_dir)
+    sys.path.insert(0, app_dir)
+
+    import uvicorn
+    import main as app_module
+
+    if args.gemini_delay is not None:
+        app_module.gemini_service.model = FakeGeminiModel(args.gemini_delay)
+
+    uvicorn.run(app_module.app, host="127.0.0.1", port=args.port, log_level="warning")
+
+if __name__ == "__main__":
+    main()
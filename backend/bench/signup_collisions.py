@@ -0,0 +1,81 @@
+"""Signup time when thousands of usernames already share the email prefix.
+
+Seeds --existing users named john, john1, john2, ... and then signs up
+--signups more john@... addresses through auth.create_user, timing each.
+Password hashing is stubbed out so only username allocation is measured.
+Each target runs in its own process against a fresh database: the commit
+before the change, the change itself and the working tree.
+
+python bench/signup_collisions.py [--existing 10000] [--signups 50]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from common import BACKEND_DIR, add_ref_arguments, change_refs, remove_worktree, summarize, worktree
+
+CHANGE = "user-016"
+
+def run_target(app_dir: str, existing: int, signups: int) -> dict:
+    """Body of the child process; DATABASE_URL already points at a fresh file"""
+    sys.path.insert(0, app_dir)
+    from sqlalchemy import insert
+    from database import Base, SessionLocal, User, engine
+    import auth
+
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    names = ["john"] + [f"john{i}" for i in range(1, existing)]
+    db.execute(insert(User), [
+        {"email": f"{name}@seed.example.com", "username": name, "hashed_password": "x"} for name in names
+    ])
+    db.commit()
+
+    auth.get_password_hash = lambda password: "x"
+    latencies = []
+    started = time.perf_counter()
+    for i in range(signups):
+        user = auth.UserCreate(
+            email=f"john@signup{i}.example.com", fullname="John Smith",
+            password="bench-password", confirm_password="bench-password"
+        )
+        signup_started = time.perf_counter()
+        auth.create_user(db, user)
+        latencies.append(time.perf_counter() - signup_started)
+    elapsed = time.perf_counter() - started
+    db.close()
+    return summarize(latencies, elapsed)
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--existing", type=int, default=10000)
+    parser.add_argument("--signups", type=int, default=50)
+    parser.add_argument("--app-dir", help=argparse.SUPPRESS)
+    add_ref_arguments(parser, CHANGE)
+    args = parser.parse_args()
+
+    if args.app_dir:
+        print(json.dumps(run_target(args.app_dir, args.existing, args.signups)))
+        return
+
+    before, after = change_refs(CHANGE, args.before, args.after)
+    targets = [("before", worktree(before)), ("after", worktree(after)), ("current", BACKEND_DIR)]
+    try:
+        for label, app_dir in targets:
+            db_dir = tempfile.mkdtemp(prefix="melvis-bench-db-")
+            env = {**os.environ, "DATABASE_URL": f"sqlite:///{db_dir}/bench.db"}
+            output = subprocess.run(
+                [sys.executable, __file__, "--app-dir", app_dir,
+                 "--existing", str(args.existing), "--signups", str(args.signups)],
+                env=env, cwd=app_dir, check=True, capture_output=True, text=True
+            ).stdout
+            print(f"{label:8} {json.loads(output.strip().splitlines()[-1])}")
+    finally:
+        for label, app_dir in targets[:2]:
+            remove_worktree(app_dir)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,175 @@
+from collections import deque
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict
+import asyncio
+import os
+import time
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling an upstream whose breaker is open"""
+
+class CircuitBreaker:
+    """Stops calling an upstream that keeps failing or answering slowly.
+
+    Outcomes of the last window_size calls are kept. Once at least
+    minimum_calls are recorded, the breaker opens when the share of failed
+    calls or of calls slower than slow_call_seconds reaches its threshold.
+    While open every call is rejected at once, so callers go straight to their
+    fallback. After open_seconds the breaker goes half-open and lets
+    half_open_calls probes through: a single failed or slow probe opens it
+    again, all probes succeeding closes it.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        failure_rate: float = 0.5,
+        slow_call_rate: float = 0.5,
+        slow_call_seconds: float = 5.0,
+        window_size: int = 20,
+        minimum_calls: int = 10,
+        open_seconds: float = 30.0,
+        half_open_calls: int = 3
+    ):
+        self.name = name
+        self.failure_rate = failure_rate
+        self.slow_call_rate = slow_call_rate
+        self.slow_call_seconds = slow_call_seconds
+        self.minimum_calls = minimum_calls
+        self.open_seconds = open_seconds
+        self.half_open_calls = half_open_calls
+        self.state = CLOSED
+        self._window: deque = deque(maxlen=window_size)  # (failed, slow) per call
+        self._opened_at = 0.0
+        self._probes_started = 0
+        self._probes_passed = 0
+        self.transitions: deque = deque(maxlen=50)
+        self.calls = 0
+        self.failures = 0
+        self.slow_calls = 0
+        self.rejected = 0
+
+    def allow(self) -> bool:
+        """Whether a call may go to the upstream now; must be followed by a record_* call or release()"""
+        if self.state == OPEN:
+            if time.monotonic() - self._opened_at < self.open_seconds:
+                self.rejected += 1
+                return False
+            self._transition(HALF_OPEN, "open period elapsed")
+        if self.state == HALF_OPEN:
+            if self._probes_started >= self.half_open_calls:
+                self.rejected += 1
+                return False
+            self._probes_started += 1
+        return True
+
+    def record_success(self, duration: float) -> None:
+        self._record(False, duration)
+
+    def record_failure(self, duration: float) -> None:
+        self._record(True, duration)
+
+    def release(self) -> None:
+        """Give back a half-open probe that ended without an outcome (e.g. cancelled)"""
+        if self.state == HALF_OPEN and self._probes_started > 0:
+            self._probes_started -= 1
+
+    async def call(self, fn: Callable[..., Awaitable], *args, **kwargs) -> Any:
+        """Await fn(*args, **kwargs) through the breaker, raising CircuitOpenError if open"""
+        if not self.allow():
+            raise CircuitOpenError(f"{self.name} circuit is open")
+        started = time.monotonic()
+        try:
+            result = await fn(*args, **kwargs)
+        except asyncio.CancelledError:
+            self.release()
+            raise
+        except Exception:
+            self.record_failure(time.monotonic() - started)
+            raise
+        self.record_success(time.monotonic() - started)
+        return result
+
+    def _record(self, failed: bool, duration: float) -> None:
+        slow = duration >= self.slow_call_seconds
+        self.calls += 1
+        self.failures += failed
+        self.slow_calls += slow
+
+        if self.state == HALF_OPEN:
+            if failed or slow:
+                self._open("half-open probe " + ("failed" if failed else "was slow"))
+                return
+            self._probes_passed += 1
+            if self._probes_passed >= self.half_open_calls:
+                self._window.clear()
+                self._transition(CLOSED, "half-open probes succeeded")
+            return
+        if self.state == OPEN:
+            # A call that was let through before the breaker opened
+            return
+
+        self._window.append((failed, slow))
+        if len(self._window) < self.minimum_calls:
+            return
+        failure_rate = sum(f for f, _ in self._window) / len(self._window)
+        slow_rate = sum(s for _, s in self._window) / len(self._window)
+        if failure_rate >= self.failure_rate:
+            self._open(f"failure rate {failure_rate:.0%}")
+        elif slow_rate >= self.slow_call_rate:
+            self._open(f"slow call rate {slow_rate:.0%}")
+
+    def _open(self, reason: str) -> None:
+        self._opened_at = time.monotonic()
+        self._window.clear()
+        self._transition(OPEN, reason)
+
+    def _transition(self, state: str, reason: str) -> None:
+        print(f"Circuit breaker {self.name}: {self.state} -> {state} ({reason})")
+        self.transitions.append({
+            "from": self.state,
+            "to": state,
+            "reason": reason,
+            "at": datetime.utcnow().isoformat()
+        })
+        self.state = state
+        self._probes_started = 0
+        self._probes_passed = 0
+
+    def stats(self) -> Dict[str, Any]:
+        """State, counters and recent transitions for the status endpoint"""
+        window = len(self._window)
+        return {
+            "state": self.state,
+            "failure_rate": round(sum(f for f, _ in self._window) / window, 4) if window else 0.0,
+            "slow_call_rate": round(sum(s for _, s in self._window) / window, 4) if window else 0.0,
+            "window_calls": window,
+            "calls": self.calls,
+            "failures": self.failures,
+            "slow_calls": self.slow_calls,
+            "rejected": self.rejected,
+            "thresholds": {
+                "failure_rate": self.failure_rate,
+                "slow_call_rate": self.slow_call_rate,
+                "slow_call_seconds": self.slow_call_seconds,
+                "minimum_calls": self.minimum_calls,
+                "open_seconds": self.open_seconds
+            },
+            "transitions": list(self.transitions)
+        }
+
+def breaker_from_env(name: str, prefix: str, slow_call_seconds: float) -> CircuitBreaker:
+    """Breaker configured from <prefix>_BREAKER_* environment variables"""
+    return CircuitBreaker(
+        name,
+        failure_rate=float(os.getenv(f"{prefix}_BREAKER_FAILURE_RATE", "0.5")),
+        slow_call_rate=float(os.getenv(f"{prefix}_BREAKER_SLOW_CALL_RATE", "0.5")),
+        slow_call_seconds=float(os.getenv(f"{prefix}_BREAKER_SLOW_CALL_SECONDS", str(slow_call_seconds))),
+        window_size=int(os.getenv(f"{prefix}_BREAKER_WINDOW", "20")),
+        minimum_calls=int(os.getenv(f"{prefix}_BREAKER_MINIMUM_CALLS", "10")),
+        open_seconds=float(os.getenv(f"{prefix}_BREAKER_OPEN_SECONDS", "30"))
+    )
@@ -0,0 +1,151 @@
+from collections import OrderedDict, deque
+from typing import Awaitable, Callable, Dict, List, Tuple
+import sys
+from singleflight import SingleFlight
+
+# (user_message, bot_response)
+Turn = Tuple[str, str]
+
+class ConversationContext:
+    """Recent turns per (user_id, session_id), kept in memory for Gemini prompts.
+
+    Each session holds a ring buffer of its last `turns_per_session` turns.
+    A session missing from memory is loaded once from the database through
+    `loader`; after that new turns are appended as they are logged, so later
+    prompts in the session need no query. Turns logged while a session is
+    loading are queued and added after the loaded ones. Sessions are evicted least
+    recently used first once there are more than `max_sessions` or more than
+    `max_chars` characters stored in total.
+    """
+
+    def __init__(
+        self,
+        loader: Callable[[int, str, int], Awaitable[List[Turn]]],
+        turns_per_session: int = 10,
+        max_sessions: int = 1000,
+        max_chars: int = 2_000_000
+    ):
+        self.loader = loader
+        self.turns_per_session = turns_per_session
+        self.max_sessions = max_sessions
+        self.max_chars = max_chars
+        self._sessions: "OrderedDict[Tuple[int, str], deque]" = OrderedDict()
+        self._chars = 0
+        # Concurrent misses for one session share a single load
+        self._loads = SingleFlight()
+        # Turns appended to sessions whose load is in flight
+        self._pending: Dict[Tuple[int, str], List[Turn]] = {}
+        self.hits = 0
+        self.loads = 0
+        self.evictions = 0
+
+    async def get(self, user_id: int, session_id: str) -> List[Turn]:
+        """Recent turns of a session, oldest first"""
+        key = (user_id, session_id)
+        turns = self._sessions.get(key)
+        if turns is not None:
+            self.hits += 1
+            self._sessions.move_to_end(key)
+            return list(turns)
+
+        try:
+            loaded = await self._loads.do(key, self._load, key)
+        except Exception as e:
+            print(f"Conversation context load error: {e}")
+            return []
+        return list(loaded)
+
+    async def _load(self, key: Tuple[int, str]) -> deque:
+        self.loads += 1
+        self._pending[key] = []
+        try:
+            turns = list(await self.loader(key[0], key[1], self.turns_per_session))
+        finally:
+            pending = self._pending.pop(key)
+        # start() may have created the buffer while the load was running
+        if key not in self._sessions:
+            self._sessions[key] = deque(maxlen=self.turns_per_session)
+            for turn in turns:
+                self._push(key, turn)
+            # The log is written in batches, so the load may or may not
+            # already hold the queued turns; skip those it ends with
+            overlap = next(
+                size for size in range(min(len(turns), len(pending)), -1, -1)
+                if turns[len(turns) - size:] == pending[:size]
+            )
+            pending = pending[overlap:]
+        for turn in pending:
+            self._push(key, turn)
+        self._evict()
+        return self._sessions.get(key, deque())
+
+    def start(self, user_id: int, session_id: str) -> None:
+        """Add an empty buffer for a brand-new session, which has nothing to load"""
+        key = (user_id, session_id)
+        if key not in self._sessions:
+            self._sessions[key] = deque(maxlen=self.turns_per_session)
+            self._evict()
+
+    def append(self, user_id: int, session_id: str, user_message: str, bot_response: str) -> None:
+        """Add a logged turn to the session's buffer, if the session is in memory"""
+        key = (user_id, session_id)
+        if key in self._pending:
+            self._pending[key].append((user_message, bot_response))
+            return
+        if key not in self._sessions:
+            # Not loaded yet: the next get() reads it, this turn included, from the database
+            return
+        self._sessions.move_to_end(key)
+        self._push(key, (user_message, bot_response))
+        self._evict()
+
+    def _push(self, key: Tuple[int, str], turn: Turn) -> None:
+        turns = self._sessions[key]
+        if len(turns) == turns.maxlen:
+            self._chars -= self._turn_chars(turns[0])
+        turns.append(turn)
+        self._chars += self._turn_chars(turn)
+
+    def _evict(self) -> None:
+        # The most recently used session is kept even if it alone is over max_chars
+        while len(self._sessions) > 1 and (
+            len(self._sessions) > self.max_sessions or self._chars > self.max_chars
+        ):
+            _, turns = self._sessions.popitem(last=False)
+            self._chars -= sum(self._turn_chars(turn) for turn in turns)
+            self.evictions += 1
+
+    @staticmethod
+    def _turn_chars(turn: Turn) -> int:
+        return len(turn[0]) + len(turn[1])
+
+    @staticmethod
+    def format(turns: List[Turn], budget_chars: int) -> str:
+        """Transcript of the most recent turns that fit in budget_chars"""
+        lines: List[str] = []
+        used = 0
+        for user_message, bot_response in reversed(turns):
+            entry = f"User: {user_message}\nMelvis: {bot_response}"
+            if used + len(entry) > budget_chars:
+                break
+            lines.append(entry)
+            used += len(entry) + 1
+        return "\n".join(reversed(lines))
+
+    def stats(self) -> Dict:
+        """Counters for the /metrics endpoint"""
+        sessions = len(self._sessions)
+        memory = sum(
+            sys.getsizeof(turns) + sum(sys.getsizeof(text) for turn in turns for text in turn)
+            for turns in self._sessions.values()
+        )
+        return {
+            "sessions": sessions,
+            "max_sessions": self.max_sessions,
+            "stored_chars": self._chars,
+            "max_chars": self.max_chars,
+            "bytes_per_session": round(memory / sessions) if sessions else 0,
+            "queries_avoided": self.hits,
+            "loads": self.loads,
+            "evictions": self.evictions
+        }
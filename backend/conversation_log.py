@@ -0,0 +1,203 @@
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+import asyncio
+import uuid
+from background import BackgroundWriter
+from services import ConversationService
+
+class ConversationLogger:
+    """Write-behind log for chat turns.
+
+    Records are queued in memory and written in multi-row batches once
+    `batch_size` records are waiting or `flush_interval` seconds have passed
+    since the oldest one arrived. The queue is bounded: when it is full,
+    producers wait up to `put_timeout` seconds and then write their record
+    directly, so nothing is dropped. A batch that fails to write is kept and
+    retried at the next flush, ahead of newer records. Queued records are
+    numbered in order, so a history read can flush just up to the user's own
+    latest turn instead of waiting for everyone's.
+    """
+
+    def __init__(
+        self,
+        writer: BackgroundWriter,
+        max_queue: int = 1000,
+        batch_size: int = 100,
+        flush_interval: float = 0.5,
+        put_timeout: float = 2.0,
+        shutdown_timeout: float = 30.0
+    ):
+        self.writer = writer
+        self.max_queue = max_queue
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.put_timeout = put_timeout
+        self.shutdown_timeout = shutdown_timeout
+        self._queue: Optional[asyncio.Queue] = None
+        self._batch_ready: Optional[asyncio.Event] = None
+        self._written: Optional[asyncio.Condition] = None
+        self._task: Optional[asyncio.Task] = None
+        # Queued records are (seq, record); every seq up to _written_seq is in the database
+        self._seq = 0
+        self._written_seq = 0
+        self._last_seq_by_user: Dict[int, int] = {}
+        # Records whose write failed, retried before anything newer; seq is None for direct writes
+        self._retained: List[Tuple[Optional[int], Dict]] = []
+        self._flush_requests = 0
+        self.batches_written = 0
+        self.records_written = 0
+        self.direct_writes = 0
+        self.write_errors = 0
+
+    def start(self) -> None:
+        """Start the flush loop on the running event loop"""
+        if self._task is None:
+            self._queue = asyncio.Queue(maxsize=self.max_queue)
+            self._batch_ready = asyncio.Event()
+            self._written = asyncio.Condition()
+            self._task = asyncio.create_task(self._run())
+
+    async def log(
+        self,
+        user_id: int,
+        user_message: str,
+        bot_response: str,
+        intent: str,
+        confidence: float,
+        session_id: Optional[str] = None
+    ) -> None:
+        """Queue a conversation turn for writing"""
+        self.start()
+        record = {
+            "user_id": user_id,
+            "session_id": session_id or str(uuid.uuid4()),
+            "user_message": user_message,
+            "bot_response": bot_response,
+            "intent": intent,
+            "confidence": float(confidence),
+            # Stamp now rather than at flush time so ordering reflects the chat
+            "created_at": datetime.utcnow()
+        }
+        self._seq += 1
+        seq = self._seq
+        try:
+            await asyncio.wait_for(self._queue.put((seq, record)), timeout=self.put_timeout)
+        except asyncio.TimeoutError:
+            # Backpressure did not clear in time: write through instead of dropping
+            self.direct_writes += 1
+            if not await self._write([record]):
+                self._retained.append((None, record))
+            return
+
+        self._last_seq_by_user[user_id] = max(seq, self._last_seq_by_user.get(user_id, 0))
+        if self._queue.qsize() >= self.batch_size:
+            self._batch_ready.set()
+
+    async def _run(self) -> None:
+        while True:
+            if self._retained:
+                # The last write failed: retry at the next flush, before newer records
+                await self._wait_for_batch()
+                batch, self._retained = self._retained, []
+            else:
+                batch = [await self._queue.get()]
+                # Wait for a full batch or the flush interval, whichever comes
+                # first, unless someone is waiting on a flush
+                if self._flush_requests == 0 and self._queue.qsize() + 1 < self.batch_size:
+                    await self._wait_for_batch()
+            self._batch_ready.clear()
+
+            while len(batch) < self.batch_size and not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+
+            if not await self._write([record for _, record in batch]):
+                self._retained = batch + self._retained
+                continue
+            await self._mark_written(batch)
+
+    async def _wait_for_batch(self) -> None:
+        try:
+            await asyncio.wait_for(self._batch_ready.wait(), timeout=self.flush_interval)
+        except asyncio.TimeoutError:
+            pass
+
+    async def _write(self, batch: List[Dict]) -> bool:
+        """Write a batch, retrying briefly; False if it is still unwritten"""
+        for attempt in range(3):
+            try:
+                await self.writer.run(ConversationService.create_conversations_bulk, batch)
+                self.batches_written += 1
+                self.records_written += len(batch)
+                return True
+            except Exception as e:
+                print(f"Conversation log write error (attempt {attempt + 1}): {e}")
+                await asyncio.sleep(0.1 * 2 ** attempt)
+        self.write_errors += 1
+        print(f"Keeping {len(batch)} conversation records to retry at the next flush")
+        return False
+
+    async def _mark_written(self, batch: List[Tuple[Optional[int], Dict]]) -> None:
+        for seq, record in batch:
+            if seq is None:
+                continue
+            user_id = record["user_id"]
+            if self._last_seq_by_user.get(user_id, 0) <= seq:
+                self._last_seq_by_user.pop(user_id, None)
+            # Batches are written in queue order, so every earlier seq is written too
+            self._written_seq = max(self._written_seq, seq)
+            self._queue.task_done()
+        async with self._written:
+            self._written.notify_all()
+
+    def has_pending(self, user_id: int) -> bool:
+        return self._last_seq_by_user.get(user_id, 0) > self._written_seq
+
+    async def flush(self) -> None:
+        """Wait until every queued record has been written"""
+        if self._queue is None:
+            return
+        self._flush_requests += 1
+        try:
+            self._batch_ready.set()
+            await self._queue.join()
+        finally:
+            self._flush_requests -= 1
+
+    async def flush_user(self, user_id: int) -> None:
+        """Make a user's queued turns visible to reads.
+
+        Waits only for records queued up to the user's latest one, not for
+        records other users queue meanwhile.
+        """
+        if not self.has_pending(user_id):
+            return
+        target = self._last_seq_by_user[user_id]
+        self._flush_requests += 1
+        try:
+            self._batch_ready.set()
+            async with self._written:
+                await self._written.wait_for(lambda: self._written_seq >= target)
+        finally:
+            self._flush_requests -= 1
+
+    async def shutdown(self) -> None:
+        """Drain the queue, then stop the flush loop"""
+        try:
+            await asyncio.wait_for(self.flush(), timeout=self.shutdown_timeout)
+        except asyncio.TimeoutError:
+            unwritten = len(self._retained) + (self._queue.qsize() if self._queue is not None else 0)
+            print(f"Dropped {unwritten} conversation records unwritten at shutdown")
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    def stats(self) -> Dict:
+        return {
+            "queued": self._queue.qsize() if self._queue is not None else 0,
+            "max_queue": self.max_queue,
+            "batches_written": self.batches_written,
+            "records_written": self.records_written,
+            "direct_writes": self.direct_writes,
+            "write_errors": self.write_errors,
+            "retained": len(self._retained)
+        }
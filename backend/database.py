@@ -1,21 +1,113 @@
-from sqlalchemy import create_engine, MetaData, Column, Integer, String, Text, DateTime, Float, Boolean, ForeignKey
+from sqlalchemy import create_engine, event, text, Index, UniqueConstraint, MetaData, Column, Integer, String, Text, DateTime, Float, Boolean, ForeignKey
 from sqlalchemy.orm import declarative_base, sessionmaker, Session, relationship
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 from sqlalchemy.sql import func
 from datetime import datetime
+import asyncio
 import os
 
 # Database configuration
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./melvis.db")
+IS_SQLITE = DATABASE_URL.startswith("sqlite")
+IS_SQLITE_MEMORY = IS_SQLITE and (":memory:" in DATABASE_URL or DATABASE_URL.rstrip("/") == "sqlite:")
+
+# SQLite performance profiles, applied to every new connection. "production"
+# enables WAL so readers no longer block on the writer; "default" leaves
+# SQLite's own settings alone. Individual pragmas can be overridden below.
+SQLITE_PROFILES = {
+    "default": {},
+    "production": {
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "busy_timeout": "5000",        # ms to wait on a lock before "database is locked"
+        "cache_size": "-64000",        # negative means KiB, i.e. 64 MB page cache
+        "mmap_size": "268435456",      # 256 MB memory-mapped I/O
+        "temp_store": "MEMORY",
+    },
+}
+
+SQLITE_PROFILE = os.getenv("SQLITE_PROFILE", "production")
+
+def _sqlite_pragmas() -> dict:
+    if SQLITE_PROFILE not in SQLITE_PROFILES:
+        raise ValueError(f"Unknown SQLITE_PROFILE {SQLITE_PROFILE!r}, expected one of {sorted(SQLITE_PROFILES)}")
+    pragmas = dict(SQLITE_PROFILES[SQLITE_PROFILE])
+    for name in ("journal_mode", "synchronous", "busy_timeout", "cache_size", "mmap_size", "temp_store"):
+        value = os.getenv(f"SQLITE_{name.upper()}")
+        if value:
+            pragmas[name] = value
+    return pragmas
+
+SQLITE_PRAGMAS = _sqlite_pragmas() if IS_SQLITE else {}
+
+def _apply_sqlite_pragmas(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    try:
+        for name, value in SQLITE_PRAGMAS.items():
+            cursor.execute(f"PRAGMA {name}={value}")
+    finally:
+        cursor.close()
+
+# Connection pool sizing (in-memory SQLite uses a single shared connection instead)
+POOL_OPTIONS = {} if IS_SQLITE_MEMORY else {
+    "pool_size": int(os.getenv("DB_POOL_SIZE", "5")),
+    "max_overflow": int(os.getenv("DB_MAX_OVERFLOW", "10")),
+    "pool_timeout": float(os.getenv("DB_POOL_TIMEOUT", "30")),
+}
 
 # Create engine
 engine = create_engine(
     DATABASE_URL,
-    connect_args={"check_same_thread": False} if DATABASE_URL.startswith("sqlite") else {}
+    connect_args={"check_same_thread": False} if IS_SQLITE else {},
+    **POOL_OPTIONS
 )
 
 # Create sessionmaker
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Async engine for request handlers; the sync engine above stays in use for
+# startup, background writes and scripts
+def _async_database_url(url: str) -> str:
+    if url.startswith("sqlite:"):
+        return url.replace("sqlite:", "sqlite+aiosqlite:", 1)
+    return url
+
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL", _async_database_url(DATABASE_URL))
+
+# aiosqlite defaults to NullPool for files, which would reopen the database
+# (and rerun the pragmas) on every request, so pool explicitly
+async_engine = create_async_engine(
+    ASYNC_DATABASE_URL,
+    **(dict(POOL_OPTIONS, poolclass=AsyncAdaptedQueuePool) if POOL_OPTIONS else {})
+)
+
+if IS_SQLITE:
+    event.listen(engine, "connect", _apply_sqlite_pragmas)
+    event.listen(async_engine.sync_engine, "connect", _apply_sqlite_pragmas)
+
+# Objects stay usable after commit, there is no implicit lazy refresh under asyncio
+AsyncSessionLocal = async_sessionmaker(
+    bind=async_engine, autoflush=False, expire_on_commit=False
+)
+
+async def checkpoint_wal(mode: str = "PASSIVE") -> None:
+    """Fold the WAL back into the main database file so it does not grow unbounded"""
+    async with async_engine.connect() as conn:
+        await conn.execute(text(f"PRAGMA wal_checkpoint({mode})"))
+
+async def run_wal_checkpoints(interval: float) -> None:
+    """Checkpoint the WAL every `interval` seconds until cancelled"""
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await checkpoint_wal()
+        except Exception as e:
+            print(f"WAL checkpoint error: {e}")
+
+def uses_wal() -> bool:
+    return str(SQLITE_PRAGMAS.get("journal_mode", "")).upper() == "WAL"
+
 # Create base class
 Base = declarative_base()
 
@@ -37,6 +129,18 @@ class User(Base):
     conversations = relationship("Conversation", back_populates="user")
     assessments = relationship("Assessment", back_populates="user")
 
+class RefreshToken(Base):
+    """Rotating refresh token; only a keyed hash of the token is stored"""
+    __tablename__ = "refresh_tokens"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    token_hash = Column(String(64), unique=True, index=True, nullable=False)
+    family_id = Column(String(36), index=True, nullable=False)  # All rotations of one login
+    expires_at = Column(DateTime(timezone=True), nullable=False)
+    revoked_at = Column(DateTime(timezone=True), nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
 class Conversation(Base):
     __tablename__ = "conversations"
     
@@ -52,6 +156,31 @@ class Conversation(Base):
     # Relationships
     user = relationship("User", back_populates="conversations")
 
+    # History is read per user, optionally per session, newest first
+    __table_args__ = (
+        Index("ix_conversations_user_created", "user_id", "created_at"),
+        Index("ix_conversations_user_session_created", "user_id", "session_id", "created_at"),
+    )
+
+class ConversationSession(Base):
+    """Per-session summary, maintained on every conversation insert"""
+    __tablename__ = "conversation_sessions"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    session_id = Column(String(255), nullable=False)
+    first_message_at = Column(DateTime(timezone=True), nullable=False)
+    last_message_at = Column(DateTime(timezone=True), nullable=False)
+    message_count = Column(Integer, nullable=False, default=0)
+    intent_counts = Column(Text, nullable=False, default="{}")  # JSON {intent: count}
+    dominant_intent = Column(String(50), nullable=True)
+    last_snippet = Column(String(200), nullable=True)
+    
+    __table_args__ = (
+        UniqueConstraint("user_id", "session_id", name="uq_conversation_sessions_user_session"),
+        Index("ix_conversation_sessions_user_last", "user_id", "last_message_at"),
+    )
+
 class Assessment(Base):
     __tablename__ = "assessments"
     
@@ -73,11 +202,15 @@ class Assessment(Base):
     # Relationships
     user = relationship("User", back_populates="assessments")
 
+    __table_args__ = (
+        Index("ix_assessments_user_created", "user_id", "created_at"),
+    )
+
 class VideoRecommendation(Base):
     __tablename__ = "video_recommendations"
     
     id = Column(Integer, primary_key=True, index=True)
-    video_id = Column(String(255), nullable=False)
+    video_id = Column(String(255), unique=True, index=True, nullable=False)
     title = Column(String(500), nullable=False)
     description = Column(Text, nullable=True)
     thumbnail_url = Column(String(500), nullable=True)
@@ -88,6 +221,33 @@ class VideoRecommendation(Base):
     is_active = Column(Boolean, default=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
 
+class VideoSearchResult(Base):
+    """One video of a cached YouTube search: its position in the results for
+    a normalized query and when the API returned it"""
+    __tablename__ = "video_search_results"
+
+    id = Column(Integer, primary_key=True)
+    search_query = Column(String(255), nullable=False)
+    video_id = Column(String(255), ForeignKey("video_recommendations.video_id"), nullable=False)
+    rank = Column(Integer, nullable=False)
+    cached_at = Column(DateTime(timezone=True), nullable=False)
+
+    __table_args__ = (
+        UniqueConstraint("search_query", "video_id", name="uq_video_search_results_query_video"),
+        Index("ix_video_search_results_query_rank", "search_query", "rank"),
+    )
+
+class CachedResponse(Base):
+    """Gemini reply stored under the fingerprint of a normalized message"""
+    __tablename__ = "response_cache"
+
+    id = Column(Integer, primary_key=True, index=True)
+    fingerprint = Column(String(64), unique=True, index=True, nullable=False)
+    message = Column(Text, nullable=False)  # Normalized terms the fingerprint is taken over
+    response = Column(Text, nullable=False)
+    latency = Column(Float, nullable=False)  # Seconds the Gemini call took
+    created_at = Column(DateTime(timezone=True), nullable=False)
+
 # Database dependency
 def get_db():
     db = SessionLocal()
@@ -96,13 +256,22 @@ def get_db():
     finally:
         db.close()
 
+# Async database dependency
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
 # Create tables
 def create_tables():
     Base.metadata.create_all(bind=engine)
 
 # Initialize database
 def init_db():
-    create_tables()
+    # Imported here because migrations needs the models defined above
+    from migrations import migrate
+    applied = migrate(engine)
+    if applied:
+        print(f"Applied database migrations: {', '.join(str(version) for version in applied)}")
     print("Database initialized successfully!")
 
 if __name__ == "__main__":
@@ -0,0 +1,85 @@
+from typing import Any, Awaitable, Callable, Dict, Hashable
+import asyncio
+import hashlib
+import json
+from fastapi import HTTPException, status
+from cache import TTLCache
+from singleflight import SingleFlight
+
+# Longest Idempotency-Key header accepted
+MAX_KEY_LENGTH = 255
+
+class IdempotencyStore:
+    """Replays the first completed response for a repeated idempotency key.
+
+    Completed responses are kept in a bounded TTLCache together with a hash of
+    the request they answered; reusing a key for a different request is a
+    422. Requests that arrive while the first one with their key is still
+    running wait for it instead of doing the work again: the same request
+    gets its response as a replay, a different one gets the 422. Failed
+    requests are not remembered, so a retry after an error runs afresh.
+    """
+
+    def __init__(self, max_size: int = 10000, ttl: float = 3600):
+        self.completed = TTLCache(max_size=max_size, ttl=ttl)
+        self.inflight = SingleFlight()
+        self.replayed = 0
+
+    @staticmethod
+    def request_hash(payload: Dict) -> str:
+        return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode()).hexdigest()
+
+    @staticmethod
+    def _check(stored_hash: str, request_hash: str) -> None:
+        if stored_hash != request_hash:
+            raise HTTPException(
+                status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                detail="Idempotency-Key was already used for a different request"
+            )
+
+    def lookup(self, key: Hashable, request_hash: str) -> Any:
+        """Stored response for key, or None; raises 422 if key was used for another request"""
+        entry = self.completed.get(key)
+        if entry is None:
+            return None
+        stored_hash, response = entry
+        self._check(stored_hash, request_hash)
+        return response
+
+    async def run(self, key: Hashable, request_hash: str, fn: Callable[..., Awaitable], *args) -> tuple:
+        """Return (response, replayed), running fn(*args) at most once per key"""
+        response = self.lookup(key, request_hash)
+        if response is not None:
+            self.replayed += 1
+            return response, True
+        # Coalesce on the key alone; whoever joins a running call checks the
+        # hash of the request that started it, and only that caller ran fn
+        caller = object()
+        started_by, stored_hash, response = await self.inflight.do(
+            key, self._complete, caller, key, request_hash, fn, *args
+        )
+        self._check(stored_hash, request_hash)
+        if started_by is caller:
+            return response, False
+        self.replayed += 1
+        return response, True
+
+    async def _complete(self, caller: object, key: Hashable, request_hash: str,
+                        fn: Callable[..., Awaitable], *args) -> tuple:
+        response = await fn(*args)
+        self.completed.set(key, (request_hash, response))
+        return caller, request_hash, response
+
+    async def purge_periodically(self, interval: float) -> None:
+        """Drop expired responses every interval seconds until cancelled"""
+        while True:
+            await asyncio.sleep(interval)
+            self.completed.purge_expired()
+
+    def stats(self) -> Dict[str, Any]:
+        """Counters for the /metrics endpoint"""
+        stats = self.completed.stats()
+        stats["replayed"] = self.replayed
+        stats["coalesced"] = self.inflight.coalesced
+        stats["in_flight"] = self.inflight.stats()["in_flight"]
+        return stats
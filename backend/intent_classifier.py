@@ -0,0 +1,386 @@
+from typing import Dict, List, NamedTuple, Optional
+from datetime import datetime
+import hashlib
+import json
+import os
+import threading
+import time
+import numpy as np
+from scipy import sparse
+
+from keyword_matcher import KeywordMatcher
+from tfidf import TfidfModel
+
+# Bump when the artifact layout changes; older artifacts are refit
+ARTIFACT_VERSION = 2
+
+VECTORIZER_PARAMS = {"stop_words": "english", "ngram_range": [1, 2]}
+
+# Prebuilt model, written as <path>.npz (arrays) and <path>.json (metadata)
+MODEL_PATH = os.getenv(
+    "INTENT_MODEL_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "intent_model")
+)
+
+# Keywords that let an unclassified message through to Gemini
+MENTAL_HEALTH_KEYWORDS = [
+    'mental', 'health', 'anxiety', 'depression', 'stress', 'emotional', 'feeling',
+    'mood', 'therapy', 'counseling', 'wellbeing', 'wellness', 'mindfulness',
+    'meditation', 'self-care', 'support', 'help', 'cope', 'coping', 'overwhelmed',
+    'sad', 'happy', 'angry', 'frustrated', 'worried', 'fear', 'panic', 'sleep',
+    'tired', 'exhausted', 'burnout', 'lonely', 'isolation', 'relationship'
+]
+
+class MessageScan(NamedTuple):
+    """Keyword hits per intent plus the mental-health gate, from one pass"""
+    intent_hits: Dict[str, int]
+    mental_health: bool
+
+# Intent classification system
+class IntentClassifier:
+    def __init__(self, model_path: str = MODEL_PATH):
+        self.intents = {
+            "anxiety": {
+                "keywords": ["anxious", "anxiety", "worried", "stress", "panic", "nervous", "overwhelmed", "fear"],
+                "responses": [
+                    "I understand you're feeling anxious. Anxiety is a common experience, and there are effective ways to manage it.",
+                    "It sounds like you're dealing with some anxiety. Let's explore some techniques that might help you feel more grounded.",
+                    "I hear that you're feeling overwhelmed. Anxiety can be challenging, but there are strategies we can discuss."
+                ],
+                "video_keywords": ["anxiety relief", "breathing exercises", "anxiety management", "calm anxiety"]
+            },
+            "depression": {
+                "keywords": ["depressed", "depression", "sad", "hopeless", "empty", "down", "low mood", "worthless"],
+                "responses": [
+                    "I'm sorry you're feeling this way. Depression can be very difficult, but please know that you're not alone.",
+                    "It takes courage to reach out when you're feeling depressed. I'm here to support you.",
+                    "These feelings are valid, and it's important that you're talking about them. Let's explore some ways to help."
+                ],
+                "video_keywords": ["depression help", "mental health support", "overcoming depression", "depression recovery"]
+            },
+            "stress": {
+                "keywords": ["stressed", "stress", "pressure", "overwhelmed", "burnout", "exhausted", "tired"],
+                "responses": [
+                    "Stress can be really challenging to manage. Let's talk about some effective stress-reduction techniques.",
+                    "It sounds like you're under a lot of pressure. Stress is your body's natural response, and there are healthy ways to cope.",
+                    "I understand you're feeling stressed. Let's explore some strategies to help you manage these feelings."
+                ],
+                "video_keywords": ["stress relief", "stress management", "relaxation techniques", "burnout recovery"]
+            },
+            "sleep": {
+                "keywords": ["sleep", "insomnia", "tired", "exhausted", "can't sleep", "sleepless", "nightmares"],
+                "responses": [
+                    "Sleep issues can significantly impact your mental health. Let's discuss some strategies for better sleep hygiene.",
+                    "Getting quality sleep is crucial for mental wellness. I can share some techniques that might help.",
+                    "Sleep difficulties are common and treatable. Let's explore some approaches to improve your rest."
+                ],
+                "video_keywords": ["sleep hygiene", "insomnia help", "better sleep", "sleep meditation"]
+            },
+            "self_care": {
+                "keywords": ["self care", "self-care", "wellness", "healthy habits", "routine", "balance"],
+                "responses": [
+                    "Self-care is so important for mental health. Let's explore some practices that might work for you.",
+                    "Taking care of yourself is not selfish—it's necessary. What aspects of self-care interest you most?",
+                    "Building healthy self-care routines can make a significant difference in how you feel."
+                ],
+                "video_keywords": ["self care routine", "mental health wellness", "self care tips", "healthy habits"]
+            },
+            "general": {
+                "keywords": ["help", "support", "talk", "listen", "advice", "guidance"],
+                "responses": [
+                    "I'm here to listen and support you. What's on your mind today?",
+                    "Thank you for reaching out. I'm here to help in whatever way I can.",
+                    "I'm glad you're here. What would you like to talk about?"
+                ],
+                "video_keywords": ["mental health support", "emotional wellness", "self help", "mental health tips"]
+            }
+        }
+        
+        # Training texts for the TF-IDF model: one row per keyword
+        self.training_texts = []
+        self.intent_labels = []
+        for intent, data in self.intents.items():
+            for keyword in data["keywords"]:
+                self.training_texts.append(keyword)
+                self.intent_labels.append(intent)
+
+        # Fitted model (vocabulary, idf, intent matrix); loaded on first use
+        self.model_path = model_path
+        self._model: Optional[dict] = None
+        self._model_lock = threading.Lock()
+
+        # One compiled matcher for every intent's keywords and the mental-health gate
+        self.intent_names = list(self.intents)
+        self.matcher = KeywordMatcher({
+            **{intent: data["keywords"] for intent, data in self.intents.items()},
+            "__mental_health__": MENTAL_HEALTH_KEYWORDS
+        })
+
+    @property
+    def fingerprint(self) -> str:
+        """Hash of the training data and vectorizer settings the model depends on"""
+        source = json.dumps(
+            {"texts": self.training_texts, "labels": self.intent_labels, "vectorizer": VECTORIZER_PARAMS},
+            sort_keys=True
+        )
+        return hashlib.sha256(source.encode()).hexdigest()
+
+    def load(self) -> dict:
+        """Load the prebuilt model artifact, refitting if it is missing or stale"""
+        if self._model is None:
+            with self._model_lock:
+                if self._model is None:
+                    model = load_artifact(self.model_path, self.fingerprint)
+                    if model is None:
+                        model = self.fit()
+                    self._model = model
+        return self._model
+
+    def fit(self) -> dict:
+        """Fit the TF-IDF model on the intent keywords (needs scikit-learn)"""
+        vectorizer = _sklearn_vectorizer()
+        intent_vectors = vectorizer.fit_transform(self.training_texts).tocsr()
+        vocabulary = sorted(vectorizer.vocabulary_, key=vectorizer.vocabulary_.get)
+        return _build_model(vocabulary, vectorizer.idf_, sorted(vectorizer.get_stop_words()), intent_vectors)
+
+    def vectorize(self, texts: List[str]):
+        """L2-normalized TF-IDF rows for already-lowercased texts"""
+        return self.load()["tfidf"].transform(texts)
+
+    def similarities(self, texts: List[str]) -> np.ndarray:
+        """Cosine similarity of each text against every intent keyword row"""
+        # Both sides are L2-normalized, so the dot product is the cosine
+        return (self.vectorize(texts) @ self.load()["intent_vectors"].T).toarray()
+
+    def scan(self, message: str) -> MessageScan:
+        """Count keyword hits per intent and check the mental-health gate"""
+        counts = self.matcher.count(message)
+        return MessageScan(
+            intent_hits={intent: counts[intent] for intent in self.intent_names},
+            mental_health=counts["__mental_health__"] > 0
+        )
+
+    def classify_intent(self, message: str, scan: Optional[MessageScan] = None) -> tuple:
+        """Classify the intent of a message and return intent with confidence"""
+        message_lower = message.lower()
+        if scan is None:
+            scan = self.scan(message)
+        
+        # Simple keyword matching first
+        max_matches = 0
+        best_intent = "general"
+        
+        for intent in self.intent_names:
+            matches = scan.intent_hits[intent]
+            if matches > max_matches:
+                max_matches = matches
+                best_intent = intent
+        
+        # Use TF-IDF for more sophisticated matching
+        similarities = self.similarities([message_lower]).flatten()
+        
+        if len(similarities) > 0:
+            max_similarity_idx = np.argmax(similarities)
+            max_similarity = similarities[max_similarity_idx]
+            
+            if max_similarity > 0.1:  # Minimum confidence threshold
+                vector_intent = self.intent_labels[max_similarity_idx]
+                confidence = max_similarity
+                
+                # Combine keyword and vector results
+                if max_matches > 0:
+                    confidence = min(1.0, confidence + (max_matches * 0.1))
+                    return best_intent, confidence
+                else:
+                    return vector_intent, confidence
+        
+        # Return keyword-based result with adjusted confidence
+        confidence = min(1.0, max_matches * 0.2) if max_matches > 0 else 0.1
+        return best_intent, confidence
+
+    def classify_many(self, messages: List[str]) -> List[tuple]:
+        """Classify a batch of messages; same results as classify_intent per message.
+
+        The batch is vectorized once and scored against the intent matrix in a
+        single sparse product, and keyword boosts are applied array-wide.
+        """
+        if not messages:
+            return []
+        messages_lower = [message.lower() for message in messages]
+
+        # Keyword hits per message, summed per intent
+        matches = np.array(
+            [[hits[intent] for intent in self.intent_names]
+             for hits in (self.scan(message).intent_hits for message in messages_lower)],
+            dtype=np.int64
+        ).reshape(len(messages_lower), len(self.intent_names))
+        max_matches = matches.max(axis=1)
+        # argmax keeps the first of tied intents, like the strict > in the scalar loop
+        keyword_intent = np.where(max_matches > 0, matches.argmax(axis=1), -1)
+
+        similarities = self.similarities(messages_lower)
+        best_vector = similarities.argmax(axis=1)
+        max_similarity = similarities[np.arange(len(messages_lower)), best_vector]
+
+        use_vector = max_similarity > 0.1
+        confidence = np.where(
+            use_vector,
+            np.where(
+                max_matches > 0,
+                np.minimum(1.0, max_similarity + max_matches * 0.1),
+                max_similarity
+            ),
+            np.where(max_matches > 0, np.minimum(1.0, max_matches * 0.2), 0.1)
+        )
+
+        results = []
+        for i in range(len(messages_lower)):
+            if keyword_intent[i] >= 0:
+                intent = self.intent_names[keyword_intent[i]]
+            elif use_vector[i]:
+                intent = self.intent_labels[best_vector[i]]
+            else:
+                intent = "general"
+            results.append((intent, float(confidence[i])))
+        return results
+
+    def get_response(self, intent: str) -> str:
+        """Get a response for the given intent"""
+        import random
+        return random.choice(self.intents[intent]["responses"])
+
+    def get_video_keywords(self, intent: str) -> List[str]:
+        """Get video search keywords for the given intent"""
+        return self.intents[intent]["video_keywords"]
+    
+    def should_use_fallback(self, confidence: float) -> bool:
+        """Determine if we should fallback to Gemini API based on confidence"""
+        # Use fallback if confidence is below threshold (0.3)
+        return confidence < 0.3
+
+def _sklearn_vectorizer():
+    """The scikit-learn vectorizer the model is fitted with"""
+    from sklearn.feature_extraction.text import TfidfVectorizer
+
+    return TfidfVectorizer(
+        stop_words=VECTORIZER_PARAMS["stop_words"],
+        ngram_range=tuple(VECTORIZER_PARAMS["ngram_range"])
+    )
+
+def _build_model(vocabulary: List[str], idf: np.ndarray, stop_words: List[str], intent_vectors) -> dict:
+    """In-memory model from the fitted vocabulary, idf weights and intent matrix"""
+    return {
+        "vocabulary": vocabulary,
+        "idf": np.asarray(idf, dtype=np.float64),
+        "stop_words": stop_words,
+        "intent_vectors": sparse.csr_matrix(intent_vectors),
+        "tfidf": TfidfModel(vocabulary, idf, stop_words, tuple(VECTORIZER_PARAMS["ngram_range"]))
+    }
+
+def _file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 16), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+def save_artifact(classifier: IntentClassifier, path: str = MODEL_PATH) -> dict:
+    """Fit the classifier and write its model artifact; returns the metadata"""
+    model = classifier.fit()
+    intent_vectors = model["intent_vectors"]
+    np.savez(
+        path + ".npz",
+        idf=model["idf"],
+        data=intent_vectors.data,
+        indices=intent_vectors.indices,
+        indptr=intent_vectors.indptr,
+        shape=np.array(intent_vectors.shape)
+    )
+    metadata = {
+        "version": ARTIFACT_VERSION,
+        "created_at": datetime.utcnow().isoformat(),
+        "fingerprint": classifier.fingerprint,
+        "checksum": _file_sha256(path + ".npz"),
+        "vectorizer": VECTORIZER_PARAMS,
+        "vocabulary": model["vocabulary"],
+        "stop_words": model["stop_words"],
+        "labels": classifier.intent_labels
+    }
+    with open(path + ".json", "w") as f:
+        json.dump(metadata, f)
+    return metadata
+
+def load_artifact(path: str, fingerprint: str) -> Optional[dict]:
+    """Load a model artifact, or None if it is missing, corrupt or stale"""
+    try:
+        with open(path + ".json") as f:
+            metadata = json.load(f)
+    except FileNotFoundError:
+        print(f"Intent model artifact {path}.json not found, fitting at startup")
+        return None
+    except Exception as e:
+        print(f"Error reading intent model artifact: {e}")
+        return None
+
+    if metadata.get("version") != ARTIFACT_VERSION:
+        print("Intent model artifact has an old version, fitting at startup")
+        return None
+    if metadata.get("fingerprint") != fingerprint:
+        print("Intent model artifact does not match the intents table, fitting at startup")
+        return None
+    try:
+        if _file_sha256(path + ".npz") != metadata["checksum"]:
+            print("Intent model artifact failed checksum validation, fitting at startup")
+            return None
+        with np.load(path + ".npz") as arrays:
+            intent_vectors = sparse.csr_matrix(
+                (arrays["data"], arrays["indices"], arrays["indptr"]), shape=tuple(arrays["shape"])
+            )
+            return _build_model(metadata["vocabulary"], arrays["idf"], metadata["stop_words"], intent_vectors)
+    except Exception as e:
+        print(f"Error loading intent model artifact: {e}")
+        return None
+
+# Messages the NumPy transform is checked against scikit-learn on
+VERIFY_CORPUS = [
+    "I feel anxious and worried about my exams",
+    "I can't sleep, I keep having nightmares",
+    "Everything feels hopeless and empty lately",
+    "Work pressure is giving me burnout",
+    "What are some healthy habits for a self care routine?",
+    "Can we talk? I need some advice and support",
+    "The crusade continues tomorrow",
+    "sleep sleep sleep, low mood low mood",
+    "",
+    "!!!"
+]
+
+def verify(classifier: IntentClassifier, corpus: List[str] = VERIFY_CORPUS) -> float:
+    """Largest difference between the NumPy and scikit-learn transforms on corpus"""
+    vectorizer = _sklearn_vectorizer()
+    vectorizer.fit(classifier.training_texts)
+    texts = classifier.training_texts + [text.lower() for text in corpus]
+    expected = vectorizer.transform(texts).toarray()
+
+    model = classifier.fit()
+    if model["vocabulary"] != sorted(vectorizer.vocabulary_, key=vectorizer.vocabulary_.get):
+        raise AssertionError("vocabulary differs from scikit-learn")
+    actual = model["tfidf"].transform(texts).toarray()
+    if actual.shape != expected.shape:
+        raise AssertionError(f"shape {actual.shape} differs from scikit-learn {expected.shape}")
+    return float(np.abs(actual - expected).max()) if actual.size else 0.0
+
+if __name__ == "__main__":
+    import sys
+    if sys.argv[1:] == ["verify"]:
+        difference = verify(IntentClassifier())
+        print(f"Largest difference from scikit-learn: {difference:.3g}")
+        if difference > 1e-12:
+            sys.exit(1)
+    else:
+        started = time.perf_counter()
+        metadata = save_artifact(IntentClassifier())
+        print(
+            f"Wrote {MODEL_PATH}.npz and {MODEL_PATH}.json "
+            f"({len(metadata['vocabulary'])} terms, {len(metadata['labels'])} rows) "
+            f"in {time.perf_counter() - started:.2f}s"
+        )
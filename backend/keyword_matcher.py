@@ -0,0 +1,106 @@
+from typing import Dict, FrozenSet, Iterable, Tuple
+import re
+
+_WORD_START = re.compile(r"(?<!\w)(?=\w)|(?<=\s)(?=\S)|^")
+_WORD_END = re.compile(r"(?<=\w)(?!\w)|(?<=\S)(?=\s)|$")
+
+# Endings a keyword may take as written: "sleeping", "stressful", "helpless"
+INFLECTIONS = frozenset([
+    "s", "es", "d", "ed", "ing", "er", "ers", "est", "ly", "ful", "fully", "ness", "less", "y"
+])
+# Endings after a spelling change to the keyword's last letter
+_E_DROP = frozenset(["ing", "ed"])                                   # cope -> coping
+_Y_TO_I = frozenset(["es", "ed", "er", "est", "ly", "ness", "ful"])  # empty -> emptiness
+_C_TO_CK = frozenset(["ing", "ed", "er", "y"])                       # panic -> panicking
+_DOUBLED = frozenset(["ing", "ed", "er", "est", "en", "ened"])       # sad -> sadder
+_VOWELS = "aeiou"
+
+def _altered_stems(keyword: str) -> Iterable[Tuple[str, FrozenSet[str]]]:
+    """Respellings of a keyword's last word before an ending, with the endings each takes"""
+    last = keyword.rsplit(" ", 1)[-1]
+    if len(last) < 3 or not last.isalpha():
+        return
+    if last.endswith("e"):
+        yield keyword[:-1], _E_DROP
+    elif last.endswith("y") and last[-2] not in _VOWELS:
+        yield keyword[:-1] + "i", _Y_TO_I
+    elif last.endswith("c"):
+        yield keyword + "k", _C_TO_CK
+    elif _syllables(last) == 1 and last[-3] not in _VOWELS and last[-2] in _VOWELS and last[-1] not in _VOWELS + "wxy":
+        # One-syllable consonant-vowel-consonant words double the consonant
+        yield keyword + keyword[-1], _DOUBLED
+
+def _syllables(word: str) -> int:
+    """Rough syllable count: runs of vowels"""
+    return len(re.findall(f"[{_VOWELS}]+", word))
+
+class KeywordMatcher:
+    """Counts keyword hits for several keyword groups in one pass over a text.
+
+    All keywords are compiled into a single alternation regex, longest first,
+    anchored on word boundaries so that "sad" does not fire inside "crusade".
+    A keyword also matches with a common ending (INFLECTIONS), so "sleeping",
+    "stressful" and "helpless" count as "sleep", "stress" and "help", and with
+    the usual spelling changes before one: "coping", "emptiness",
+    "panicking", "sadder". A match on a phrase also counts the keywords it
+    contains, e.g. "can't sleep" counts "sleep" too. Counts are of distinct
+    keywords, not occurrences.
+    """
+
+    def __init__(self, groups: Dict[str, Iterable[str]]):
+        self.groups = {
+            name: list(dict.fromkeys(keyword.lower() for keyword in keywords))
+            for name, keywords in groups.items()
+        }
+
+        # keyword -> groups it belongs to
+        self._keyword_groups: Dict[str, list] = {}
+        for name, keywords in self.groups.items():
+            for keyword in keywords:
+                self._keyword_groups.setdefault(keyword, []).append(name)
+
+        vocabulary = sorted(self._keyword_groups, key=len, reverse=True)
+
+        # stem as it appears in text -> (keyword, endings allowed after it); a
+        # keyword as written may also appear bare
+        self._stems: Dict[str, Tuple[str, FrozenSet[str]]] = {
+            keyword: (keyword, INFLECTIONS | {""}) for keyword in vocabulary
+        }
+        for keyword in vocabulary:
+            for stem, endings in _altered_stems(keyword):
+                self._stems.setdefault(stem, (keyword, endings))
+        endings = sorted(INFLECTIONS | _E_DROP | _Y_TO_I | _C_TO_CK | _DOUBLED, key=len, reverse=True)
+        self._pattern = re.compile(
+            r"(?<!\w)(" + "|".join(re.escape(stem) for stem in sorted(self._stems, key=len, reverse=True)) + r")"
+            r"(" + "|".join(endings) + r")?(?!\w)"
+        ) if vocabulary else None
+
+        # keyword -> itself plus every shorter keyword found inside it as a whole
+        # word; candidates are the spans between word boundaries, so this stays
+        # cheap for vocabularies in the thousands
+        self._implied: Dict[str, frozenset] = {}
+        for keyword in vocabulary:
+            starts = [m.start() for m in _WORD_START.finditer(keyword)]
+            ends = [m.end() for m in _WORD_END.finditer(keyword)]
+            self._implied[keyword] = frozenset(
+                keyword[start:end] for start in starts for end in ends
+                if end > start and keyword[start:end] in self._keyword_groups
+            )
+
+    def find(self, text: str) -> set:
+        """Distinct keywords present in text"""
+        found = set()
+        if self._pattern is not None:
+            for match in self._pattern.finditer(text.lower()):
+                keyword, endings = self._stems[match.group(1)]
+                if (match.group(2) or "") in endings:
+                    found |= self._implied[keyword]
+        return found
+
+    def count(self, text: str) -> Dict[str, int]:
+        """Number of distinct keywords of each group present in text"""
+        counts = {name: 0 for name in self.groups}
+        for keyword in self.find(text):
+            for name in self._keyword_groups[keyword]:
+                counts[name] += 1
+        return counts
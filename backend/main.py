@@ -1,31 +1,45 @@
-from fastapi import FastAPI, HTTPException, Depends, status
+from fastapi import FastAPI, HTTPException, Depends, Header, Response, status
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
 from fastapi.security import HTTPBearer
 from pydantic import BaseModel
-from typing import List, Optional, Dict
+from typing import List, Optional, Dict, AsyncIterator
 from datetime import datetime, timedelta
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 import os
 import json
 import re
+import asyncio
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
 import httpx
-from googleapiclient.discovery import build
 import google.generativeai as genai
 from dotenv import load_dotenv
-import nltk
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
-import numpy as np
 import uuid
 
 # Import database and auth modules
-from database import get_db, init_db, User
+from database import (
+    get_async_db, init_db, AsyncSessionLocal, async_engine,
+    run_wal_checkpoints, uses_wal, User
+)
 from auth import (
-    UserCreate, UserLogin, UserResponse, Token,
-    create_user, authenticate_user, create_access_token,
-    get_current_active_user, ACCESS_TOKEN_EXPIRE_MINUTES
+    UserCreate, UserLogin, UserResponse, Token, RefreshRequest,
+    issue_refresh_token_async, rotate_refresh_token_async, revoke_refresh_token_async, run_refresh_token_purges,
+    create_user_async, authenticate_user_async, create_access_token,
+    get_current_active_user, principal_cache, password_hasher, ACCESS_TOKEN_EXPIRE_MINUTES
 )
-from services import ConversationService, AssessmentService, VideoService
+from services import ConversationService, ConversationSessionService, AssessmentService, VideoService, ResponseCacheService
+from cache import TTLCache
+from background import BackgroundWriter
+from conversation_log import ConversationLogger
+from conversation_context import ConversationContext
+from pagination import clamp_limit, decode_cursor, encode_cursor
+from intent_classifier import IntentClassifier
+from response_cache import ResponseCache
+from singleflight import SingleFlight
+from circuit_breaker import CircuitOpenError, breaker_from_env
+from idempotency import IdempotencyStore, MAX_KEY_LENGTH
 
 # Load environment variables
 load_dotenv()
@@ -33,12 +47,35 @@ load_dotenv()
 # Initialize database
 init_db()
 
-# Download required NLTK data
-try:
-    nltk.download('punkt', quiet=True)
-    nltk.download('stopwords', quiet=True)
-except:
-    pass
+# Non-critical writes (conversation log, video recommendations) run here
+background_writer = BackgroundWriter(max_pending=int(os.getenv("BACKGROUND_WRITER_MAX_PENDING", "1000")))
+
+# Chat turns are logged write-behind in batches
+conversation_logger = ConversationLogger(
+    background_writer,
+    max_queue=int(os.getenv("CONVERSATION_LOG_MAX_QUEUE", "1000")),
+    batch_size=int(os.getenv("CONVERSATION_LOG_BATCH_SIZE", "100")),
+    flush_interval=float(os.getenv("CONVERSATION_LOG_FLUSH_SECONDS", "0.5"))
+)
+
+async def load_session_turns(user_id: int, session_id: str, limit: int) -> List[tuple]:
+    """Last turns of a session from the database, oldest first"""
+    # Turns still in the write-behind queue would otherwise be missed
+    await conversation_logger.flush_user(user_id)
+    async with AsyncSessionLocal() as db:
+        conversations = await ConversationService.get_user_conversations_async(db, user_id, limit, session_id)
+    return [(c.user_message, c.bot_response) for c in reversed(conversations)]
+
+# Recent turns per session, so Gemini prompts carry context without a query per turn
+conversation_context = ConversationContext(
+    load_session_turns,
+    turns_per_session=int(os.getenv("CONVERSATION_CONTEXT_TURNS", "10")),
+    max_sessions=int(os.getenv("CONVERSATION_CONTEXT_MAX_SESSIONS", "1000")),
+    max_chars=int(os.getenv("CONVERSATION_CONTEXT_MAX_CHARS", "2000000"))
+)
+
+# Character budget for session history in a Gemini prompt
+GEMINI_CONTEXT_CHARS = int(os.getenv("GEMINI_CONTEXT_CHARS", "2000"))
 
 app = FastAPI(title="Melvis - Mental Health AI Chatbot")
 
@@ -66,6 +103,37 @@ class ChatResponse(BaseModel):
     suggestions: Optional[List[str]] = None
     session_id: str
 
+class ConversationItem(BaseModel):
+    id: int
+    session_id: Optional[str]
+    user_message: str
+    bot_response: str
+    intent: str
+    confidence: float
+    created_at: datetime
+
+    class Config:
+        from_attributes = True
+
+class ConversationPage(BaseModel):
+    conversations: List[ConversationItem]
+    next_cursor: Optional[str] = None
+
+class SessionSummary(BaseModel):
+    session_id: str
+    first_message_at: datetime
+    last_message_at: datetime
+    message_count: int
+    dominant_intent: Optional[str]
+    last_snippet: Optional[str]
+
+    class Config:
+        from_attributes = True
+
+class SessionPage(BaseModel):
+    sessions: List[SessionSummary]
+    next_cursor: Optional[str] = None
+
 class VideoSearchRequest(BaseModel):
     query: str
     max_results: Optional[int] = 5
@@ -84,149 +152,71 @@ class AssessmentResponse(BaseModel):
         from_attributes = True
     max_results: Optional[int] = 5
 
-# Intent classification system
-class IntentClassifier:
-    def __init__(self):
-        self.intents = {
-            "anxiety": {
-                "keywords": ["anxious", "anxiety", "worried", "stress", "panic", "nervous", "overwhelmed", "fear"],
-                "responses": [
-                    "I understand you're feeling anxious. Anxiety is a common experience, and there are effective ways to manage it.",
-                    "It sounds like you're dealing with some anxiety. Let's explore some techniques that might help you feel more grounded.",
-                    "I hear that you're feeling overwhelmed. Anxiety can be challenging, but there are strategies we can discuss."
-                ],
-                "video_keywords": ["anxiety relief", "breathing exercises", "anxiety management", "calm anxiety"]
-            },
-            "depression": {
-                "keywords": ["depressed", "depression", "sad", "hopeless", "empty", "down", "low mood", "worthless"],
-                "responses": [
-                    "I'm sorry you're feeling this way. Depression can be very difficult, but please know that you're not alone.",
-                    "It takes courage to reach out when you're feeling depressed. I'm here to support you.",
-                    "These feelings are valid, and it's important that you're talking about them. Let's explore some ways to help."
-                ],
-                "video_keywords": ["depression help", "mental health support", "overcoming depression", "depression recovery"]
-            },
-            "stress": {
-                "keywords": ["stressed", "stress", "pressure", "overwhelmed", "burnout", "exhausted", "tired"],
-                "responses": [
-                    "Stress can be really challenging to manage. Let's talk about some effective stress-reduction techniques.",
-                    "It sounds like you're under a lot of pressure. Stress is your body's natural response, and there are healthy ways to cope.",
-                    "I understand you're feeling stressed. Let's explore some strategies to help you manage these feelings."
-                ],
-                "video_keywords": ["stress relief", "stress management", "relaxation techniques", "burnout recovery"]
-            },
-            "sleep": {
-                "keywords": ["sleep", "insomnia", "tired", "exhausted", "can't sleep", "sleepless", "nightmares"],
-                "responses": [
-                    "Sleep issues can significantly impact your mental health. Let's discuss some strategies for better sleep hygiene.",
-                    "Getting quality sleep is crucial for mental wellness. I can share some techniques that might help.",
-                    "Sleep difficulties are common and treatable. Let's explore some approaches to improve your rest."
-                ],
-                "video_keywords": ["sleep hygiene", "insomnia help", "better sleep", "sleep meditation"]
-            },
-            "self_care": {
-                "keywords": ["self care", "self-care", "wellness", "healthy habits", "routine", "balance"],
-                "responses": [
-                    "Self-care is so important for mental health. Let's explore some practices that might work for you.",
-                    "Taking care of yourself is not selfish—it's necessary. What aspects of self-care interest you most?",
-                    "Building healthy self-care routines can make a significant difference in how you feel."
-                ],
-                "video_keywords": ["self care routine", "mental health wellness", "self care tips", "healthy habits"]
-            },
-            "general": {
-                "keywords": ["help", "support", "talk", "listen", "advice", "guidance"],
-                "responses": [
-                    "I'm here to listen and support you. What's on your mind today?",
-                    "Thank you for reaching out. I'm here to help in whatever way I can.",
-                    "I'm glad you're here. What would you like to talk about?"
-                ],
-                "video_keywords": ["mental health support", "emotional wellness", "self help", "mental health tips"]
-            }
-        }
-        
-        # Prepare vectorizer for intent classification
-        all_texts = []
-        self.intent_labels = []
-        for intent, data in self.intents.items():
-            for keyword in data["keywords"]:
-                all_texts.append(keyword)
-                self.intent_labels.append(intent)
-        
-        self.vectorizer = TfidfVectorizer(stop_words='english', ngram_range=(1, 2))
-        self.intent_vectors = self.vectorizer.fit_transform(all_texts)
-
-    def classify_intent(self, message: str) -> tuple:
-        """Classify the intent of a message and return intent with confidence"""
-        message_lower = message.lower()
-        
-        # Simple keyword matching first
-        max_matches = 0
-        best_intent = "general"
-        
-        for intent, data in self.intents.items():
-            matches = sum(1 for keyword in data["keywords"] if keyword in message_lower)
-            if matches > max_matches:
-                max_matches = matches
-                best_intent = intent
-        
-        # Use TF-IDF for more sophisticated matching
-        message_vector = self.vectorizer.transform([message_lower])
-        similarities = cosine_similarity(message_vector, self.intent_vectors).flatten()
-        
-        if len(similarities) > 0:
-            max_similarity_idx = np.argmax(similarities)
-            max_similarity = similarities[max_similarity_idx]
-            
-            if max_similarity > 0.1:  # Minimum confidence threshold
-                vector_intent = self.intent_labels[max_similarity_idx]
-                confidence = max_similarity
-                
-                # Combine keyword and vector results
-                if max_matches > 0:
-                    confidence = min(1.0, confidence + (max_matches * 0.1))
-                    return best_intent, confidence
-                else:
-                    return vector_intent, confidence
-        
-        # Return keyword-based result with adjusted confidence
-        confidence = min(1.0, max_matches * 0.2) if max_matches > 0 else 0.1
-        return best_intent, confidence
-
-    def get_response(self, intent: str) -> str:
-        """Get a response for the given intent"""
-        import random
-        return random.choice(self.intents[intent]["responses"])
-
-    def get_video_keywords(self, intent: str) -> List[str]:
-        """Get video search keywords for the given intent"""
-        return self.intents[intent]["video_keywords"]
-    
-    def should_use_fallback(self, confidence: float) -> bool:
-        """Determine if we should fallback to Gemini API based on confidence"""
-        # Use fallback if confidence is below threshold (0.3)
-        return confidence < 0.3
-
 # Initialize intent classifier
 intent_classifier = IntentClassifier()
 
 # Gemini AI service for fallback responses
+GEMINI_FALLBACK_RESPONSE = "I'm here to listen and support you. While I may not have specific guidance right now, please know that reaching out is an important step. Consider speaking with a mental health professional for personalized support."
+
 class GeminiService:
     def __init__(self):
         self.api_key = os.getenv("GEMINI_API_KEY")
+        # Upper bound on concurrent Gemini calls and the latency budget per call
+        self.max_concurrency = int(os.getenv("GEMINI_MAX_CONCURRENCY", "8"))
+        self.timeout = float(os.getenv("GEMINI_TIMEOUT_SECONDS", "8"))
+        self._semaphore = None
+        self._executor = None
+        # Replies reused for repeated or near-identical messages, across restarts
+        self.cache = ResponseCache(
+            max_size=int(os.getenv("GEMINI_CACHE_SIZE", "512")),
+            ttl=float(os.getenv("GEMINI_CACHE_TTL_SECONDS", "86400")),
+            threshold=float(os.getenv("GEMINI_CACHE_SIMILARITY", "0.9"))
+        )
+        # Identical prompts in flight at the same time share one Gemini call
+        self.inflight = SingleFlight()
+        # While Gemini is failing or slow, answer with the canned reply at once
+        self.breaker = breaker_from_env("gemini", "GEMINI", slow_call_seconds=self.timeout / 2)
         if self.api_key:
             genai.configure(api_key=self.api_key)
             self.model = genai.GenerativeModel('gemini-pro')
+            # Dedicated pool so blocking Gemini calls never starve the default executor
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.max_concurrency, thread_name_prefix="gemini"
+            )
         else:
             self.model = None
-    
-    async def get_mental_health_response(self, user_message: str) -> str:
-        """Get a mental health focused response from Gemini AI"""
-        if not self.model:
-            return "I'm here to listen and support you. While I may not have specific guidance right now, please know that reaching out is an important step. Consider speaking with a mental health professional for personalized support."
-        
+
+    def _get_semaphore(self) -> asyncio.Semaphore:
+        """Create the concurrency limiter lazily, inside the running event loop"""
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self._semaphore
+
+    async def _generate(self, prompt: str) -> str:
+        """Run the blocking Gemini call off the event loop within the latency budget"""
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.timeout
+        semaphore = self._get_semaphore()
+
+        await asyncio.wait_for(semaphore.acquire(), timeout=self.timeout)
         try:
-            # Create a strict mental health prompt
-            prompt = f"""
+            future = loop.run_in_executor(self._executor, self.model.generate_content, prompt)
+        except Exception:
+            semaphore.release()
+            raise
+        # Keep the slot until the worker thread actually finishes, even if we stop
+        # waiting for it, so the number of in-flight Gemini calls stays bounded
+        future.add_done_callback(lambda _: semaphore.release())
+
+        remaining = max(0.0, deadline - loop.time())
+        response = await asyncio.wait_for(asyncio.shield(future), timeout=remaining)
+        return response.text.strip()
+
+    def _build_prompt(self, user_message: str, history: str = "") -> str:
+        """Create a strict mental health prompt, with recent turns of the session if any"""
+        if history:
+            history = f"Recent conversation in this session, oldest first:\n{history}\n\n"
+        return f"""
 You are Melvis, a compassionate mental health support chatbot. You MUST follow these strict guidelines:
 
 1. ONLY respond to mental health related topics (anxiety, depression, stress, sleep, self-care, emotional wellness, therapy, mindfulness, coping strategies)
@@ -237,78 +227,329 @@ You are Melvis, a compassionate mental health support chatbot. You MUST follow t
 6. Keep responses warm, caring, and under 200 words
 7. If asked about non-mental health topics like weather, sports, technology, politics, etc., say: "I'm specifically designed to help with mental health and emotional wellness. How are you feeling today? Is there anything about your mental health or emotional wellbeing I can support you with?"
 
-User message: "{user_message}"
+{history}User message: "{user_message}"
 
 Remember: You must ONLY discuss mental health topics. Redirect any other conversations back to mental health and emotional wellness.
 """
+
+    async def get_mental_health_response(self, user_message: str, history: str = "") -> str:
+        """Get a mental health focused response from Gemini AI.
+
+        Replies that depend on session history are neither served from nor
+        added to the response cache.
+        """
+        if not self.model:
+            return GEMINI_FALLBACK_RESPONSE
+
+        if not history:
+            cached = self.cache.get(user_message)
+            if cached is not None:
+                return cached
+        
+        try:
+            prompt = self._build_prompt(user_message, history)
+            return await self.inflight.do(prompt, self._generate_reply, user_message, prompt, not history)
             
-            response = self.model.generate_content(prompt)
-            return response.text.strip()
-            
+        except CircuitOpenError:
+            return GEMINI_FALLBACK_RESPONSE
+        except asyncio.TimeoutError:
+            print(f"Gemini API timeout: no response within {self.timeout}s")
+            return GEMINI_FALLBACK_RESPONSE
+        except Exception as e:
+            print(f"Gemini API error: {e}")
+            return GEMINI_FALLBACK_RESPONSE
+
+    async def stream_mental_health_response(self, user_message: str, history: str = "") -> AsyncIterator[str]:
+        """Yield a Gemini response chunk by chunk as it is generated.
+
+        Each chunk must arrive within the latency budget. If nothing was produced
+        the canned reply is yielded instead; a stream that stalls midway just ends.
+        """
+        if not self.model:
+            yield GEMINI_FALLBACK_RESPONSE
+            return
+
+        cached = None if history else self.cache.get(user_message)
+        if cached is not None:
+            yield cached
+            return
+
+        if not self.breaker.allow():
+            yield GEMINI_FALLBACK_RESPONSE
+            return
+        recorded = False
+
+        loop = asyncio.get_running_loop()
+        queue: asyncio.Queue = asyncio.Queue()
+        stop = threading.Event()
+        done = object()
+        produced = False
+        chunks = []
+        started = time.perf_counter()
+
+        def pump():
+            # Runs in the worker thread: iterate the blocking stream and hand
+            # each chunk back to the event loop
+            try:
+                for chunk in self.model.generate_content(prompt, stream=True):
+                    if stop.is_set():
+                        break
+                    text = chunk.text
+                    if text:
+                        loop.call_soon_threadsafe(queue.put_nowait, text)
+                loop.call_soon_threadsafe(queue.put_nowait, done)
+            except Exception as e:
+                loop.call_soon_threadsafe(queue.put_nowait, e)
+
+        prompt = self._build_prompt(user_message, history)
+        semaphore = self._get_semaphore()
+        try:
+            await asyncio.wait_for(semaphore.acquire(), timeout=self.timeout)
+            try:
+                future = loop.run_in_executor(self._executor, pump)
+            except Exception:
+                semaphore.release()
+                raise
+            future.add_done_callback(lambda _: semaphore.release())
+
+            while True:
+                item = await asyncio.wait_for(queue.get(), timeout=self.timeout)
+                if item is done:
+                    # Only complete replies without session history are worth reusing
+                    if not history:
+                        self._remember(user_message, "".join(chunks).strip(), time.perf_counter() - started)
+                    break
+                if isinstance(item, Exception):
+                    raise item
+                if not produced:
+                    # A stream is judged by how long the first chunk took
+                    self.breaker.record_success(time.perf_counter() - started)
+                    recorded = True
+                produced = True
+                chunks.append(item)
+                yield item
+
+        except asyncio.TimeoutError:
+            print(f"Gemini API timeout: no chunk within {self.timeout}s")
+            if not produced:
+                self.breaker.record_failure(time.perf_counter() - started)
+                recorded = True
+                yield GEMINI_FALLBACK_RESPONSE
         except Exception as e:
             print(f"Gemini API error: {e}")
-            return "I'm here to listen and support you. While I may not have specific guidance right now, please know that reaching out is an important step. Consider speaking with a mental health professional for personalized support."
+            if not produced:
+                self.breaker.record_failure(time.perf_counter() - started)
+                recorded = True
+                yield GEMINI_FALLBACK_RESPONSE
+        finally:
+            # Tell the worker to stop pulling chunks nobody will read
+            stop.set()
+            if not recorded:
+                self.breaker.release()
+
+    async def _generate_reply(self, user_message: str, prompt: str, cacheable: bool) -> str:
+        """Generate a reply and cache it; shared by concurrent identical prompts"""
+        started = time.perf_counter()
+        reply = await self.breaker.call(self._generate, prompt)
+        if cacheable:
+            self._remember(user_message, reply, time.perf_counter() - started)
+        return reply
+
+    def _remember(self, user_message: str, reply: str, latency: float) -> None:
+        """Cache a generated reply and persist it in the background"""
+        if not reply:
+            return
+        entry = self.cache.set(user_message, reply, latency)
+        if entry is not None:
+            fingerprint, normalized = entry
+            background_writer.submit(
+                ResponseCacheService.save_response, fingerprint, normalized, reply, latency
+            )
+
+    async def warm_cache(self) -> None:
+        """Load persisted replies so a restart does not start cold"""
+        try:
+            async with AsyncSessionLocal() as db:
+                rows = await ResponseCacheService.get_fresh_responses_async(
+                    db, self.cache.ttl, self.cache.cache.max_size
+                )
+            self.cache.warm(rows)
+        except Exception as e:
+            print(f"Response cache warm-up error: {e}")
+        background_writer.submit(ResponseCacheService.purge_expired, self.cache.ttl)
 
     def is_mental_health_related(self, message: str) -> bool:
         """Check if a message is related to mental health"""
-        mental_health_keywords = [
-            'mental', 'health', 'anxiety', 'depression', 'stress', 'emotional', 'feeling',
-            'mood', 'therapy', 'counseling', 'wellbeing', 'wellness', 'mindfulness',
-            'meditation', 'self-care', 'support', 'help', 'cope', 'coping', 'overwhelmed',
-            'sad', 'happy', 'angry', 'frustrated', 'worried', 'fear', 'panic', 'sleep',
-            'tired', 'exhausted', 'burnout', 'lonely', 'isolation', 'relationship'
-        ]
-        
-        message_lower = message.lower()
-        return any(keyword in message_lower for keyword in mental_health_keywords)
+        return intent_classifier.scan(message).mental_health
 
 # Initialize Gemini service
 gemini_service = GeminiService()
 
 # YouTube API service
+def normalize_query(query: str) -> str:
+    """Canonical form of a search query used as the cache key"""
+    return " ".join(query.lower().split())
+
 class YouTubeService:
-    def __init__(self):
+    # Upstream responses worth retrying: rate limiting and transient server errors
+    RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
+    def __init__(self, transport: Optional[httpx.AsyncBaseTransport] = None):
         self.api_key = os.getenv("YOUTUBE_API_KEY")
-        if self.api_key:
-            self.youtube = build('youtube', 'v3', developerKey=self.api_key)
-        else:
-            self.youtube = None
+        self.base_url = os.getenv("YOUTUBE_API_BASE_URL", "https://www.googleapis.com/youtube/v3")
+        # Custom transport for the HTTP client, e.g. a stub API in tests
+        self.transport = transport
+        self.timeout = float(os.getenv("YOUTUBE_TIMEOUT_SECONDS", "5"))
+        self.max_retries = int(os.getenv("YOUTUBE_MAX_RETRIES", "2"))
+        self._client = None
+        # Search results are cached in process and in the video_recommendations
+        # table, so each distinct query costs one API call per TTL window
+        self.cache_ttl = float(os.getenv("YOUTUBE_CACHE_TTL_SECONDS", "21600"))
+        self.cache = TTLCache(
+            max_size=int(os.getenv("YOUTUBE_CACHE_SIZE", "256")),
+            ttl=self.cache_ttl
+        )
+        self.db_hits = 0
+        self.api_calls = 0
+        # Concurrent searches for the same query share one lookup and API call
+        self.inflight = SingleFlight()
+        # While the API is failing or slow, serve the mock videos at once
+        self.breaker = breaker_from_env("youtube", "YOUTUBE", slow_call_seconds=self.timeout / 2)
 
-    async def search_videos(self, query: str, max_results: int = 5) -> List[Dict]:
+    async def search_videos(
+        self,
+        query: str,
+        max_results: int = 5,
+        intent_category: str = "search",
+        keywords: Optional[str] = None
+    ) -> List[Dict]:
         """Search for YouTube videos related to mental health"""
-        if not self.youtube:
+        if not self.api_key:
             # Return mock data if no API key
             return self._get_mock_videos(query)
-        
-        try:
-            # Add mental health context to search
-            search_query = f"{query} mental health wellness mindfulness"
-            
-            search_response = self.youtube.search().list(
-                q=search_query,
-                part='id,snippet',
-                maxResults=max_results,
-                type='video',
-                safeSearch='strict',
-                videoCaption='any'
-            ).execute()
-
-            videos = []
-            for item in search_response['items']:
-                video = {
-                    'id': item['id']['videoId'],
-                    'title': item['snippet']['title'],
-                    'description': item['snippet']['description'][:200] + '...',
-                    'thumbnail': item['snippet']['thumbnails']['medium']['url'],
-                    'url': f"https://www.youtube.com/watch?v={item['id']['videoId']}",
-                    'channel': item['snippet']['channelTitle']
-                }
-                videos.append(video)
-            
+
+        search_query = normalize_query(query)
+        cache_key = (search_query, max_results)
+        videos = self.cache.get(cache_key)
+        if videos is None:
+            videos = await self.inflight.do(
+                cache_key, self._search_uncached, search_query, max_results, intent_category, keywords
+            )
+        if videos is None:
+            # Fallback results are never cached so recovery is picked up at once
+            return self._get_mock_videos(query)
+        return [dict(video) for video in videos]
+
+    async def _search_uncached(
+        self,
+        search_query: str,
+        max_results: int,
+        intent_category: str,
+        keywords: Optional[str]
+    ) -> Optional[List[Dict]]:
+        """Serve a search from the database or the API; None if the API failed"""
+        cache_key = (search_query, max_results)
+        videos = await self._load_cached_search(search_query, max_results)
+        if videos is not None:
+            self.db_hits += 1
+            self.cache.set(cache_key, videos)
             return videos
+
+        try:
+            videos = await self.breaker.call(self._fetch_videos, search_query, max_results)
+        except CircuitOpenError:
+            return None
         except Exception as e:
             print(f"YouTube API error: {e}")
-            return self._get_mock_videos(query)
+            return None
+
+        self.cache.set(cache_key, videos)
+        background_writer.submit(
+            VideoService.save_search_results, search_query, videos, intent_category, keywords
+        )
+        return videos
+
+    def _get_client(self) -> httpx.AsyncClient:
+        """Shared client so connections to the API are pooled and kept alive"""
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                timeout=httpx.Timeout(self.timeout),
+                limits=httpx.Limits(max_connections=20, max_keepalive_connections=10),
+                transport=self.transport
+            )
+        return self._client
+
+    async def aclose(self) -> None:
+        """Close pooled connections on shutdown"""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def _get(self, path: str, params: Dict) -> Dict:
+        """GET an API resource, retrying transient failures with backoff"""
+        client = self._get_client()
+        for attempt in range(self.max_retries + 1):
+            try:
+                response = await client.get(path, params=params)
+                if response.status_code in self.RETRY_STATUS_CODES and attempt < self.max_retries:
+                    await asyncio.sleep(0.2 * 2 ** attempt)
+                    continue
+                response.raise_for_status()
+                return response.json()
+            except httpx.TransportError:
+                if attempt >= self.max_retries:
+                    raise
+                await asyncio.sleep(0.2 * 2 ** attempt)
+
+    async def _fetch_videos(self, query: str, max_results: int) -> List[Dict]:
+        """Call the YouTube search API"""
+        self.api_calls += 1
+        # Add mental health context to search
+        search_query = f"{query} mental health wellness mindfulness"
+        
+        search_response = await self._get('/search', {
+            'key': self.api_key,
+            'q': search_query,
+            'part': 'id,snippet',
+            'maxResults': max_results,
+            'type': 'video',
+            'safeSearch': 'strict',
+            'videoCaption': 'any'
+        })
+
+        videos = []
+        for item in search_response['items']:
+            video = {
+                'id': item['id']['videoId'],
+                'title': item['snippet']['title'],
+                'description': item['snippet']['description'][:200] + '...',
+                'thumbnail': item['snippet']['thumbnails']['medium']['url'],
+                'url': f"https://www.youtube.com/watch?v={item['id']['videoId']}",
+                'channel': item['snippet']['channelTitle']
+            }
+            videos.append(video)
+        
+        return videos
+
+    async def _load_cached_search(self, search_query: str, max_results: int) -> Optional[List[Dict]]:
+        """Look up results persisted by this or another worker"""
+        try:
+            async with AsyncSessionLocal() as db:
+                return await VideoService.get_cached_search_async(
+                    db, search_query, max_results, self.cache_ttl
+                )
+        except Exception as e:
+            print(f"Video cache read error: {e}")
+            return None
+
+    def cache_stats(self) -> Dict:
+        """Cache counters for the /metrics endpoint"""
+        stats = self.cache.stats()
+        stats["db_hits"] = self.db_hits
+        stats["api_calls"] = self.api_calls
+        stats["coalesced"] = self.inflight.coalesced
+        return stats
 
     def _get_mock_videos(self, query: str) -> List[Dict]:
         """Return mock video data when API is not available"""
@@ -349,21 +590,86 @@ youtube_service = YouTubeService()
 async def root():
     return {"message": "Melvis - Mental Health AI Chatbot API"}
 
+# Completed /chat responses replayed for retried requests with the same Idempotency-Key
+idempotency_store = IdempotencyStore(
+    max_size=int(os.getenv("IDEMPOTENCY_MAX_KEYS", "10000")),
+    ttl=float(os.getenv("IDEMPOTENCY_TTL_SECONDS", "3600"))
+)
+
+# Background maintenance tasks started with the app
+maintenance_tasks = []
+
+@app.on_event("startup")
+async def startup():
+    conversation_logger.start()
+    # Load the intent model off the event loop so the first chat doesn't pay for it
+    await asyncio.get_running_loop().run_in_executor(None, intent_classifier.load)
+    await gemini_service.warm_cache()
+    if uses_wal():
+        interval = float(os.getenv("SQLITE_CHECKPOINT_INTERVAL_SECONDS", "300"))
+        maintenance_tasks.append(asyncio.create_task(run_wal_checkpoints(interval)))
+    maintenance_tasks.append(asyncio.create_task(idempotency_store.purge_periodically(
+        float(os.getenv("IDEMPOTENCY_PURGE_INTERVAL_SECONDS", "60"))
+    )))
+    maintenance_tasks.append(asyncio.create_task(run_refresh_token_purges(
+        float(os.getenv("REFRESH_TOKEN_PURGE_INTERVAL_SECONDS", "3600"))
+    )))
+
+@app.on_event("shutdown")
+async def shutdown():
+    for task in maintenance_tasks:
+        task.cancel()
+    # Drain queued conversation turns before the writer stops
+    await conversation_logger.shutdown()
+    await youtube_service.aclose()
+    # Flush writes that were accepted but not yet committed
+    await background_writer.shutdown()
+    await async_engine.dispose()
+
+@app.get("/metrics")
+async def metrics():
+    """Cache and upstream counters for monitoring"""
+    return {
+        "youtube_cache": youtube_service.cache_stats(),
+        "gemini_response_cache": gemini_service.cache.stats(),
+        "gemini_requests": gemini_service.inflight.stats(),
+        "idempotency": idempotency_store.stats(),
+        "conversation_context": conversation_context.stats(),
+        "conversation_log": conversation_logger.stats(),
+        "background_writer": background_writer.stats(),
+        "principal_cache": principal_cache.stats(),
+        "password_hashing": password_hasher.stats()
+    }
+
+@app.get("/status/circuit-breakers")
+async def circuit_breakers():
+    """State and recent transitions of the upstream circuit breakers"""
+    return {
+        "gemini": gemini_service.breaker.stats(),
+        "youtube": youtube_service.breaker.stats()
+    }
+
 # Authentication endpoints
+def token_response(db_user: User, refresh_token: str) -> Dict:
+    """Build the token payload returned by register, login and refresh"""
+    access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
+    access_token = create_access_token(
+        data={"sub": db_user.email, "uid": db_user.id}, expires_delta=access_token_expires
+    )
+    return {
+        "access_token": access_token,
+        "token_type": "bearer",
+        "user": UserResponse.from_orm(db_user),
+        "refresh_token": refresh_token
+    }
+
 @app.post("/auth/register", response_model=Token)
-async def register(user: UserCreate, db: Session = Depends(get_db)):
+async def register(user: UserCreate, db: AsyncSession = Depends(get_async_db)):
     """Register a new user"""
     try:
-        db_user = create_user(db, user)
-        access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
-        access_token = create_access_token(
-            data={"sub": db_user.email}, expires_delta=access_token_expires
-        )
-        return {
-            "access_token": access_token,
-            "token_type": "bearer",
-            "user": UserResponse.from_orm(db_user)
-        }
+        db_user = await create_user_async(db, user)
+        refresh_token = await issue_refresh_token_async(db, db_user.id)
+        return token_response(db_user, refresh_token)
     except HTTPException:
         raise
     except Exception as e:
@@ -371,119 +677,198 @@ async def register(user: UserCreate, db: Session = Depends(get_db)):
         raise HTTPException(status_code=500, detail="Registration failed")
 
 @app.post("/auth/login", response_model=Token)
-async def login(user: UserLogin, db: Session = Depends(get_db)):
+async def login(user: UserLogin, db: AsyncSession = Depends(get_async_db)):
     """Login user"""
     try:
-        db_user = authenticate_user(db, user.email, user.password)
+        db_user = await authenticate_user_async(db, user.email, user.password)
         if not db_user:
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail="Incorrect email or password",
                 headers={"WWW-Authenticate": "Bearer"},
             )
-        access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
-        access_token = create_access_token(
-            data={"sub": db_user.email}, expires_delta=access_token_expires
-        )
-        return {
-            "access_token": access_token,
-            "token_type": "bearer",
-            "user": UserResponse.from_orm(db_user)
-        }
+        refresh_token = await issue_refresh_token_async(db, db_user.id)
+        return token_response(db_user, refresh_token)
     except HTTPException:
         raise
     except Exception as e:
         print(f"Login error: {e}")
         raise HTTPException(status_code=500, detail="Login failed")
 
+@app.post("/auth/refresh", response_model=Token)
+async def refresh(request: RefreshRequest, db: AsyncSession = Depends(get_async_db)):
+    """Exchange a refresh token for a new access token and a rotated refresh token"""
+    try:
+        db_user, refresh_token = await rotate_refresh_token_async(db, request.refresh_token)
+        return token_response(db_user, refresh_token)
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f"Token refresh error: {e}")
+        raise HTTPException(status_code=500, detail="Token refresh failed")
+
+@app.post("/auth/logout")
+async def logout(request: RefreshRequest, db: AsyncSession = Depends(get_async_db)):
+    """Revoke a refresh token and every token rotated from it"""
+    try:
+        await revoke_refresh_token_async(db, request.refresh_token)
+        return {"message": "Logged out"}
+    except Exception as e:
+        print(f"Logout error: {e}")
+        raise HTTPException(status_code=500, detail="Logout failed")
+
 @app.get("/auth/me", response_model=UserResponse)
 async def get_me(current_user: User = Depends(get_current_active_user)):
     """Get current user info"""
     return UserResponse.from_orm(current_user)
 
+# Chat pipeline helpers shared by /chat and /chat/stream
+REDIRECT_RESPONSE = "I'm specifically designed to help with mental health and emotional wellness. How are you feeling today? Is there anything about your mental health or emotional wellbeing I can support you with?"
+
+def route_message(message: str) -> tuple:
+    """Classify a message and decide how it should be answered.
+
+    Returns (intent, confidence, response); response is None when the reply
+    has to be generated by Gemini.
+    """
+    scan = intent_classifier.scan(message)
+    intent, confidence = intent_classifier.classify_intent(message, scan=scan)
+
+    # Check if we should use Gemini fallback
+    if intent_classifier.should_use_fallback(confidence):
+        # Check if message is mental health related
+        if scan.mental_health:
+            # Use Gemini for mental health response
+            return "gemini_fallback", 0.8, None  # Higher confidence for Gemini responses
+        # Non-mental health query - redirect to mental health
+        return "redirect_to_mental_health", 0.9, REDIRECT_RESPONSE
+
+    # Use standard intent-based response
+    return intent, confidence, intent_classifier.get_response(intent)
+
+def get_suggestions(intent: str) -> List[str]:
+    """Follow-up suggestions for an intent, including the Gemini/redirect ones"""
+    if intent in intent_classifier.intents:
+        return generate_suggestions(intent)
+    # Default mental health suggestions for Gemini responses
+    return [
+        "How can I manage my daily stress?",
+        "What are some good self-care practices?",
+        "I'd like to learn about mindfulness techniques",
+        "How can I improve my sleep quality?"
+    ]
+
+async def generate_reply(message: str, response: Optional[str], user_id: int, session_id: str) -> str:
+    """Return the routed reply, asking Gemini when there is none"""
+    if response is None:
+        return await gemini_service.get_mental_health_response(
+            message, await session_history(user_id, session_id)
+        )
+    return response
+
+def new_session(user_id: int) -> str:
+    """Mint a session id; its context starts empty, so nothing is loaded for it"""
+    session_id = str(uuid.uuid4())
+    conversation_context.start(user_id, session_id)
+    return session_id
+
+async def session_history(user_id: int, session_id: str) -> str:
+    """Recent turns of the session, formatted within the prompt budget"""
+    turns = await conversation_context.get(user_id, session_id)
+    return ConversationContext.format(turns, GEMINI_CONTEXT_CHARS)
+
+async def log_turn(
+    user_id: int,
+    session_id: str,
+    message: str,
+    response: str,
+    intent: str,
+    confidence: float
+) -> None:
+    """Queue a turn for the conversation log and add it to the session context"""
+    await conversation_logger.log(
+        user_id=user_id,
+        user_message=message,
+        bot_response=response,
+        intent=intent,
+        confidence=confidence,
+        session_id=session_id
+    )
+    conversation_context.append(user_id, session_id, message, response)
+
+async def get_intent_videos(intent: str) -> List[Dict]:
+    """Search videos for a standard intent.
+
+    Videos are stored as recommendations by the search itself, and only when
+    they come fresh from the API.
+    """
+    # Only standard intents get videos, not Gemini fallback
+    if intent not in intent_classifier.intents:
+        return []
+
+    video_keywords = intent_classifier.get_video_keywords(intent)
+    if not video_keywords:
+        return []
+
+    keywords = ','.join(video_keywords)
+    # Use the first keyword for video search
+    videos = await youtube_service.search_videos(
+        video_keywords[0],
+        max_results=3,
+        intent_category=intent,
+        keywords=keywords
+    )
+    return videos
+
 @app.post("/chat", response_model=ChatResponse)
 async def chat(
     chat_message: ChatMessage,
+    http_response: Response,
     current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    idempotency_key: Optional[str] = Header(None)
 ):
-    """Process chat message and return response with intent classification"""
+    """Process chat message and return response with intent classification.
+
+    With an Idempotency-Key header, a retried request gets the first response
+    back instead of being processed again.
+    """
+    if not idempotency_key:
+        return await process_chat(chat_message, current_user.id)
+    if len(idempotency_key) > MAX_KEY_LENGTH:
+        raise HTTPException(status_code=400, detail=f"Idempotency-Key must be at most {MAX_KEY_LENGTH} characters")
+
+    result, replayed = await idempotency_store.run(
+        (current_user.id, idempotency_key),
+        IdempotencyStore.request_hash(chat_message.model_dump()),
+        process_chat, chat_message, current_user.id
+    )
+    if replayed:
+        http_response.headers["Idempotent-Replayed"] = "true"
+    return result
+
+async def process_chat(chat_message: ChatMessage, user_id: int) -> ChatResponse:
+    """Classify, answer and log one chat message"""
     try:
         message = chat_message.message.strip()
-        session_id = chat_message.session_id or str(uuid.uuid4())
         
         if not message:
             raise HTTPException(status_code=400, detail="Message cannot be empty")
         
-        # Classify intent
-        intent, confidence = intent_classifier.classify_intent(message)
+        session_id = chat_message.session_id or new_session(user_id)
         
-        # Check if we should use Gemini fallback
-        if intent_classifier.should_use_fallback(confidence):
-            # Check if message is mental health related
-            if gemini_service.is_mental_health_related(message):
-                # Use Gemini for mental health response
-                response = await gemini_service.get_mental_health_response(message)
-                intent = "gemini_fallback"
-                confidence = 0.8  # Set higher confidence for Gemini responses
-            else:
-                # Non-mental health query - redirect to mental health
-                response = "I'm specifically designed to help with mental health and emotional wellness. How are you feeling today? Is there anything about your mental health or emotional wellbeing I can support you with?"
-                intent = "redirect_to_mental_health"
-                confidence = 0.9
-        else:
-            # Use standard intent-based response
-            response = intent_classifier.get_response(intent)
-        
-        # Get relevant videos (only for standard intents, not Gemini fallback)
-        video_keywords = []
-        videos = []
+        intent, confidence, response = route_message(message)
         
-        if intent in intent_classifier.intents:
-            video_keywords = intent_classifier.get_video_keywords(intent)
-            if video_keywords:
-                # Use the first keyword for video search
-                videos = await youtube_service.search_videos(video_keywords[0], max_results=3)
-                
-                # Save video recommendations to database
-                for video in videos:
-                    try:
-                        VideoService.save_video_recommendation(
-                            db=db,
-                            video_id=video['id'],
-                            title=video['title'],
-                            description=video.get('description'),
-                            thumbnail_url=video.get('thumbnail'),
-                            youtube_url=video['url'],
-                            channel_name=video.get('channel'),
-                            intent_category=intent,
-                            keywords=','.join(video_keywords)
-                        )
-                    except Exception as e:
-                        print(f"Error saving video recommendation: {e}")
+        # Only the Gemini fallback needs I/O for the reply, and it has no videos;
+        # only standard intents look videos up. At most one of these waits, so
+        # they simply run one after the other.
+        response = await generate_reply(message, response, user_id, session_id)
+        videos = await get_intent_videos(intent)
         
         # Generate follow-up suggestions
-        if intent in intent_classifier.intents:
-            suggestions = generate_suggestions(intent)
-        else:
-            # Default mental health suggestions for Gemini responses
-            suggestions = [
-                "How can I manage my daily stress?",
-                "What are some good self-care practices?",
-                "I'd like to learn about mindfulness techniques",
-                "How can I improve my sleep quality?"
-            ]
+        suggestions = get_suggestions(intent)
         
-        # Store conversation in database
-        ConversationService.create_conversation(
-            db=db,
-            user_id=current_user.id,
-            user_message=message,
-            bot_response=response,
-            intent=intent,
-            confidence=confidence,
-            session_id=session_id
-        )
+        # Queue the conversation for the batched write-behind log
+        await log_turn(user_id, session_id, message, response, intent, confidence)
         
         return ChatResponse(
             response=response,
@@ -500,6 +885,64 @@ async def chat(
         print(f"Chat error: {e}")
         raise HTTPException(status_code=500, detail="An error occurred processing your message")
 
+def sse_event(event: str, data) -> str:
+    """Format one Server-Sent Event"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+@app.post("/chat/stream")
+async def chat_stream(
+    chat_message: ChatMessage,
+    current_user: User = Depends(get_current_active_user)
+):
+    """Streaming variant of /chat.
+
+    Sends a `meta` event (intent, confidence, suggestions, session_id) straight
+    away, then the reply as `token` events, then `videos`, and finally `done`
+    once the conversation has been handed to the conversation log.
+    """
+    message = chat_message.message.strip()
+    if not message:
+        raise HTTPException(status_code=400, detail="Message cannot be empty")
+
+    user_id = current_user.id
+    session_id = chat_message.session_id or new_session(user_id)
+
+    async def event_stream():
+        try:
+            intent, confidence, response = route_message(message)
+            yield sse_event("meta", {
+                "intent": intent,
+                "confidence": confidence,
+                "suggestions": get_suggestions(intent),
+                "session_id": session_id
+            })
+
+            if response is None:
+                chunks = []
+                history = await session_history(user_id, session_id)
+                async for chunk in gemini_service.stream_mental_health_response(message, history):
+                    chunks.append(chunk)
+                    yield sse_event("token", {"text": chunk})
+                response = "".join(chunks).strip()
+            else:
+                yield sse_event("token", {"text": response})
+
+            videos = await get_intent_videos(intent)
+            if videos:
+                yield sse_event("videos", {"videos": videos})
+
+            await log_turn(user_id, session_id, message, response, intent, confidence)
+            yield sse_event("done", {"session_id": session_id})
+        except Exception as e:
+            print(f"Chat stream error: {e}")
+            yield sse_event("error", {"detail": "An error occurred processing your message"})
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 @app.post("/search-videos")
 async def search_videos(
     request: VideoSearchRequest,
@@ -507,41 +950,79 @@ async def search_videos(
 ):
     """Search for mental health related videos"""
     try:
-        videos = await youtube_service.search_videos(request.query, request.max_results)
+        videos = await youtube_service.search_videos(request.query, request.max_results or 5)
         return {"videos": videos}
     except Exception as e:
         print(f"Video search error: {e}")
         raise HTTPException(status_code=500, detail="An error occurred searching for videos")
 
-@app.get("/conversations")
+@app.get("/conversations", response_model=ConversationPage)
 async def get_conversations(
     current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     session_id: Optional[str] = None,
-    limit: int = 50
+    limit: int = 50,
+    cursor: Optional[str] = None
 ):
-    """Get conversation history for current user"""
+    """Get conversation history for current user, newest first.
+
+    Pass the returned next_cursor back as `cursor` to fetch the following page.
+    """
+    before = decode_cursor(cursor, 2)
     try:
-        conversations = ConversationService.get_user_conversations(
+        # Make this user's queued turns visible before reading
+        await conversation_logger.flush_user(current_user.id)
+        limit = clamp_limit(limit)
+        rows = await ConversationService.get_user_conversations_page_async(
             db=db,
             user_id=current_user.id,
             limit=limit,
-            session_id=session_id
+            session_id=session_id,
+            before=before
+        )
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = encode_cursor(rows[-1].created_key, rows[-1].id)
+        return ConversationPage(
+            conversations=[ConversationItem.model_validate(row) for row in rows],
+            next_cursor=next_cursor
         )
-        return {"conversations": conversations}
     except Exception as e:
         print(f"Get conversations error: {e}")
         raise HTTPException(status_code=500, detail="An error occurred retrieving conversations")
 
-@app.get("/conversation-sessions")
+@app.get("/conversation-sessions", response_model=SessionPage)
 async def get_conversation_sessions(
     current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db),
+    limit: int = 20,
+    cursor: Optional[str] = None
 ):
-    """Get all conversation session IDs for current user"""
+    """Get conversation session summaries for current user, most recent first"""
+    before = decode_cursor(cursor, 2)
+    try:
+        if before:
+            before = (datetime.fromisoformat(before[0]), int(before[1]))
+    except (TypeError, ValueError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
     try:
-        sessions = ConversationService.get_conversation_sessions(db=db, user_id=current_user.id)
-        return {"sessions": sessions}
+        await conversation_logger.flush_user(current_user.id)
+        limit = clamp_limit(limit)
+        sessions = await ConversationSessionService.get_sessions_page_async(
+            db=db,
+            user_id=current_user.id,
+            limit=limit,
+            before=before
+        )
+        next_cursor = None
+        if len(sessions) > limit:
+            sessions = sessions[:limit]
+            next_cursor = encode_cursor(sessions[-1].last_message_at.isoformat(), sessions[-1].id)
+        return SessionPage(
+            sessions=[SessionSummary.model_validate(session) for session in sessions],
+            next_cursor=next_cursor
+        )
     except Exception as e:
         print(f"Get conversation sessions error: {e}")
         raise HTTPException(status_code=500, detail="An error occurred retrieving conversation sessions")
@@ -551,11 +1032,11 @@ async def get_conversation_sessions(
 async def create_assessment(
     assessment: AssessmentRequest,
     current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Create a new mental health assessment"""
     try:
-        db_assessment = AssessmentService.create_assessment(
+        db_assessment = await AssessmentService.create_assessment_async(
             db=db,
             user_id=current_user.id,
             answers=assessment.answers
@@ -568,12 +1049,12 @@ async def create_assessment(
 @app.get("/assessments", response_model=List[AssessmentResponse])
 async def get_assessments(
     current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     limit: int = 10
 ):
     """Get assessment history for current user"""
     try:
-        assessments = AssessmentService.get_user_assessments(
+        assessments = await AssessmentService.get_user_assessments_async(
             db=db,
             user_id=current_user.id,
             limit=limit
@@ -586,11 +1067,11 @@ async def get_assessments(
 @app.get("/assessment/latest", response_model=Optional[AssessmentResponse])
 async def get_latest_assessment(
     current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Get the most recent assessment for current user"""
     try:
-        assessment = AssessmentService.get_latest_assessment(db=db, user_id=current_user.id)
+        assessment = await AssessmentService.get_latest_assessment_async(db=db, user_id=current_user.id)
         if assessment:
             return AssessmentResponse.from_orm(assessment)
         return None
@@ -0,0 +1,177 @@
+"""Versioned schema migrations.
+
+Each migration runs once, inside a transaction, and is recorded in the
+schema_migrations table. On SQLite that transaction is BEGIN IMMEDIATE, which
+takes the database write lock before the applied versions are re-read, so
+workers starting together never apply the same migration twice. Migrations must be idempotent because a brand new
+database gets the latest schema from the first one (create_all) and then runs
+the rest on top of it. Add new steps to the end of MIGRATIONS, never reorder.
+
+Run directly to migrate the configured database: python migrations.py
+Rebuild conversation session summaries: python migrations.py backfill-sessions
+"""
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Callable, Iterator, List, Tuple
+from sqlalchemy import inspect, text
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.orm import Session
+from database import Base, CachedResponse, ConversationSession, RefreshToken, SessionLocal, VideoSearchResult, engine
+from services import ConversationSessionService
+
+def _initial_schema(conn: Connection) -> None:
+    Base.metadata.create_all(bind=conn)
+
+def _video_search_cache_columns(conn: Connection) -> None:
+    existing = {column["name"] for column in inspect(conn).get_columns("video_recommendations")}
+    for name, ddl_type in (
+        ("search_query", "VARCHAR(255)"),
+        ("search_rank", "INTEGER"),
+        ("cached_at", "DATETIME"),
+    ):
+        if name not in existing:
+            conn.execute(text(f"ALTER TABLE video_recommendations ADD COLUMN {name} {ddl_type}"))
+    conn.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_video_recommendations_search_query "
+        "ON video_recommendations (search_query)"
+    ))
+
+def _unique_video_ids(conn: Connection) -> None:
+    for index in inspect(conn).get_indexes("video_recommendations"):
+        if index["column_names"] == ["video_id"] and index["unique"]:
+            return
+    # Keep the oldest row per video_id, then enforce uniqueness
+    conn.execute(text(
+        "DELETE FROM video_recommendations WHERE id NOT IN ("
+        "SELECT MIN(id) FROM video_recommendations GROUP BY video_id)"
+    ))
+    conn.execute(text("DROP INDEX IF EXISTS ix_video_recommendations_video_id"))
+    conn.execute(text(
+        "CREATE UNIQUE INDEX ix_video_recommendations_video_id "
+        "ON video_recommendations (video_id)"
+    ))
+
+def _history_indexes(conn: Connection) -> None:
+    conn.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_conversations_user_created "
+        "ON conversations (user_id, created_at)"
+    ))
+    conn.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_conversations_user_session_created "
+        "ON conversations (user_id, session_id, created_at)"
+    ))
+    conn.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_assessments_user_created "
+        "ON assessments (user_id, created_at)"
+    ))
+
+def _conversation_sessions(conn: Connection) -> None:
+    ConversationSession.__table__.create(bind=conn, checkfirst=True)
+    conn.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_conversation_sessions_user_last "
+        "ON conversation_sessions (user_id, last_message_at)"
+    ))
+    # Fill summaries for history written before the table existed
+    db = Session(bind=conn)
+    try:
+        ConversationSessionService.backfill(db)
+    finally:
+        db.close()
+
+def _refresh_tokens(conn: Connection) -> None:
+    RefreshToken.__table__.create(bind=conn, checkfirst=True)
+
+def _response_cache(conn: Connection) -> None:
+    CachedResponse.__table__.create(bind=conn, checkfirst=True)
+
+def _renormalize_response_cache(conn: Connection) -> None:
+    # Replies cached under the old normalization had negations stripped, so
+    # their fingerprints and messages can't be compared with new ones
+    conn.execute(text("DELETE FROM response_cache"))
+
+def _video_search_results(conn: Connection) -> None:
+    VideoSearchResult.__table__.create(bind=conn, checkfirst=True)
+    # Carry over the per-video search columns; a video returned for several
+    # queries only kept the last one. The old columns are left unused.
+    conn.execute(text(
+        "INSERT INTO video_search_results (search_query, video_id, rank, cached_at) "
+        "SELECT search_query, video_id, search_rank, cached_at FROM video_recommendations "
+        "WHERE search_query IS NOT NULL AND search_rank IS NOT NULL AND cached_at IS NOT NULL"
+    ))
+    conn.execute(text("DROP INDEX IF EXISTS ix_video_recommendations_search_query"))
+
+MIGRATIONS: List[Tuple[int, str, Callable[[Connection], None]]] = [
+    (1, "initial schema", _initial_schema),
+    (2, "video search cache columns", _video_search_cache_columns),
+    (3, "unique video ids", _unique_video_ids),
+    (4, "conversation and assessment history indexes", _history_indexes),
+    (5, "conversation session summaries", _conversation_sessions),
+    (6, "refresh tokens", _refresh_tokens),
+    (7, "gemini response cache", _response_cache),
+    (8, "response cache keeps negations", _renormalize_response_cache),
+    (9, "video search results per query", _video_search_results),
+]
+
+def applied_versions(conn: Connection) -> set:
+    conn.execute(text(
+        "CREATE TABLE IF NOT EXISTS schema_migrations ("
+        "version INTEGER PRIMARY KEY, name VARCHAR(255) NOT NULL, applied_at DATETIME NOT NULL)"
+    ))
+    return {row[0] for row in conn.execute(text("SELECT version FROM schema_migrations"))}
+
+@contextmanager
+def _locked_transaction(bind: Engine) -> Iterator[Connection]:
+    """Transaction holding the database write lock from its first statement"""
+    if bind.dialect.name != "sqlite":
+        # Elsewhere a concurrent duplicate fails on the schema_migrations primary key
+        with bind.begin() as conn:
+            yield conn
+        return
+    # The driver's own transaction handling would only BEGIN (deferred) on
+    # the first write, so take over and lock up front
+    with bind.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        conn.exec_driver_sql("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except BaseException:
+            conn.exec_driver_sql("ROLLBACK")
+            raise
+        conn.exec_driver_sql("COMMIT")
+
+def migrate(bind: Engine = engine) -> List[int]:
+    """Apply pending migrations in order and return the versions applied"""
+    with bind.begin() as conn:
+        done = applied_versions(conn)
+
+    applied = []
+    for version, name, step in MIGRATIONS:
+        if version in done:
+            continue
+        with _locked_transaction(bind) as conn:
+            # Another worker may have applied it while we waited for the lock
+            if version in applied_versions(conn):
+                continue
+            step(conn)
+            conn.execute(
+                text("INSERT INTO schema_migrations (version, name, applied_at) VALUES (:version, :name, :applied_at)"),
+                {"version": version, "name": name, "applied_at": datetime.utcnow()}
+            )
+        applied.append(version)
+    return applied
+
+def backfill_sessions() -> int:
+    """Rebuild conversation_sessions from the conversations table"""
+    db = SessionLocal()
+    try:
+        return ConversationSessionService.backfill(db)
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    import sys
+    if sys.argv[1:] == ["backfill-sessions"]:
+        migrate()
+        print(f"Rebuilt {backfill_sessions()} conversation session summaries")
+    else:
+        versions = migrate()
+        print(f"Applied migrations: {versions}" if versions else "Database is up to date")
@@ -0,0 +1,29 @@
+from typing import Optional, Tuple
+import base64
+import json
+from fastapi import HTTPException
+
+# Hard cap on page size for history endpoints
+MAX_PAGE_SIZE = 100
+
+def clamp_limit(limit: int, maximum: int = MAX_PAGE_SIZE) -> int:
+    """Keep a requested page size within 1..maximum"""
+    return max(1, min(limit, maximum))
+
+def encode_cursor(*parts) -> str:
+    """Opaque cursor pointing just past the last row of a page"""
+    raw = json.dumps(list(parts), separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_cursor(cursor: Optional[str], size: int) -> Optional[Tuple]:
+    """Decode a cursor produced by encode_cursor, or raise a 400"""
+    if not cursor:
+        return None
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        parts = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if not isinstance(parts, list) or len(parts) != size:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return tuple(parts)
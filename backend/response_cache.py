@@ -0,0 +1,226 @@
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+from datetime import datetime
+import hashlib
+import re
+import zlib
+import numpy as np
+from scipy import sparse
+from cache import TTLCache
+
+# Width of the hashed term space message vectors live in
+HASH_BUCKETS = 1 << 20
+
+# Every word is kept, single letters included ("i", "a")
+WORD_PATTERN = re.compile(r"\w+")
+
+# Negated contractions, written with or without the apostrophe
+CONTRACTIONS = {"can't": "can not", "cant": "can not", "cannot": "can not", "won't": "will not",
+                "wont": "will not", "ain't": "is not", "aint": "is not"}
+NOT_CONTRACTION = re.compile(r"\b(\w+)n't\b|\b(do|does|did|is|are|was|were|has|have|had|would|should|could)nt\b")
+
+# Words that flip what a message means; never stemmed, and messages only
+# reuse a similar message's reply if they contain the same ones
+NEGATIONS = frozenset({
+    "not", "no", "never", "nothing", "none", "nobody", "nowhere", "neither", "nor", "without", "hardly"
+})
+
+# Words that say little about what a message is about. They are kept (the
+# exact fingerprint still depends on them) but weigh less in the similarity
+# vectors, so "i feel off today" and "feeling off today" are near
+# duplicates. Negations are not in this list.
+FUNCTION_WORDS = frozenset({
+    "i", "me", "my", "myself", "im", "m", "ve", "ll", "d", "re", "you", "your", "it", "its", "we", "our",
+    "he", "she", "they", "them", "their", "a", "an", "the", "and", "or", "but", "so", "to", "of", "in",
+    "on", "at", "for", "with", "about", "from", "by", "as", "that", "this", "is", "am", "are", "was",
+    "were", "be", "been", "do", "does", "did", "have", "has", "had", "just", "really", "very", "s"
+})
+FUNCTION_WORD_WEIGHT = 0.3
+
+# Endings stripped so "feel", "feels" and "feeling" share a term
+SUFFIXES = [("ingly", ""), ("edly", ""), ("ings", ""), ("ing", ""), ("ies", "y"), ("ied", "y"),
+            ("ed", ""), ("es", ""), ("s", ""), ("ly", "")]
+
+def _stem(token: str) -> str:
+    if token in NEGATIONS or len(token) <= 3:
+        return token
+    for suffix, replacement in SUFFIXES:
+        if token.endswith(suffix) and len(token) - len(suffix) >= 3:
+            stem = token[:-len(suffix)]
+            if suffix == "es" and not stem.endswith(("s", "x", "z", "ch", "sh")):
+                stem = token[:-1]
+            elif suffix == "s" and stem.endswith(("s", "u", "i")):
+                continue
+            return stem + replacement
+    return token
+
+# Stemmed forms, since weights are looked up on normalized tokens
+FUNCTION_WORDS = frozenset(_stem(word) for word in FUNCTION_WORDS)
+
+def _weight(token: str) -> float:
+    return FUNCTION_WORD_WEIGHT if token in FUNCTION_WORDS else 1.0
+
+class CachedReply(NamedTuple):
+    message: str                 # Normalized terms
+    response: str
+    latency: float               # Seconds the original Gemini call took
+    vector: sparse.csr_matrix
+    negations: Tuple[str, ...]   # Negation words of the message, in order
+
+class _Index(NamedTuple):
+    members: frozenset           # Keys the matrix was built from
+    keys: List[str]              # Key of each matrix row
+    negations: List[Tuple[str, ...]]
+    vectors: Optional[sparse.csr_matrix]
+
+class ResponseCache:
+    """Reuses Gemini replies for messages that say the same thing.
+
+    Messages are normalized to lowercase, lightly stemmed words, so "I feel
+    off today" and "i feel off today!" share one fingerprint. No word is
+    dropped: negations and function words carry meaning ("I'm not happy" is
+    not "I'm happy"), so the intent model's stop-word list is not used.
+    When there is no exact match the nearest cached message with the same
+    negations is found by cosine similarity of hashed unigram and bigram
+    vectors, and its reply is reused if the similarity reaches the
+    threshold. Entries are LRU-bounded and expire after a TTL.
+    """
+
+    def __init__(self, max_size: int = 512, ttl: float = 86400, threshold: float = 0.9):
+        self.cache = TTLCache(max_size=max_size, ttl=ttl)
+        self.ttl = ttl
+        self.threshold = threshold
+        # Stacked vectors of the cached messages, rebuilt when the set of
+        # entries changes (not when a lookup only reorders the LRU)
+        self._index = _Index(frozenset(), [], [], None)
+        self.lookups = 0
+        self.exact_hits = 0
+        self.similar_hits = 0
+        self.saved_seconds = 0.0
+
+    @staticmethod
+    def normalize(message: str) -> str:
+        """Lowercase, stemmed words of a message with negations spelled out"""
+        text = message.lower().replace("\u2019", "'")
+        text = re.sub(r"\b(?:%s)\b" % "|".join(re.escape(word) for word in CONTRACTIONS),
+                      lambda match: CONTRACTIONS[match.group(0)], text)
+        text = NOT_CONTRACTION.sub(lambda match: (match.group(1) or match.group(2)) + " not", text)
+        return " ".join(_stem(token) for token in WORD_PATTERN.findall(text))
+
+    @staticmethod
+    def negations(normalized: str) -> Tuple[str, ...]:
+        return tuple(token for token in normalized.split() if token in NEGATIONS)
+
+    @staticmethod
+    def fingerprint(normalized: str) -> str:
+        return hashlib.sha256(normalized.encode()).hexdigest()
+
+    @staticmethod
+    def _vector(normalized: str) -> sparse.csr_matrix:
+        """L2-normalized weighted vector of unigrams and bigrams, hashed
+
+        A bigram weighs as much as the lighter of its two words.
+        """
+        tokens = normalized.split()
+        terms = [(token, _weight(token)) for token in tokens] + [
+            (f"{a} {b}", min(_weight(a), _weight(b))) for a, b in zip(tokens, tokens[1:])
+        ]
+        counts: Dict[int, float] = {}
+        for term, weight in terms:
+            column = zlib.crc32(term.encode()) % HASH_BUCKETS
+            counts[column] = counts.get(column, 0.0) + weight
+        columns = sorted(counts)
+        data = np.array([counts[column] for column in columns], dtype=np.float64)
+        if data.size:
+            data /= np.sqrt((data ** 2).sum())
+        return sparse.csr_matrix(
+            (data, np.array(columns, dtype=np.int64), np.array([0, len(columns)], dtype=np.int64)),
+            shape=(1, HASH_BUCKETS)
+        )
+
+    def _entry(self, normalized: str, response: str, latency: float) -> CachedReply:
+        return CachedReply(normalized, response, latency, self._vector(normalized), self.negations(normalized))
+
+    def _nearest(self, normalized: str) -> Optional[Tuple[str, float]]:
+        """Key and similarity of the closest cached message with the same negations"""
+        entries = self.cache.items()
+        if not entries:
+            return None
+        members = frozenset(key for key, _ in entries)
+        if self._index.members != members:
+            self._index = _Index(
+                members, [key for key, _ in entries], [reply.negations for _, reply in entries],
+                sparse.vstack([reply.vector for _, reply in entries]).tocsr()
+            )
+        index = self._index
+        similarities = (index.vectors @ self._vector(normalized).T).toarray().ravel()
+        negations = self.negations(normalized)
+        similarities[[row for row, other in enumerate(index.negations) if other != negations]] = -1.0
+        best = int(similarities.argmax())
+        return index.keys[best], float(similarities[best])
+
+    def get(self, message: str) -> Optional[str]:
+        """Cached reply for this message or a close enough one, else None"""
+        normalized = self.normalize(message)
+        if not normalized:
+            return None
+        self.lookups += 1
+
+        key = self.fingerprint(normalized)
+        reply = self.cache.get(key)
+        if reply is not None:
+            self.exact_hits += 1
+        else:
+            nearest = self._nearest(normalized)
+            if nearest is None or nearest[1] < self.threshold:
+                return None
+            # get() also marks the entry as recently used
+            reply = self.cache.get(nearest[0])
+            if reply is None:
+                return None
+            self.similar_hits += 1
+
+        self.saved_seconds += reply.latency
+        return reply.response
+
+    def set(self, message: str, response: str, latency: float) -> Optional[Tuple[str, str]]:
+        """Cache a reply; returns (fingerprint, normalized message) to persist"""
+        normalized = self.normalize(message)
+        if not normalized:
+            return None
+        key = self.fingerprint(normalized)
+        self.cache.set(key, self._entry(normalized, response, latency))
+        return key, normalized
+
+    def warm(self, rows: Iterable) -> int:
+        """Load persisted replies (oldest first) with their remaining TTL"""
+        now = datetime.utcnow()
+        loaded = 0
+        for row in rows:
+            remaining = self.ttl - (now - row.created_at.replace(tzinfo=None)).total_seconds()
+            if remaining <= 0:
+                continue
+            self.cache.set(
+                row.fingerprint,
+                self._entry(row.message, row.response, row.latency),
+                ttl=remaining
+            )
+            loaded += 1
+        return loaded
+
+    def stats(self) -> Dict:
+        """Counters for the /metrics endpoint"""
+        cache_stats = self.cache.stats()
+        hits = self.exact_hits + self.similar_hits
+        return {
+            "size": cache_stats["size"],
+            "max_size": cache_stats["max_size"],
+            "ttl_seconds": self.ttl,
+            "similarity_threshold": self.threshold,
+            "lookups": self.lookups,
+            "exact_hits": self.exact_hits,
+            "similar_hits": self.similar_hits,
+            "hit_rate": round(hits / self.lookups, 4) if self.lookups else 0.0,
+            "saved_seconds": round(self.saved_seconds, 3),
+            "evictions": cache_stats["evictions"],
+            "expirations": cache_stats["expirations"]
+        }
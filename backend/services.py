@@ -1,8 +1,11 @@
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Tuple
+from sqlalchemy import String, delete, insert, or_, select, type_coerce
 from sqlalchemy.orm import Session
-from datetime import datetime
+from sqlalchemy.ext.asyncio import AsyncSession
+from datetime import datetime, timedelta
+import json
 import uuid
-from database import Conversation, Assessment, VideoRecommendation, User
+from database import Conversation, ConversationSession, Assessment, VideoRecommendation, VideoSearchResult, CachedResponse, User
 
 class ConversationService:
     """Service for managing chat conversations"""
@@ -27,13 +30,65 @@ class ConversationService:
             user_message=user_message,
             bot_response=bot_response,
             intent=intent,
-            confidence=confidence
+            confidence=confidence,
+            created_at=datetime.utcnow()
         )
         db.add(conversation)
+        ConversationSessionService.record_turns(db, [ConversationService._as_record(conversation)])
         db.commit()
         db.refresh(conversation)
         return conversation
     
+    @staticmethod
+    def create_conversations_bulk(db: Session, records: List[Dict]) -> int:
+        """Insert many conversation entries with one multi-row statement and one commit"""
+        if not records:
+            return 0
+        db.execute(insert(Conversation), records)
+        ConversationSessionService.record_turns(db, records)
+        db.commit()
+        return len(records)
+    
+    @staticmethod
+    def _as_record(conversation: Conversation) -> Dict:
+        return {
+            "user_id": conversation.user_id,
+            "session_id": conversation.session_id,
+            "user_message": conversation.user_message,
+            "intent": conversation.intent,
+            "created_at": conversation.created_at
+        }
+    
+    @staticmethod
+    async def create_conversation_async(
+        db: AsyncSession,
+        user_id: int,
+        user_message: str,
+        bot_response: str,
+        intent: str,
+        confidence: float,
+        session_id: Optional[str] = None
+    ) -> Conversation:
+        """Create a new conversation entry"""
+        if not session_id:
+            session_id = str(uuid.uuid4())
+        
+        conversation = Conversation(
+            user_id=user_id,
+            session_id=session_id,
+            user_message=user_message,
+            bot_response=bot_response,
+            intent=intent,
+            confidence=confidence,
+            created_at=datetime.utcnow()
+        )
+        db.add(conversation)
+        record = ConversationService._as_record(conversation)
+        await db.run_sync(lambda sync_db: ConversationSessionService.record_turns(sync_db, [record]))
+        await db.commit()
+        await db.refresh(conversation)
+        return conversation
+    
     @staticmethod
     def get_user_conversations(
         db: Session,
@@ -49,6 +104,66 @@ class ConversationService:
         
         return query.order_by(Conversation.created_at.desc()).limit(limit).all()
     
+    @staticmethod
+    async def get_user_conversations_async(
+        db: AsyncSession,
+        user_id: int,
+        limit: int = 50,
+        session_id: Optional[str] = None
+    ) -> List[Conversation]:
+        """Get conversation history for a user"""
+        query = select(Conversation).where(Conversation.user_id == user_id)
+        
+        if session_id:
+            query = query.where(Conversation.session_id == session_id)
+        
+        result = await db.execute(query.order_by(Conversation.created_at.desc()).limit(limit))
+        return list(result.scalars().all())
+    
+    @staticmethod
+    async def get_user_conversations_page_async(
+        db: AsyncSession,
+        user_id: int,
+        limit: int = 50,
+        session_id: Optional[str] = None,
+        before: Optional[Tuple[str, int]] = None
+    ) -> List:
+        """Get one page of conversation history, newest first.
+
+        Keyset pagination on (created_at, id): `before` is the (created_key, id)
+        of the last row of the previous page. Only the columns the API returns
+        are selected. Up to limit + 1 rows are returned so callers can tell
+        whether another page exists.
+        """
+        # Compare created_at as stored, so cursors match rows exactly whatever
+        # timestamp format they were written with, and the index still applies
+        created_key = type_coerce(Conversation.created_at, String)
+        query = select(
+            Conversation.id,
+            Conversation.session_id,
+            Conversation.user_message,
+            Conversation.bot_response,
+            Conversation.intent,
+            Conversation.confidence,
+            Conversation.created_at,
+            created_key.label("created_key")
+        ).where(Conversation.user_id == user_id)
+        
+        if session_id:
+            query = query.where(Conversation.session_id == session_id)
+        
+        if before:
+            before_created, before_id = before
+            query = query.where(
+                created_key <= before_created,
+                or_(created_key < before_created, Conversation.id < before_id)
+            )
+        
+        result = await db.execute(
+            query.order_by(Conversation.created_at.desc(), Conversation.id.desc()).limit(limit + 1)
+        )
+        return list(result.all())
+    
     @staticmethod
     def get_conversation_sessions(db: Session, user_id: int) -> List[str]:
         """Get all conversation session IDs for a user"""
@@ -56,6 +171,136 @@ class ConversationService:
             Conversation.user_id == user_id
         ).distinct().all()
         return [session[0] for session in sessions if session[0]]
+    
+    @staticmethod
+    async def get_conversation_sessions_async(db: AsyncSession, user_id: int) -> List[str]:
+        """Get all conversation session IDs for a user"""
+        result = await db.execute(
+            select(Conversation.session_id).where(Conversation.user_id == user_id).distinct()
+        )
+        return [session_id for session_id in result.scalars().all() if session_id]
+
+class ConversationSessionService:
+    """Service for the per-session conversation summaries"""
+    
+    SNIPPET_LENGTH = 120
+    
+    @staticmethod
+    def record_turns(db: Session, records: List[Dict]) -> None:
+        """Fold new conversation turns into their session summaries.
+
+        Runs in the caller's transaction; the caller commits.
+        """
+        turns_by_key: Dict[Tuple[int, str], List[Dict]] = {}
+        for record in records:
+            if record.get("session_id"):
+                turns_by_key.setdefault((record["user_id"], record["session_id"]), []).append(record)
+        if not turns_by_key:
+            return
+        
+        existing = {
+            (summary.user_id, summary.session_id): summary
+            for summary in db.execute(
+                select(ConversationSession).where(or_(*[
+                    (ConversationSession.user_id == user_id) & (ConversationSession.session_id == session_id)
+                    for user_id, session_id in turns_by_key
+                ]))
+            ).scalars()
+        }
+        
+        for (user_id, session_id), turns in turns_by_key.items():
+            summary = existing.get((user_id, session_id))
+            if summary is None:
+                first_at = turns[0]["created_at"] or datetime.utcnow()
+                summary = ConversationSession(
+                    user_id=user_id,
+                    session_id=session_id,
+                    first_message_at=first_at,
+                    last_message_at=first_at,
+                    message_count=0,
+                    intent_counts="{}"
+                )
+                db.add(summary)
+            ConversationSessionService._apply(summary, turns)
+    
+    @staticmethod
+    def _apply(summary: ConversationSession, turns: List[Dict]) -> None:
+        intent_counts = json.loads(summary.intent_counts or "{}")
+        for turn in turns:
+            created_at = turn["created_at"] or datetime.utcnow()
+            if created_at < summary.first_message_at:
+                summary.first_message_at = created_at
+            if created_at >= summary.last_message_at:
+                summary.last_message_at = created_at
+                summary.last_snippet = turn["user_message"][:ConversationSessionService.SNIPPET_LENGTH]
+            intent_counts[turn["intent"]] = intent_counts.get(turn["intent"], 0) + 1
+        summary.message_count = (summary.message_count or 0) + len(turns)
+        summary.intent_counts = json.dumps(intent_counts)
+        summary.dominant_intent = max(intent_counts, key=intent_counts.get)
+    
+    @staticmethod
+    def backfill(db: Session, batch_size: int = 1000) -> int:
+        """Rebuild every session summary from the conversations table.
+
+        Returns the number of sessions written.
+        """
+        db.query(ConversationSession).delete()
+        rows = db.execute(
+            select(
+                Conversation.user_id,
+                Conversation.session_id,
+                Conversation.user_message,
+                Conversation.intent,
+                Conversation.created_at
+            ).where(
+                Conversation.session_id.isnot(None)
+            ).order_by(
+                Conversation.user_id, Conversation.session_id, Conversation.created_at, Conversation.id
+            ).execution_options(yield_per=batch_size)
+        )
+        
+        sessions = 0
+        current_key = None
+        turns: List[Dict] = []
+        for row in rows:
+            key = (row.user_id, row.session_id)
+            # Flush per session, and in chunks so very long sessions keep memory flat
+            if turns and (key != current_key or len(turns) >= batch_size):
+                ConversationSessionService.record_turns(db, turns)
+                db.flush()
+                turns = []
+            if key != current_key:
+                sessions += 1
+                current_key = key
+            turns.append(dict(row._mapping))
+        if turns:
+            ConversationSessionService.record_turns(db, turns)
+        db.commit()
+        return sessions
+    
+    @staticmethod
+    async def get_sessions_page_async(
+        db: AsyncSession,
+        user_id: int,
+        limit: int = 20,
+        before: Optional[Tuple[datetime, int]] = None
+    ) -> List[ConversationSession]:
+        """Get one page of session summaries, most recently active first.
+
+        Keyset pagination on (last_message_at, id); returns up to limit + 1 rows
+        so callers can tell whether another page exists.
+        """
+        query = select(ConversationSession).where(ConversationSession.user_id == user_id)
+        if before:
+            before_last, before_id = before
+            query = query.where(
+                ConversationSession.last_message_at <= before_last,
+                or_(ConversationSession.last_message_at < before_last, ConversationSession.id < before_id)
+            )
+        result = await db.execute(
+            query.order_by(ConversationSession.last_message_at.desc(), ConversationSession.id.desc()).limit(limit + 1)
+        )
+        return list(result.scalars().all())
 
 class AssessmentService:
     """Service for managing mental health assessments"""
@@ -67,11 +312,33 @@ class AssessmentService:
         answers: Dict[str, int]
     ) -> Assessment:
         """Create a new assessment entry"""
+        assessment = AssessmentService._build_assessment(user_id, answers)
+        db.add(assessment)
+        db.commit()
+        db.refresh(assessment)
+        return assessment
+    
+    @staticmethod
+    async def create_assessment_async(
+        db: AsyncSession,
+        user_id: int,
+        answers: Dict[str, int]
+    ) -> Assessment:
+        """Create a new assessment entry"""
+        assessment = AssessmentService._build_assessment(user_id, answers)
+        db.add(assessment)
+        await db.commit()
+        await db.refresh(assessment)
+        return assessment
+    
+    @staticmethod
+    def _build_assessment(user_id: int, answers: Dict[str, int]) -> Assessment:
+        """Score the answers and build an unsaved Assessment"""
         total_score = sum(answers.values())
         risk_level = AssessmentService._calculate_risk_level(total_score)
         recommendations = AssessmentService._generate_recommendations(total_score, risk_level)
         
-        assessment = Assessment(
+        return Assessment(
             user_id=user_id,
             question_1=answers.get('question_1', 0),
             question_2=answers.get('question_2', 0),
@@ -85,10 +352,6 @@ class AssessmentService:
             risk_level=risk_level,
             recommendations=recommendations
         )
-        db.add(assessment)
-        db.commit()
-        db.refresh(assessment)
-        return assessment
     
     @staticmethod
     def get_user_assessments(
@@ -101,6 +364,20 @@ class AssessmentService:
             Assessment.user_id == user_id
         ).order_by(Assessment.created_at.desc()).limit(limit).all()
     
+    @staticmethod
+    async def get_user_assessments_async(
+        db: AsyncSession,
+        user_id: int,
+        limit: int = 10
+    ) -> List[Assessment]:
+        """Get assessment history for a user"""
+        result = await db.execute(
+            select(Assessment).where(
+                Assessment.user_id == user_id
+            ).order_by(Assessment.created_at.desc()).limit(limit)
+        )
+        return list(result.scalars().all())
+    
     @staticmethod
     def get_latest_assessment(db: Session, user_id: int) -> Optional[Assessment]:
         """Get the most recent assessment for a user"""
@@ -108,6 +385,16 @@ class AssessmentService:
             Assessment.user_id == user_id
         ).order_by(Assessment.created_at.desc()).first()
     
+    @staticmethod
+    async def get_latest_assessment_async(db: AsyncSession, user_id: int) -> Optional[Assessment]:
+        """Get the most recent assessment for a user"""
+        result = await db.execute(
+            select(Assessment).where(
+                Assessment.user_id == user_id
+            ).order_by(Assessment.created_at.desc()).limit(1)
+        )
+        return result.scalars().first()
+    
     @staticmethod
     def _calculate_risk_level(total_score: int) -> str:
         """Calculate risk level based on total score"""
@@ -167,6 +454,133 @@ class VideoService:
         db.refresh(video)
         return video
     
+    @staticmethod
+    def get_cached_search(
+        db: Session,
+        search_query: str,
+        max_results: int,
+        max_age_seconds: float
+    ) -> Optional[List[Dict]]:
+        """Return stored results for a normalized query if fresh enough, else None"""
+        rows = db.execute(
+            VideoService._cached_search_query(search_query, max_results, max_age_seconds)
+        ).scalars().all()
+        return VideoService._cached_search_results(rows, max_results)
+
+    @staticmethod
+    async def get_cached_search_async(
+        db: AsyncSession,
+        search_query: str,
+        max_results: int,
+        max_age_seconds: float
+    ) -> Optional[List[Dict]]:
+        """Return stored results for a normalized query if fresh enough, else None"""
+        result = await db.execute(
+            VideoService._cached_search_query(search_query, max_results, max_age_seconds)
+        )
+        return VideoService._cached_search_results(result.scalars().all(), max_results)
+
+    @staticmethod
+    def _cached_search_query(search_query: str, max_results: int, max_age_seconds: float):
+        cutoff = datetime.utcnow() - timedelta(seconds=max_age_seconds)
+        return select(VideoRecommendation).join(
+            VideoSearchResult, VideoSearchResult.video_id == VideoRecommendation.video_id
+        ).where(
+            VideoSearchResult.search_query == search_query,
+            VideoSearchResult.cached_at >= cutoff
+        ).order_by(VideoSearchResult.rank).limit(max_results)
+
+    @staticmethod
+    def _cached_search_results(rows: List[VideoRecommendation], max_results: int) -> Optional[List[Dict]]:
+        # A partial result set (the API returned fewer videos) counts as a miss
+        if len(rows) < max_results:
+            return None
+
+        return [
+            {
+                'id': row.video_id,
+                'title': row.title,
+                'description': row.description,
+                'thumbnail': row.thumbnail_url,
+                'url': row.youtube_url,
+                'channel': row.channel_name
+            }
+            for row in rows
+        ]
+
+    @staticmethod
+    def save_video_recommendations_bulk(
+        db: Session,
+        videos: List[Dict],
+        intent_category: str,
+        keywords: Optional[str] = None,
+        commit: bool = True
+    ) -> int:
+        """Insert a batch of videos with one statement and one commit.
+
+        Videos that already exist are left alone. Returns the number of rows
+        in the batch.
+        """
+        rows = {}
+        for video in videos:
+            # A batch must not touch the same row twice
+            if video['id'] in rows:
+                continue
+            rows[video['id']] = {
+                'video_id': video['id'],
+                'title': video['title'],
+                'description': video.get('description'),
+                'thumbnail_url': video.get('thumbnail'),
+                'youtube_url': video['url'],
+                'channel_name': video.get('channel'),
+                'intent_category': intent_category,
+                'keywords': keywords,
+                'is_active': True
+            }
+        if not rows:
+            return 0
+
+        stmt = VideoService._insert(db)(VideoRecommendation).values(list(rows.values()))
+        db.execute(stmt.on_conflict_do_nothing(index_elements=['video_id']))
+        if commit:
+            db.commit()
+        return len(rows)
+
+    @staticmethod
+    def _insert(db: Session):
+        """Dialect-specific insert construct that supports ON CONFLICT"""
+        if db.get_bind().dialect.name == "postgresql":
+            from sqlalchemy.dialects.postgresql import insert
+        else:
+            from sqlalchemy.dialects.sqlite import insert
+        return insert
+
+    @staticmethod
+    def save_search_results(
+        db: Session,
+        search_query: str,
+        videos: List[Dict],
+        intent_category: str,
+        keywords: Optional[str] = None
+    ) -> None:
+        """Record the results of a YouTube search so they can be served from cache.
+
+        The query's previous results are replaced; other queries that returned
+        the same videos keep theirs.
+        """
+        VideoService.save_video_recommendations_bulk(db, videos, intent_category, keywords, commit=False)
+        now = datetime.utcnow()
+        ranks = {}
+        for rank, video in enumerate(videos):
+            ranks.setdefault(video['id'], rank)
+        db.execute(delete(VideoSearchResult).where(VideoSearchResult.search_query == search_query))
+        if ranks:
+            db.execute(insert(VideoSearchResult), [
+                {'search_query': search_query, 'video_id': video_id, 'rank': rank, 'cached_at': now}
+                for video_id, rank in ranks.items()
+            ])
+        db.commit()
+
     @staticmethod
     def get_videos_by_intent(
         db: Session,
@@ -179,6 +593,21 @@ class VideoService:
             VideoRecommendation.is_active == True
         ).limit(limit).all()
     
+    @staticmethod
+    async def get_videos_by_intent_async(
+        db: AsyncSession,
+        intent_category: str,
+        limit: int = 10
+    ) -> List[VideoRecommendation]:
+        """Get video recommendations by intent category"""
+        result = await db.execute(
+            select(VideoRecommendation).where(
+                VideoRecommendation.intent_category == intent_category,
+                VideoRecommendation.is_active == True
+            ).limit(limit)
+        )
+        return list(result.scalars().all())
+    
     @staticmethod
     def search_videos(
         db: Session,
@@ -192,3 +621,74 @@ class VideoService:
             VideoRecommendation.title.contains(search_term) |
             VideoRecommendation.keywords.contains(search_term)
         ).limit(limit).all()
+    
+    @staticmethod
+    async def search_videos_async(
+        db: AsyncSession,
+        search_term: str,
+        limit: int = 10
+    ) -> List[VideoRecommendation]:
+        """Search videos by title or keywords"""
+        result = await db.execute(
+            select(VideoRecommendation).where(
+                VideoRecommendation.is_active == True
+            ).where(
+                VideoRecommendation.title.contains(search_term) |
+                VideoRecommendation.keywords.contains(search_term)
+            ).limit(limit)
+        )
+        return list(result.scalars().all())
+
+class ResponseCacheService:
+    """Service for the persisted Gemini response cache"""
+
+    @staticmethod
+    def save_response(
+        db: Session,
+        fingerprint: str,
+        message: str,
+        response: str,
+        latency: float
+    ) -> None:
+        """Store a reply, replacing any older one with the same fingerprint"""
+        stmt = VideoService._insert(db)(CachedResponse).values(
+            fingerprint=fingerprint,
+            message=message,
+            response=response,
+            latency=latency,
+            created_at=datetime.utcnow()
+        )
+        stmt = stmt.on_conflict_do_update(
+            index_elements=['fingerprint'],
+            set_={
+                'message': stmt.excluded.message,
+                'response': stmt.excluded.response,
+                'latency': stmt.excluded.latency,
+                'created_at': stmt.excluded.created_at
+            }
+        )
+        db.execute(stmt)
+        db.commit()
+
+    @staticmethod
+    async def get_fresh_responses_async(
+        db: AsyncSession,
+        max_age_seconds: float,
+        limit: int
+    ) -> List[CachedResponse]:
+        """Most recent replies younger than max_age_seconds, oldest first"""
+        cutoff = datetime.utcnow() - timedelta(seconds=max_age_seconds)
+        result = await db.execute(
+            select(CachedResponse).where(
+                CachedResponse.created_at >= cutoff
+            ).order_by(CachedResponse.created_at.desc()).limit(limit)
+        )
+        return list(reversed(result.scalars().all()))
+
+    @staticmethod
+    def purge_expired(db: Session, max_age_seconds: float) -> int:
+        """Delete replies older than max_age_seconds"""
+        cutoff = datetime.utcnow() - timedelta(seconds=max_age_seconds)
+        result = db.execute(delete(CachedResponse).where(CachedResponse.created_at < cutoff))
+        db.commit()
+        return result.rowcount
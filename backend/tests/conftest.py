@@ -0,0 +1,14 @@
+import os
+import sys
+import tempfile
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+# Modules read their configuration at import time: point them at a throwaway
+# database and keep real upstream credentials from a local .env out of tests
+_tmp = tempfile.mkdtemp(prefix="melvis-test-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_tmp, 'test.db')}"
+os.environ["INTENT_MODEL_PATH"] = os.path.join(_tmp, "intent_model")
+os.environ["GEMINI_API_KEY"] = ""
+os.environ["YOUTUBE_API_KEY"] = ""
@@ -0,0 +1,50 @@
+import asyncio
+import threading
+from background import BackgroundWriter
+
+class Gate:
+    """Job that blocks the writer thread until opened, then records its call"""
+
+    def __init__(self):
+        self.opened = threading.Event()
+        self.calls = []
+
+    def __call__(self, db, value):
+        self.opened.wait(5)
+        self.calls.append(value)
+        return value
+
+async def test_submit_drops_jobs_beyond_max_pending():
+    writer = BackgroundWriter(max_pending=3)
+    gate = Gate()
+
+    accepted = [writer.submit(gate, i) for i in range(5)]
+
+    assert [future is not None for future in accepted] == [True, True, True, False, False]
+    assert writer.stats() == {"pending": 3, "max_pending": 3, "dropped": 2}
+    gate.opened.set()
+    await writer.shutdown()
+    assert gate.calls == [0, 1, 2]
+
+async def test_room_frees_up_as_jobs_finish():
+    writer = BackgroundWriter(max_pending=1)
+    gate = Gate()
+    gate.opened.set()
+
+    await writer.submit(gate, 0)
+    assert writer.submit(gate, 1) is not None
+    await writer.shutdown()
+    assert gate.calls == [0, 1] and writer.dropped == 0
+
+async def test_run_is_never_dropped():
+    writer = BackgroundWriter(max_pending=1)
+    gate = Gate()
+    writer.submit(gate, "queued")
+
+    waiting = asyncio.ensure_future(writer.run(gate, "awaited"))
+    await asyncio.sleep(0.05)
+    gate.opened.set()
+
+    assert await waiting == "awaited"
+    await writer.shutdown()
+    assert writer.dropped == 0
@@ -0,0 +1,211 @@
+import time
+import uuid
+import httpx
+import pytest
+import main
+from circuit_breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, CircuitOpenError
+from test_youtube_service import STUB_BASE_URL, StubApi, unique_query
+
+OPEN_SECONDS = 0.05
+
+def make_breaker(**kwargs) -> CircuitBreaker:
+    settings = dict(window_size=4, minimum_calls=4, open_seconds=OPEN_SECONDS, half_open_calls=2, slow_call_seconds=1.0)
+    settings.update(kwargs)
+    return CircuitBreaker("test", **settings)
+
+def record(breaker: CircuitBreaker, failed: bool, duration: float = 0.01) -> None:
+    assert breaker.allow()
+    if failed:
+        breaker.record_failure(duration)
+    else:
+        breaker.record_success(duration)
+
+def open_breaker(breaker: CircuitBreaker) -> None:
+    for _ in range(breaker.minimum_calls):
+        record(breaker, failed=True)
+    assert breaker.state == OPEN
+
+def wait_for_half_open(breaker: CircuitBreaker) -> None:
+    time.sleep(OPEN_SECONDS * 1.5)
+    assert breaker.allow()
+    assert breaker.state == HALF_OPEN
+
+def test_stays_closed_below_minimum_calls():
+    breaker = make_breaker()
+    for _ in range(breaker.minimum_calls - 1):
+        record(breaker, failed=True)
+    assert breaker.state == CLOSED
+
+def test_stays_closed_below_failure_rate():
+    breaker = make_breaker(failure_rate=0.75)
+    for failed in (True, False, True, False, True, False):
+        record(breaker, failed)
+    assert breaker.state == CLOSED
+
+def test_opens_on_failure_rate_and_rejects_calls():
+    breaker = make_breaker()
+    open_breaker(breaker)
+
+    assert not breaker.allow()
+    assert breaker.stats()["rejected"] == 1
+    assert [t["to"] for t in breaker.transitions] == [OPEN]
+
+def test_opens_on_slow_call_rate():
+    breaker = make_breaker()
+    for _ in range(breaker.minimum_calls):
+        record(breaker, failed=False, duration=2.0)
+    assert breaker.state == OPEN
+
+def test_half_open_probes_succeeding_close_the_breaker():
+    breaker = make_breaker()
+    open_breaker(breaker)
+    wait_for_half_open(breaker)
+
+    breaker.record_success(0.01)
+    assert breaker.state == HALF_OPEN
+    record(breaker, failed=False)
+
+    assert breaker.state == CLOSED
+    assert [t["to"] for t in breaker.transitions] == [OPEN, HALF_OPEN, CLOSED]
+    assert breaker.stats()["window_calls"] == 0
+
+def test_half_open_limits_probes():
+    breaker = make_breaker()
+    open_breaker(breaker)
+    wait_for_half_open(breaker)
+
+    assert breaker.allow()
+    assert not breaker.allow()
+    # A probe that ends without an outcome gives its slot back
+    breaker.release()
+    assert breaker.allow()
+
+def test_failed_half_open_probe_reopens_the_breaker():
+    breaker = make_breaker()
+    open_breaker(breaker)
+    wait_for_half_open(breaker)
+
+    breaker.record_failure(0.01)
+
+    assert breaker.state == OPEN
+    assert not breaker.allow()
+    assert [t["to"] for t in breaker.transitions] == [OPEN, HALF_OPEN, OPEN]
+
+def test_slow_half_open_probe_reopens_the_breaker():
+    breaker = make_breaker()
+    open_breaker(breaker)
+    wait_for_half_open(breaker)
+
+    breaker.record_success(2.0)
+    assert breaker.state == OPEN
+
+async def test_call_records_outcomes_and_raises_when_open():
+    breaker = make_breaker()
+
+    async def fail():
+        raise RuntimeError("upstream down")
+
+    for _ in range(breaker.minimum_calls):
+        with pytest.raises(RuntimeError):
+            await breaker.call(fail)
+
+    calls = []
+
+    async def succeed():
+        calls.append(1)
+
+    with pytest.raises(CircuitOpenError):
+        await breaker.call(succeed)
+    assert calls == []
+
+class FaultyModel:
+    """Stand-in Gemini model that counts its calls and answers after a delay"""
+
+    class Response:
+        text = "a real reply"
+
+    def __init__(self, delay: float):
+        self.delay = delay
+        self.calls = 0
+
+    def generate_content(self, prompt, stream=False):
+        self.calls += 1
+        time.sleep(self.delay)
+        if stream:
+            return iter([self.Response()])
+        return self.Response()
+
+def lost_message() -> str:
+    return f"I feel lost {uuid.uuid4().hex}"
+
+@pytest.fixture
+async def gemini_service(monkeypatch):
+    """A Gemini service whose breaker was opened by calls timing out"""
+    monkeypatch.setenv("GEMINI_API_KEY", "test-key")
+    monkeypatch.setenv("GEMINI_TIMEOUT_SECONDS", "0.05")
+    monkeypatch.setattr(main.background_writer, "submit", lambda job, *args: None)
+    service = main.GeminiService()
+    service.model = FaultyModel(delay=0.2)
+    service.breaker = make_breaker()
+    for _ in range(service.breaker.minimum_calls):
+        assert await service.get_mental_health_response(lost_message()) == main.GEMINI_FALLBACK_RESPONSE
+    assert service.breaker.state == OPEN
+    assert service.model.calls == service.breaker.minimum_calls
+    return service
+
+async def test_gemini_timeouts_open_the_breaker_and_canned_replies_are_immediate(gemini_service):
+    started = time.perf_counter()
+    reply = await gemini_service.get_mental_health_response(lost_message())
+
+    assert reply == main.GEMINI_FALLBACK_RESPONSE
+    assert gemini_service.model.calls == gemini_service.breaker.minimum_calls
+    assert time.perf_counter() - started < 0.05
+
+async def test_gemini_stream_answers_with_canned_reply_while_open(gemini_service):
+    chunks = [chunk async for chunk in gemini_service.stream_mental_health_response(lost_message())]
+
+    assert chunks == [main.GEMINI_FALLBACK_RESPONSE]
+    assert gemini_service.model.calls == gemini_service.breaker.minimum_calls
+
+async def test_gemini_recovers_through_half_open_probes(gemini_service):
+    gemini_service.model.delay = 0.0
+    time.sleep(OPEN_SECONDS * 1.5)
+
+    for _ in range(gemini_service.breaker.half_open_calls):
+        assert await gemini_service.get_mental_health_response(lost_message()) == "a real reply"
+
+    assert gemini_service.breaker.state == CLOSED
+    assert [t["to"] for t in gemini_service.breaker.transitions] == [OPEN, HALF_OPEN, CLOSED]
+
+async def test_youtube_5xx_opens_the_breaker_then_recovers(monkeypatch):
+    monkeypatch.setenv("YOUTUBE_API_KEY", "test-key")
+    monkeypatch.setenv("YOUTUBE_API_BASE_URL", STUB_BASE_URL)
+    monkeypatch.setenv("YOUTUBE_MAX_RETRIES", "1")
+    monkeypatch.setattr(main.background_writer, "submit", lambda job, *args: None)
+    failures = 4
+    # Each failing search makes its request and one retry
+    stub = StubApi(*[httpx.Response(500)] * 2 * failures)
+    service = main.YouTubeService(transport=httpx.MockTransport(stub))
+    service.breaker = make_breaker(minimum_calls=failures)
+    try:
+        for _ in range(failures):
+            query = unique_query()
+            assert await service.search_videos(query, 3) == service._get_mock_videos(query)
+        assert service.breaker.state == OPEN
+
+        query = unique_query()
+        started = time.perf_counter()
+        assert await service.search_videos(query, 3) == service._get_mock_videos(query)
+        assert time.perf_counter() - started < 0.1
+        assert len(stub.requests) == 2 * failures
+
+        # The stub answers normally once its queued errors are used up
+        time.sleep(OPEN_SECONDS * 1.5)
+        for _ in range(service.breaker.half_open_calls):
+            videos = await service.search_videos(unique_query(), 3)
+            assert [video["id"] for video in videos] == ["vid0", "vid1", "vid2"]
+    finally:
+        await service.aclose()
+
+    assert service.breaker.state == CLOSED
+    assert [t["to"] for t in service.breaker.transitions] == [OPEN, HALF_OPEN, CLOSED]
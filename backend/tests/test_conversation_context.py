@@ -0,0 +1,157 @@
+import asyncio
+import main
+from conversation_context import ConversationContext
+
+class Loader:
+    """Database stand-in returning fixed turns and counting queries"""
+
+    def __init__(self, turns=None):
+        self.turns = turns or []
+        self.queries = []
+
+    async def __call__(self, user_id, session_id, limit):
+        self.queries.append((user_id, session_id, limit))
+        return self.turns[-limit:]
+
+class SlowLoader(Loader):
+    """Loader whose query only returns once released"""
+
+    def __init__(self, turns=None):
+        super().__init__(turns)
+        self.started = asyncio.Event()
+        self.release = asyncio.Event()
+
+    async def __call__(self, user_id, session_id, limit):
+        turns = await super().__call__(user_id, session_id, limit)
+        self.started.set()
+        await self.release.wait()
+        return turns
+
+async def test_first_get_loads_and_later_gets_hit_memory():
+    loader = Loader([("hi", "hello")])
+    context = ConversationContext(loader)
+
+    assert await context.get(1, "s") == [("hi", "hello")]
+    assert await context.get(1, "s") == [("hi", "hello")]
+    assert loader.queries == [(1, "s", 10)]
+    assert context.stats()["queries_avoided"] == 1
+
+async def test_ring_buffer_keeps_last_turns():
+    loader = Loader([(f"u{i}", f"b{i}") for i in range(5)])
+    context = ConversationContext(loader, turns_per_session=3)
+
+    assert await context.get(1, "s") == [("u2", "b2"), ("u3", "b3"), ("u4", "b4")]
+    context.append(1, "s", "u5", "b5")
+
+    assert await context.get(1, "s") == [("u3", "b3"), ("u4", "b4"), ("u5", "b5")]
+    assert context.stats()["stored_chars"] == 12
+
+async def test_append_to_unloaded_session_is_left_to_the_loader():
+    loader = Loader()
+    context = ConversationContext(loader)
+
+    context.append(1, "s", "hi", "hello")
+
+    assert context.stats()["sessions"] == 0
+    await context.get(1, "s")
+    assert len(loader.queries) == 1
+
+async def test_turns_appended_during_a_slow_load_are_kept():
+    # The log batch with ("second", "two") landed before the query ran
+    loader = SlowLoader([("first", "one"), ("second", "two")])
+    context = ConversationContext(loader)
+
+    loading = asyncio.ensure_future(context.get(1, "s"))
+    await loader.started.wait()
+    context.append(1, "s", "second", "two")
+    context.append(1, "s", "third", "three")
+    loader.release.set()
+
+    expected = [("first", "one"), ("second", "two"), ("third", "three")]
+    assert await loading == expected
+    assert await context.get(1, "s") == expected
+    assert context.stats()["stored_chars"] == sum(len(a) + len(b) for a, b in expected)
+    assert len(loader.queries) == 1
+
+async def test_started_session_needs_no_query():
+    loader = Loader([("stale", "turn")])
+    context = ConversationContext(loader)
+
+    context.start(1, "new")
+    assert await context.get(1, "new") == []
+    context.append(1, "new", "hi", "hello")
+
+    assert await context.get(1, "new") == [("hi", "hello")]
+    assert loader.queries == []
+
+async def test_chat_without_session_id_does_not_query_history(monkeypatch):
+    loader = Loader([("stale", "turn")])
+    monkeypatch.setattr(main, "conversation_context", ConversationContext(loader))
+    prompts = []
+
+    async def gemini(message, history):
+        prompts.append(history)
+        return "reply"
+
+    async def log_turn(*args):
+        pass
+
+    monkeypatch.setattr(main.gemini_service, "get_mental_health_response", gemini)
+    monkeypatch.setattr(main, "log_turn", log_turn)
+
+    result = await main.process_chat(main.ChatMessage(message="my mental health is bad"), 1)
+
+    assert result.response == "reply"
+    assert prompts == [""]
+    assert loader.queries == []
+    assert await main.conversation_context.get(1, result.session_id) == []
+
+async def test_evicts_least_recently_used_session():
+    loader = Loader([("hi", "hello")])
+    context = ConversationContext(loader, max_sessions=2)
+
+    await context.get(1, "a")
+    await context.get(1, "b")
+    # Touch "a" so that "b" is the least recently used
+    await context.get(1, "a")
+    await context.get(1, "c")
+
+    assert context.stats()["evictions"] == 1
+    loader.queries.clear()
+    await context.get(1, "a")
+    await context.get(1, "b")
+    assert loader.queries == [(1, "b", 10)]
+
+async def test_evicts_on_character_budget_but_keeps_latest_session():
+    loader = Loader([("x" * 50, "y" * 50)])
+    context = ConversationContext(loader, max_chars=150)
+
+    await context.get(1, "a")
+    await context.get(1, "b")
+
+    stats = context.stats()
+    assert stats["sessions"] == 1 and stats["stored_chars"] == 100
+    # A single session over the budget on its own is still kept
+    context.append(1, "b", "x" * 100, "y" * 100)
+    assert context.stats()["sessions"] == 1
+
+async def test_loader_error_gives_empty_history():
+    async def failing(user_id, session_id, limit):
+        raise RuntimeError("database down")
+
+    context = ConversationContext(failing)
+    assert await context.get(1, "s") == []
+
+def test_format_keeps_most_recent_turns_within_budget():
+    turns = [("first", "one"), ("second", "two"), ("third", "three")]
+    latest = "User: third\nMelvis: three"
+    previous = "User: second\nMelvis: two"
+
+    assert ConversationContext.format(turns, 10_000) == "\n".join(
+        ["User: first\nMelvis: one", previous, latest]
+    )
+    assert ConversationContext.format(turns, len(latest)) == latest
+    assert ConversationContext.format(turns, len(latest) + len(previous)) == latest
+    assert ConversationContext.format(turns, len(latest) + 1 + len(previous)) == previous + "\n" + latest
+    assert ConversationContext.format(turns, len(latest) - 1) == ""
+    assert ConversationContext.format([], 100) == ""
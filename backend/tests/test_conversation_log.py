@@ -0,0 +1,98 @@
+import asyncio
+from conversation_log import ConversationLogger
+
+class FakeWriter:
+    """Stands in for BackgroundWriter: records written batches, can fail or block"""
+
+    def __init__(self, failures: int = 0):
+        self.failures = failures
+        self.batches = []
+        self.blocked_users = set()
+        self.unblock = asyncio.Event()
+
+    async def run(self, job, batch):
+        if self.blocked_users & {record["user_id"] for record in batch}:
+            await self.unblock.wait()
+        if self.failures:
+            self.failures -= 1
+            raise RuntimeError("database is locked")
+        self.batches.append([(record["user_id"], record["user_message"]) for record in batch])
+        return len(batch)
+
+    @property
+    def written(self):
+        return [record for batch in self.batches for record in batch]
+
+async def log(logger: ConversationLogger, user_id: int, message: str) -> None:
+    await logger.log(user_id=user_id, user_message=message, bot_response="reply", intent="stress", confidence=1.0)
+
+async def test_batches_records_and_flushes_on_demand():
+    writer = FakeWriter()
+    logger = ConversationLogger(writer, batch_size=3, flush_interval=60)
+
+    for i in range(4):
+        await log(logger, 1, f"m{i}")
+    await logger.flush()
+
+    assert writer.batches == [[(1, "m0"), (1, "m1"), (1, "m2")], [(1, "m3")]]
+    assert not logger.has_pending(1)
+    await logger.shutdown()
+
+async def test_flush_user_does_not_wait_for_other_users():
+    writer = FakeWriter()
+    writer.blocked_users.add(2)
+    logger = ConversationLogger(writer, batch_size=1, flush_interval=60)
+
+    await log(logger, 1, "mine")
+    for i in range(3):
+        await log(logger, 2, f"other {i}")
+
+    await asyncio.wait_for(logger.flush_user(1), timeout=1)
+    assert writer.written == [(1, "mine")]
+    assert logger.has_pending(2)
+
+    flushing = asyncio.ensure_future(logger.flush_user(2))
+    await asyncio.sleep(0.05)
+    assert not flushing.done()
+    writer.unblock.set()
+    await asyncio.wait_for(flushing, timeout=1)
+    assert writer.written == [(1, "mine"), (2, "other 0"), (2, "other 1"), (2, "other 2")]
+    await logger.shutdown()
+
+async def test_flush_user_without_pending_records_returns_at_once():
+    writer = FakeWriter()
+    writer.blocked_users.add(2)
+    logger = ConversationLogger(writer, batch_size=1, flush_interval=60)
+
+    await log(logger, 2, "other")
+    await asyncio.wait_for(logger.flush_user(1), timeout=0.1)
+
+    writer.unblock.set()
+    await logger.shutdown()
+
+async def test_failed_batch_is_kept_and_retried_in_order():
+    # Three failures use up every attempt of the first write
+    writer = FakeWriter(failures=3)
+    logger = ConversationLogger(writer, batch_size=2, flush_interval=0.05)
+
+    await log(logger, 1, "first")
+    await log(logger, 1, "second")
+    await asyncio.sleep(0.1)
+    await log(logger, 1, "third")
+    await asyncio.wait_for(logger.flush_user(1), timeout=5)
+
+    assert [message for _, message in writer.written] == ["first", "second", "third"]
+    stats = logger.stats()
+    assert stats["write_errors"] == 1
+    assert stats["records_written"] == 3
+    assert stats["retained"] == 0
+    await logger.shutdown()
+
+async def test_shutdown_gives_up_after_timeout_when_writes_keep_failing():
+    writer = FakeWriter(failures=1000)
+    logger = ConversationLogger(writer, flush_interval=0.01, shutdown_timeout=0.3)
+
+    await log(logger, 1, "lost")
+    await asyncio.wait_for(logger.shutdown(), timeout=2)
+
+    assert writer.written == []
@@ -0,0 +1,87 @@
+import asyncio
+import pytest
+from fastapi import HTTPException
+from idempotency import IdempotencyStore
+
+class Handler:
+    """Counts its calls; each call waits until released"""
+
+    def __init__(self):
+        self.calls = 0
+        self.release = asyncio.Event()
+
+    async def __call__(self, body):
+        self.calls += 1
+        await self.release.wait()
+        return f"response to {body}"
+
+async def test_repeated_key_replays_the_completed_response():
+    store = IdempotencyStore()
+    handler = Handler()
+    handler.release.set()
+    request_hash = store.request_hash({"message": "hi"})
+
+    first = await store.run("key", request_hash, handler, "hi")
+    second = await store.run("key", request_hash, handler, "hi")
+
+    assert first == ("response to hi", False)
+    assert second == ("response to hi", True)
+    assert handler.calls == 1
+    assert store.stats()["replayed"] == 1
+
+async def test_concurrent_duplicates_are_replays():
+    store = IdempotencyStore()
+    handler = Handler()
+    request_hash = store.request_hash({"message": "hi"})
+
+    tasks = [asyncio.ensure_future(store.run("key", request_hash, handler, "hi")) for _ in range(5)]
+    await asyncio.sleep(0)
+    handler.release.set()
+    results = await asyncio.gather(*tasks)
+
+    assert handler.calls == 1
+    assert results[0] == ("response to hi", False)
+    assert results[1:] == [("response to hi", True)] * 4
+    assert store.stats()["replayed"] == 4
+    assert store.stats()["coalesced"] == 4
+
+async def test_different_request_with_a_completed_key_is_rejected():
+    store = IdempotencyStore()
+    handler = Handler()
+    handler.release.set()
+    await store.run("key", store.request_hash({"message": "hi"}), handler, "hi")
+
+    with pytest.raises(HTTPException) as error:
+        await store.run("key", store.request_hash({"message": "bye"}), handler, "bye")
+
+    assert error.value.status_code == 422
+    assert handler.calls == 1
+
+async def test_different_request_with_a_running_key_is_rejected():
+    store = IdempotencyStore()
+    handler = Handler()
+
+    first = asyncio.ensure_future(store.run("key", store.request_hash({"message": "hi"}), handler, "hi"))
+    second = asyncio.ensure_future(store.run("key", store.request_hash({"message": "bye"}), handler, "bye"))
+    await asyncio.sleep(0)
+    handler.release.set()
+
+    assert await first == ("response to hi", False)
+    with pytest.raises(HTTPException) as error:
+        await second
+    assert error.value.status_code == 422
+    assert handler.calls == 1
+
+async def test_failed_request_is_not_remembered():
+    store = IdempotencyStore()
+    request_hash = store.request_hash({"message": "hi"})
+
+    async def fail(body):
+        raise RuntimeError("upstream down")
+
+    with pytest.raises(RuntimeError):
+        await store.run("key", request_hash, fail, "hi")
+
+    handler = Handler()
+    handler.release.set()
+    assert await store.run("key", request_hash, handler, "hi") == ("response to hi", False)
@@ -0,0 +1,52 @@
+import random
+import pytest
+from intent_classifier import VERIFY_CORPUS, IntentClassifier
+
+@pytest.fixture(scope="module")
+def classifier():
+    classifier = IntentClassifier()
+    classifier.load()
+    return classifier
+
+def message_corpus(classifier: IntentClassifier):
+    """Fixed messages plus random mixes of keywords, filler and case"""
+    messages = list(VERIFY_CORPUS) + list(classifier.training_texts) + [
+        "I'm ANXIOUS and Stressed and can't sleep",
+        "stress stress pressure",             # keyword tie between anxiety and stress
+        "tired",                              # keyword shared by stress and sleep
+        "Hello there, how is the weather?",
+        "low mood, low mood, LOW MOOD",
+        "self-care and self care",
+        "café naïve — überwhelmed",
+        "   ",
+        "a",
+    ]
+    words = [keyword for data in classifier.intents.values() for keyword in data["keywords"]]
+    filler = ["i", "feel", "really", "today", "the", "work", "about", "my", "and", "so", "weather", "football"]
+    rng = random.Random(17)
+    for _ in range(500):
+        tokens = rng.choices(words, k=rng.randint(0, 3)) + rng.choices(filler, k=rng.randint(0, 8))
+        rng.shuffle(tokens)
+        messages.append(" ".join(token.upper() if rng.random() < 0.2 else token for token in tokens))
+    return messages
+
+def test_classify_many_matches_classify_intent(classifier):
+    messages = message_corpus(classifier)
+
+    batch = classifier.classify_many(messages)
+
+    assert len(batch) == len(messages)
+    for message, (intent, confidence) in zip(messages, batch):
+        expected_intent, expected_confidence = classifier.classify_intent(message)
+        assert (intent, confidence) == (expected_intent, float(expected_confidence)), message
+
+def test_classify_many_is_independent_of_batch_composition(classifier):
+    messages = message_corpus(classifier)[:200]
+
+    whole = classifier.classify_many(messages)
+    singles = [result for message in messages for result in classifier.classify_many([message])]
+
+    assert whole == singles
+
+def test_classify_many_empty_batch(classifier):
+    assert classifier.classify_many([]) == []
@@ -0,0 +1,66 @@
+import pytest
+import main
+from intent_classifier import IntentClassifier
+from keyword_matcher import KeywordMatcher
+
+@pytest.fixture(scope="module")
+def classifier():
+    return IntentClassifier()
+
+@pytest.mark.parametrize("message, keyword, intent", [
+    ("I keep panicking at night", "panic", "anxiety"),
+    ("I've been sleeping badly", "sleep", "sleep"),
+    ("I'm emotionally drained", "emotional", None),
+    ("everything is so stressful", "stress", "stress"),
+    ("I feel helpless", "help", "general"),
+])
+def test_inflected_forms_match_their_keyword(classifier, message, keyword, intent):
+    assert keyword in classifier.matcher.find(message)
+    scan = classifier.scan(message)
+    assert scan.mental_health
+    if intent is not None:
+        assert scan.intent_hits[intent] > 0
+
+@pytest.mark.parametrize("message", [
+    "I keep panicking at night",
+    "I've been sleeping badly",
+    "I'm emotionally drained",
+    "everything is so stressful",
+    "I feel helpless",
+])
+def test_inflected_mental_health_messages_are_not_redirected(message):
+    intent, _, response = main.route_message(message)
+    assert intent != "redirect_to_mental_health"
+    assert response != main.REDIRECT_RESPONSE
+
+def test_keyword_inside_another_word_does_not_match(classifier):
+    assert classifier.matcher.find("The crusade continues tomorrow") == set()
+    assert main.route_message("The crusade continues tomorrow")[0] == "redirect_to_mental_health"
+
+@pytest.mark.parametrize("text, keyword", [
+    ("feelings", "feeling"),
+    ("stresses", "stress"),
+    ("balanced", "balance"),
+    ("I am coping", "coping"),
+    ("I coped", "cope"),
+    ("emptiness", "empty"),
+    ("loneliness", "lonely"),
+    ("anxieties", "anxiety"),
+    ("panicked", "panic"),
+    ("sadder", "sad"),
+    ("sadness", "sad"),
+    ("fearful", "fear"),
+    ("tiredness", "tired"),
+    ("low moods", "low mood"),
+])
+def test_spelling_changes_before_endings(classifier, text, keyword):
+    assert keyword in classifier.matcher.find(text)
+
+@pytest.mark.parametrize("text", ["crusade", "copy", "copying", "saddle", "helmet", "downtown", "sadist"])
+def test_unrelated_words_do_not_match(text):
+    matcher = KeywordMatcher({"words": ["sad", "cope", "help", "down"]})
+    assert matcher.find(text) == set()
+
+def test_phrase_counts_contained_keywords_once():
+    matcher = KeywordMatcher({"sleep": ["sleep", "can't sleep"], "other": ["sleep"]})
+    assert matcher.count("I can't sleep, sleep is gone, sleeping never works") == {"sleep": 2, "other": 1}
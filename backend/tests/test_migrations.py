@@ -0,0 +1,59 @@
+import os
+import threading
+from sqlalchemy import create_engine, text
+from migrations import MIGRATIONS, migrate
+
+def test_migrate_applies_every_version_once(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'fresh.db'}")
+
+    assert migrate(engine) == [version for version, _, _ in MIGRATIONS]
+    assert migrate(engine) == []
+    engine.dispose()
+
+def test_concurrent_workers_never_apply_a_migration_twice(tmp_path):
+    path = os.path.join(tmp_path, "shared.db")
+    engines = [create_engine(f"sqlite:///{path}") for _ in range(4)]
+    results, errors = [], []
+    start = threading.Barrier(len(engines))
+
+    def worker(engine):
+        start.wait()
+        try:
+            results.append(migrate(engine))
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=worker, args=(engine,)) for engine in engines]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    assert sorted(version for applied in results for version in applied) == [version for version, _, _ in MIGRATIONS]
+    with engines[0].connect() as conn:
+        recorded = [row[0] for row in conn.execute(text("SELECT version FROM schema_migrations ORDER BY version"))]
+    assert recorded == [version for version, _, _ in MIGRATIONS]
+    for engine in engines:
+        engine.dispose()
+
+def test_failed_migration_rolls_back(tmp_path, monkeypatch):
+    engine = create_engine(f"sqlite:///{tmp_path / 'failing.db'}")
+    migrate(engine)
+
+    def broken(conn):
+        conn.execute(text("CREATE TABLE half_done (id INTEGER)"))
+        raise RuntimeError("step failed")
+
+    monkeypatch.setattr("migrations.MIGRATIONS", MIGRATIONS + [(1000, "broken", broken)])
+    try:
+        migrate(engine)
+    except RuntimeError:
+        pass
+
+    with engine.connect() as conn:
+        tables = {row[0] for row in conn.execute(text("SELECT name FROM sqlite_master WHERE type = 'table'"))}
+        versions = {row[0] for row in conn.execute(text("SELECT version FROM schema_migrations"))}
+    assert "half_done" not in tables
+    assert 1000 not in versions
+    engine.dispose()
@@ -0,0 +1,70 @@
+import asyncio
+import time
+import uuid
+import httpx
+import pytest
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+import auth
+import database
+import main
+from auth import PasswordHasher
+from database import User
+
+HASH_SECONDS = 0.5
+
+@pytest.fixture
+async def one_connection_app(monkeypatch):
+    """The app with a single pooled connection and a 1 s pool timeout"""
+    engine = create_async_engine(
+        database.ASYNC_DATABASE_URL, poolclass=AsyncAdaptedQueuePool,
+        pool_size=1, max_overflow=0, pool_timeout=1
+    )
+    sessions = async_sessionmaker(bind=engine, autoflush=False, expire_on_commit=False)
+
+    async def get_async_db():
+        async with sessions() as db:
+            yield db
+
+    main.app.dependency_overrides[database.get_async_db] = get_async_db
+    # One bcrypt worker and room for two more waiting; each verify is slow
+    monkeypatch.setattr(auth, "password_hasher", PasswordHasher(workers=1, max_queue=2))
+    monkeypatch.setattr(auth, "verify_password", lambda plain, hashed: time.sleep(HASH_SECONDS) or True)
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        yield client, sessions
+    main.app.dependency_overrides.pop(database.get_async_db, None)
+    await engine.dispose()
+
+async def test_login_overload_is_shed_with_503_not_pool_timeouts(one_connection_app):
+    client, sessions = one_connection_app
+    email = f"{uuid.uuid4().hex}@example.com"
+    async with sessions() as db:
+        db.add(User(email=email, username=email.split("@")[0], hashed_password="stub"))
+        await db.commit()
+
+    responses = await asyncio.gather(*(
+        client.post("/auth/login", json={"email": email, "password": "pw"}) for _ in range(10)
+    ))
+
+    statuses = sorted(response.status_code for response in responses)
+    # One hashing and two queued get through, one after another, without
+    # anyone timing out on the single connection; the rest are shed
+    assert statuses == [200] * 3 + [503] * 7
+    assert all(r.headers["Retry-After"] == "1" for r in responses if r.status_code == 503)
+    assert auth.password_hasher.stats()["rejected"] == 7
+
+async def test_signup_overload_is_shed_with_503_not_pool_timeouts(one_connection_app, monkeypatch):
+    client, _ = one_connection_app
+    monkeypatch.setattr(auth, "get_password_hash", lambda password: time.sleep(HASH_SECONDS) or "stub")
+    prefix = uuid.uuid4().hex[:8]
+
+    responses = await asyncio.gather(*(
+        client.post("/auth/register", json={
+            "email": f"{prefix}{i}@example.com", "fullname": "Test User",
+            "password": "password1", "confirm_password": "password1"
+        })
+        for i in range(10)
+    ))
+
+    assert sorted(response.status_code for response in responses) == [200] * 3 + [503] * 7
@@ -0,0 +1,68 @@
+from datetime import datetime
+import pytest
+from sqlalchemy import create_engine, event
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from migrations import migrate
+from services import AssessmentService, ConversationService, VideoService
+
+@pytest.fixture
+async def plans(tmp_path):
+    """Runs a service query and returns EXPLAIN QUERY PLAN details of what it executed"""
+    path = tmp_path / "plans.db"
+    engine = create_engine(f"sqlite:///{path}")
+    migrate(engine)
+    async_engine = create_async_engine(f"sqlite+aiosqlite:///{path}")
+    statements = []
+
+    @event.listens_for(async_engine.sync_engine, "before_cursor_execute")
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        statements.append((statement, parameters))
+
+    async def explain(query, *args, **kwargs):
+        statements.clear()
+        async with AsyncSession(async_engine) as db:
+            await query(db, *args, **kwargs)
+        assert len(statements) == 1
+        statement, parameters = statements[0]
+        with engine.connect() as conn:
+            rows = conn.exec_driver_sql("EXPLAIN QUERY PLAN " + statement, parameters).all()
+        return [row[-1] for row in rows]
+
+    yield explain
+    await async_engine.dispose()
+    engine.dispose()
+
+def assert_uses_index(details, index):
+    assert any(f"INDEX {index} " in detail for detail in details), details
+    assert not any("TEMP B-TREE" in detail for detail in details), details
+
+async def test_conversation_page_uses_user_created_index(plans):
+    details = await plans(ConversationService.get_user_conversations_page_async, 1, 50)
+    assert_uses_index(details, "ix_conversations_user_created")
+
+async def test_conversation_page_with_cursor_uses_user_created_index(plans):
+    details = await plans(
+        ConversationService.get_user_conversations_page_async, 1, 50,
+        before=(str(datetime.utcnow()), 100)
+    )
+    assert_uses_index(details, "ix_conversations_user_created")
+
+async def test_session_conversation_page_uses_user_session_created_index(plans):
+    details = await plans(ConversationService.get_user_conversations_page_async, 1, 50, session_id="s")
+    assert_uses_index(details, "ix_conversations_user_session_created")
+
+async def test_session_turns_use_user_session_created_index(plans):
+    details = await plans(ConversationService.get_user_conversations_async, 1, 10, session_id="s")
+    assert_uses_index(details, "ix_conversations_user_session_created")
+
+async def test_assessment_history_uses_user_created_index(plans):
+    details = await plans(AssessmentService.get_user_assessments_async, 1, 10)
+    assert_uses_index(details, "ix_assessments_user_created")
+
+async def test_latest_assessment_uses_user_created_index(plans):
+    details = await plans(AssessmentService.get_latest_assessment_async, 1)
+    assert_uses_index(details, "ix_assessments_user_created")
+
+async def test_cached_search_uses_query_rank_index(plans):
+    details = await plans(VideoService.get_cached_search_async, "calm music", 5, 3600)
+    assert_uses_index(details, "ix_video_search_results_query_rank")
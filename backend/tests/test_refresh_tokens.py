@@ -0,0 +1,100 @@
+from datetime import datetime, timedelta
+import uuid
+import httpx
+import pytest
+from sqlalchemy import func, select, update
+import main
+from auth import _hash_refresh_token, purge_refresh_tokens_async
+from database import AsyncSessionLocal, RefreshToken, User
+
+@pytest.fixture
+async def client():
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        yield client
+
+@pytest.fixture
+async def login(client):
+    """Register a fresh user and return their login response"""
+    email = f"{uuid.uuid4().hex}@example.com"
+    response = await client.post("/auth/register", json={
+        "email": email, "fullname": "Test User", "password": "password1", "confirm_password": "password1"
+    })
+    assert response.status_code == 200
+    return response.json()
+
+async def refresh(client, token):
+    return await client.post("/auth/refresh", json={"refresh_token": token})
+
+async def set_token(token, **values):
+    async with AsyncSessionLocal() as db:
+        await db.execute(update(RefreshToken).where(RefreshToken.token_hash == _hash_refresh_token(token)).values(**values))
+        await db.commit()
+
+async def token_rows(family_of):
+    async with AsyncSessionLocal() as db:
+        family = (await db.execute(
+            select(RefreshToken.family_id).where(RefreshToken.token_hash == _hash_refresh_token(family_of))
+        )).scalar()
+        return (await db.execute(
+            select(func.count()).select_from(RefreshToken).where(RefreshToken.family_id == family)
+        )).scalar()
+
+async def test_refresh_rotates_the_token(client, login):
+    response = await refresh(client, login["refresh_token"])
+
+    assert response.status_code == 200
+    body = response.json()
+    assert body["refresh_token"] != login["refresh_token"]
+    assert body["access_token"]
+    assert (await refresh(client, body["refresh_token"])).status_code == 200
+
+async def test_reusing_a_rotated_token_revokes_the_whole_family(client, login):
+    rotated = (await refresh(client, login["refresh_token"])).json()["refresh_token"]
+
+    assert (await refresh(client, login["refresh_token"])).status_code == 401
+    # The legitimate holder's newer token is revoked along with it
+    assert (await refresh(client, rotated)).status_code == 401
+
+async def test_expired_token_is_rejected(client, login):
+    await set_token(login["refresh_token"], expires_at=datetime.utcnow() - timedelta(seconds=1))
+    assert (await refresh(client, login["refresh_token"])).status_code == 401
+
+async def test_inactive_user_cannot_refresh(client, login):
+    async with AsyncSessionLocal() as db:
+        await db.execute(update(User).where(User.id == login["user"]["id"]).values(is_active=False))
+        await db.commit()
+    assert (await refresh(client, login["refresh_token"])).status_code == 401
+
+async def test_unknown_token_is_rejected(client):
+    assert (await refresh(client, "not-a-token")).status_code == 401
+
+async def test_logout_revokes_the_family(client, login):
+    rotated = (await refresh(client, login["refresh_token"])).json()["refresh_token"]
+
+    response = await client.post("/auth/logout", json={"refresh_token": rotated})
+
+    assert response.status_code == 200
+    assert (await refresh(client, rotated)).status_code == 401
+    # Logging out with an unknown token is not an error
+    assert (await client.post("/auth/logout", json={"refresh_token": "not-a-token"})).status_code == 200
+
+async def test_purge_drops_dead_families_and_expired_tokens(client, login):
+    # A live family: its used token must stay so that reuse is still caught
+    live_used = login["refresh_token"]
+    live = (await refresh(client, live_used)).json()["refresh_token"]
+    # A family revoked by logout
+    other = (await client.post("/auth/login", json={"email": login["user"]["email"], "password": "password1"})).json()
+    await client.post("/auth/logout", json={"refresh_token": other["refresh_token"]})
+    # A family whose only token expired
+    expired = (await client.post("/auth/login", json={"email": login["user"]["email"], "password": "password1"})).json()
+    await set_token(expired["refresh_token"], expires_at=datetime.utcnow() - timedelta(seconds=1))
+
+    async with AsyncSessionLocal() as db:
+        await purge_refresh_tokens_async(db)
+
+    assert await token_rows(live_used) == 2
+    assert await token_rows(other["refresh_token"]) == 0
+    assert await token_rows(expired["refresh_token"]) == 0
+    assert (await refresh(client, live_used)).status_code == 401
+    assert (await refresh(client, live)).status_code == 401
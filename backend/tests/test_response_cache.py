@@ -0,0 +1,85 @@
+import pytest
+from response_cache import ResponseCache
+
+NEGATED_PAIRS = [
+    ("I'm not happy", "I'm happy"),
+    ("I am not okay with how work is going lately", "I am okay with how work is going lately"),
+    ("I can't sleep at night anymore", "I can sleep at night anymore"),
+    ("I cannot stop worrying about my exams", "I can stop worrying about my exams"),
+    ("I don't feel safe at home right now", "I do feel safe at home right now"),
+    ("there is no one I can talk to about this", "there is one I can talk to about this"),
+    ("I never feel rested when I wake up in the morning", "I feel rested when I wake up in the morning"),
+    ("nothing makes me happy these days", "everything makes me happy these days"),
+]
+
+@pytest.mark.parametrize("negated, plain", NEGATED_PAIRS)
+def test_negated_message_never_matches_its_plain_form(negated, plain):
+    cache = ResponseCache(threshold=0.0)
+    assert cache.normalize(negated) != cache.normalize(plain)
+
+    cache.set(plain, "plain reply", 1.0)
+    assert cache.get(negated) is None
+
+    cache = ResponseCache(threshold=0.0)
+    cache.set(negated, "negated reply", 1.0)
+    assert cache.get(plain) is None
+
+def test_function_words_and_single_letters_are_kept():
+    assert ResponseCache.normalize("I am with you") == "i am with you"
+    assert ResponseCache.normalize("Is it me?") == "is it me"
+
+@pytest.mark.parametrize("a, b", [
+    ("I can't sleep", "I cannot sleep"),
+    ("I don't know", "I dont know"),
+    ("I won’t go", "I will not go"),
+    ("I feel off today", "i feel off today!"),
+    ("feeling stressed", "feel stress"),
+])
+def test_equivalent_spellings_share_a_fingerprint(a, b):
+    assert ResponseCache.normalize(a) == ResponseCache.normalize(b)
+
+def test_exact_and_similar_hits():
+    cache = ResponseCache(threshold=0.8)
+    cache.set("I feel stressed about my job and my boss", "reply", 2.0)
+
+    assert cache.get("i feel stressed about my job and my boss!") == "reply"
+    assert cache.get("I feel stressed about my job and my boss today") == "reply"
+    assert cache.get("what is the weather like") is None
+
+    stats = cache.stats()
+    assert (stats["lookups"], stats["exact_hits"], stats["similar_hits"]) == (3, 1, 1)
+    assert stats["saved_seconds"] == 4.0
+
+def test_rephrasing_with_fewer_function_words_hits_at_the_default_threshold():
+    cache = ResponseCache()
+    cache.set("i feel off today", "reply", 1.0)
+
+    assert cache.get("feeling off today") == "reply"
+    assert cache.get("I don't feel off today") is None
+    assert cache.get("i feel sad today") is None
+    assert cache.stats()["similar_hits"] == 1
+
+def test_similar_match_requires_the_same_negations():
+    cache = ResponseCache(threshold=0.5)
+    cache.set("I do not want to go to work tomorrow morning", "negated", 1.0)
+    cache.set("I want to go to work tomorrow morning", "plain", 1.0)
+
+    assert cache.get("I really do not want to go to work tomorrow morning") == "negated"
+    assert cache.get("I really want to go to work tomorrow morning") == "plain"
+
+def test_index_is_not_rebuilt_when_lookups_only_reorder_entries():
+    cache = ResponseCache(threshold=0.5)
+    for i in range(5):
+        cache.set(f"message number {i} about feeling tired", f"reply {i}", 1.0)
+
+    cache.get("message number 0 about feeling tired today")
+    index = cache._index
+    for i in [3, 1, 4, 0, 2]:
+        assert cache.get(f"message number {i} about feeling tired") == f"reply {i}"
+        cache.get(f"message number {i} about feeling tired today")
+    assert cache._index is index
+
+    cache.set("a brand new message", "new", 1.0)
+    cache.get("a brand new message today")
+    assert cache._index is not index
+    assert len(cache._index.keys) == 6
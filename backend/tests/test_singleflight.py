@@ -0,0 +1,131 @@
+import asyncio
+import time
+import uuid
+import pytest
+import main
+from singleflight import SingleFlight
+
+class Upstream:
+    """Counts its calls; each call waits until released"""
+
+    def __init__(self, result="value", error: Exception = None):
+        self.result = result
+        self.error = error
+        self.calls = 0
+        self.release = asyncio.Event()
+
+    async def __call__(self, *args):
+        self.calls += 1
+        await self.release.wait()
+        if self.error is not None:
+            raise self.error
+        return self.result
+
+class SlowModel:
+    """Stand-in Gemini model that counts its calls and answers after a delay"""
+
+    class Response:
+        text = "a shared reply"
+
+    def __init__(self):
+        self.calls = 0
+
+    def generate_content(self, prompt, stream=False):
+        self.calls += 1
+        time.sleep(0.2)
+        return self.Response()
+
+async def start_waiters(flight: SingleFlight, upstream: Upstream, count: int, key="key"):
+    tasks = [asyncio.ensure_future(flight.do(key, upstream)) for _ in range(count)]
+    # Let every waiter reach the shared call
+    await asyncio.sleep(0)
+    return tasks
+
+async def test_concurrent_identical_calls_share_one_upstream_call():
+    flight = SingleFlight()
+    upstream = Upstream()
+
+    tasks = await start_waiters(flight, upstream, 500)
+    upstream.release.set()
+    results = await asyncio.gather(*tasks)
+
+    assert upstream.calls == 1
+    assert results == ["value"] * 500
+    assert flight.stats() == {"in_flight": 0, "calls": 1, "coalesced": 499}
+
+async def test_different_keys_are_not_coalesced():
+    flight = SingleFlight()
+    upstream = Upstream()
+
+    tasks = [asyncio.ensure_future(flight.do(key, upstream)) for key in ("a", "b")]
+    await asyncio.sleep(0)
+    upstream.release.set()
+    await asyncio.gather(*tasks)
+
+    assert upstream.calls == 2
+
+async def test_error_is_raised_to_every_waiter():
+    flight = SingleFlight()
+    upstream = Upstream(error=RuntimeError("upstream down"))
+
+    tasks = await start_waiters(flight, upstream, 50)
+    upstream.release.set()
+    results = await asyncio.gather(*tasks, return_exceptions=True)
+
+    assert upstream.calls == 1
+    assert all(isinstance(result, RuntimeError) for result in results)
+    assert len({id(result) for result in results}) == 1
+
+async def test_error_is_not_remembered():
+    flight = SingleFlight()
+    failing = Upstream(error=RuntimeError("upstream down"))
+    failing.release.set()
+    with pytest.raises(RuntimeError):
+        await flight.do("key", failing)
+
+    working = Upstream()
+    working.release.set()
+    assert await flight.do("key", working) == "value"
+
+async def test_cancelling_one_waiter_leaves_the_others_running():
+    flight = SingleFlight()
+    upstream = Upstream()
+
+    tasks = await start_waiters(flight, upstream, 10)
+    tasks[0].cancel()
+    await asyncio.sleep(0)
+    upstream.release.set()
+    results = await asyncio.gather(*tasks[1:])
+
+    assert tasks[0].cancelled()
+    assert results == ["value"] * 9
+    assert upstream.calls == 1
+
+async def test_cancelling_every_waiter_does_not_cancel_the_call():
+    flight = SingleFlight()
+    upstream = Upstream()
+
+    tasks = await start_waiters(flight, upstream, 3)
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+    # A caller arriving later joins the call that is still running
+    late = asyncio.ensure_future(flight.do("key", upstream))
+    await asyncio.sleep(0)
+    upstream.release.set()
+    assert await late == "value"
+    assert upstream.calls == 1
+
+async def test_concurrent_identical_chat_messages_make_one_gemini_call(monkeypatch):
+    monkeypatch.setenv("GEMINI_API_KEY", "test-key")
+    monkeypatch.setattr(main.background_writer, "submit", lambda job, *args: None)
+    service = main.GeminiService()
+    service.model = SlowModel()
+    message = f"I feel lost {uuid.uuid4().hex}"
+
+    replies = await asyncio.gather(*(service.get_mental_health_response(message) for _ in range(500)))
+
+    assert service.model.calls == 1
+    assert replies == ["a shared reply"] * 500
+    assert service.inflight.stats() == {"in_flight": 0, "calls": 1, "coalesced": 499}
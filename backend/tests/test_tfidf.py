@@ -0,0 +1,34 @@
+import os
+import numpy as np
+from intent_classifier import VERIFY_CORPUS, IntentClassifier, load_artifact, save_artifact, verify
+
+def test_transform_matches_scikit_learn_on_verify_corpus():
+    assert verify(IntentClassifier(), VERIFY_CORPUS) <= 1e-12
+
+def test_transform_matches_scikit_learn_on_training_texts():
+    classifier = IntentClassifier()
+    assert verify(classifier, classifier.training_texts + ["I'm ANXIOUS and Stressed", "café naïve"]) <= 1e-12
+
+def test_artifact_round_trip_scores_like_a_fresh_fit(tmp_path):
+    classifier = IntentClassifier()
+    path = os.path.join(tmp_path, "intent_model")
+    save_artifact(classifier, path)
+
+    loaded = load_artifact(path, classifier.fingerprint)
+    fitted = classifier.fit()
+
+    texts = [text.lower() for text in VERIFY_CORPUS]
+    assert loaded["vocabulary"] == fitted["vocabulary"]
+    np.testing.assert_array_equal(
+        loaded["tfidf"].transform(texts).toarray(), fitted["tfidf"].transform(texts).toarray()
+    )
+
+def test_corrupt_artifact_is_rejected(tmp_path):
+    classifier = IntentClassifier()
+    path = os.path.join(tmp_path, "intent_model")
+    save_artifact(classifier, path)
+    with open(path + ".npz", "r+b") as f:
+        f.seek(100)
+        f.write(b"corrupt")
+
+    assert load_artifact(path, classifier.fingerprint) is None
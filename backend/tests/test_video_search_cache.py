@@ -0,0 +1,62 @@
+from datetime import datetime
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import Session
+from migrations import MIGRATIONS, migrate
+from services import VideoService
+
+def video(video_id):
+    return {
+        "id": video_id, "title": f"Video {video_id}", "description": "", "thumbnail": "",
+        "url": f"https://www.youtube.com/watch?v={video_id}", "channel": "Channel"
+    }
+
+@pytest.fixture
+def db(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'videos.db'}")
+    migrate(engine)
+    with Session(engine) as session:
+        yield session
+    engine.dispose()
+
+def cached_ids(db, query, max_results=2):
+    videos = VideoService.get_cached_search(db, query, max_results, 3600)
+    return None if videos is None else [v["id"] for v in videos]
+
+def test_overlapping_searches_keep_their_own_results(db):
+    VideoService.save_search_results(db, "calm", [video("a"), video("shared")], "anxiety")
+    VideoService.save_search_results(db, "sleep", [video("shared"), video("b")], "sleep")
+
+    assert cached_ids(db, "calm") == ["a", "shared"]
+    assert cached_ids(db, "sleep") == ["shared", "b"]
+
+def test_new_results_replace_the_query_previous_ones(db):
+    VideoService.save_search_results(db, "calm", [video("a"), video("b")], "anxiety")
+    VideoService.save_search_results(db, "calm", [video("c"), video("a")], "anxiety")
+
+    assert cached_ids(db, "calm") == ["c", "a"]
+    assert cached_ids(db, "calm", 3) is None
+
+def test_partial_or_stale_results_are_a_miss(db):
+    VideoService.save_search_results(db, "calm", [video("a")], "anxiety")
+
+    assert cached_ids(db, "calm") is None
+    assert VideoService.get_cached_search(db, "calm", 1, 0) is None
+    assert cached_ids(db, "calm", 1) == ["a"]
+
+def test_migration_carries_over_the_old_search_columns(tmp_path, monkeypatch):
+    engine = create_engine(f"sqlite:///{tmp_path / 'old.db'}")
+    monkeypatch.setattr("migrations.MIGRATIONS", [m for m in MIGRATIONS if m[0] < 9])
+    migrate(engine)
+    with engine.begin() as conn:
+        conn.execute(text(
+            "INSERT INTO video_recommendations (video_id, title, youtube_url, intent_category, is_active, "
+            "search_query, search_rank, cached_at) VALUES "
+            "('a', 'A', 'u', 'anxiety', 1, 'calm', 0, :now), ('b', 'B', 'u', 'anxiety', 1, 'calm', 1, :now)"
+        ), {"now": datetime.utcnow()})
+
+    monkeypatch.setattr("migrations.MIGRATIONS", MIGRATIONS)
+    assert migrate(engine) == [9]
+    with Session(engine) as db:
+        assert cached_ids(db, "calm") == ["a", "b"]
+    engine.dispose()
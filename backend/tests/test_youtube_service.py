@@ -0,0 +1,141 @@
+import asyncio
+import sys
+import time
+import uuid
+import httpx
+import pytest
+import main
+
+STUB_BASE_URL = "http://youtube.stub/youtube/v3"
+
+def search_payload(count: int = 3) -> dict:
+    return {"items": [
+        {
+            "id": {"videoId": f"vid{i}"},
+            "snippet": {
+                "title": f"Video {i}",
+                "description": "A calming video",
+                "thumbnails": {"medium": {"url": f"https://img.stub/{i}.jpg"}},
+                "channelTitle": "Stub Channel"
+            }
+        }
+        for i in range(count)
+    ]}
+
+class StubApi:
+    """Stub YouTube API: replies with the queued responses in order, then with results"""
+
+    def __init__(self, *responses):
+        self.responses = list(responses)
+        self.requests = []
+
+    def __call__(self, request: httpx.Request) -> httpx.Response:
+        self.requests.append(request)
+        if self.responses:
+            response = self.responses.pop(0)
+            if isinstance(response, Exception):
+                raise response
+            return response
+        return httpx.Response(200, json=search_payload())
+
+@pytest.fixture
+async def make_service(monkeypatch):
+    monkeypatch.setenv("YOUTUBE_API_KEY", "test-key")
+    monkeypatch.setenv("YOUTUBE_API_BASE_URL", STUB_BASE_URL)
+    monkeypatch.setenv("YOUTUBE_MAX_RETRIES", "2")
+    services = []
+
+    def make(stub: StubApi) -> main.YouTubeService:
+        service = main.YouTubeService(transport=httpx.MockTransport(stub))
+        services.append(service)
+        return service
+
+    yield make
+    for service in services:
+        await service.aclose()
+
+def unique_query() -> str:
+    return f"calm {uuid.uuid4().hex}"
+
+async def test_search_calls_stub_and_parses_results(make_service):
+    stub = StubApi()
+    service = make_service(stub)
+    query = unique_query()
+
+    videos = await service.search_videos(query, 3)
+
+    assert [video["id"] for video in videos] == ["vid0", "vid1", "vid2"]
+    assert videos[0]["url"] == "https://www.youtube.com/watch?v=vid0"
+    assert videos[0]["thumbnail"] == "https://img.stub/0.jpg"
+    assert len(stub.requests) == 1
+    request = stub.requests[0]
+    assert request.url.path == "/youtube/v3/search"
+    assert request.url.params["key"] == "test-key"
+    assert request.url.params["maxResults"] == "3"
+    assert request.url.params["q"].startswith(query)
+
+@pytest.mark.parametrize("status_code", [429, 503])
+async def test_retries_transient_status_with_backoff(make_service, status_code):
+    stub = StubApi(httpx.Response(status_code), httpx.Response(status_code))
+    service = make_service(stub)
+
+    started = time.perf_counter()
+    videos = await service.search_videos(unique_query(), 3)
+
+    assert len(videos) == 3 and videos[0]["id"] == "vid0"
+    assert len(stub.requests) == 3
+    # Backoff of 0.2 s then 0.4 s between the attempts
+    assert time.perf_counter() - started >= 0.6
+
+async def test_transport_error_falls_back_to_mock_videos(make_service):
+    stub = StubApi(*[httpx.ConnectError("connection refused")] * 3)
+    service = make_service(stub)
+    query = unique_query()
+
+    videos = await service.search_videos(query, 3)
+
+    assert videos == service._get_mock_videos(query)
+    assert len(stub.requests) == 3
+
+async def test_persistent_5xx_falls_back_to_mock_videos(make_service):
+    stub = StubApi(*[httpx.Response(500)] * 3)
+    service = make_service(stub)
+    query = unique_query()
+
+    assert await service.search_videos(query, 3) == service._get_mock_videos(query)
+
+async def test_startup_makes_no_discovery_request(make_service):
+    stub = StubApi()
+    make_service(stub)
+
+    assert stub.requests == []
+    assert "googleapiclient" not in sys.modules
+
+async def test_videos_are_persisted_only_when_fetched_from_the_api(make_service, monkeypatch):
+    stub = StubApi()
+    service = make_service(stub)
+    monkeypatch.setattr(main, "youtube_service", service)
+    saved = []
+    monkeypatch.setattr(main.background_writer, "submit", lambda job, *args: saved.append(job.__name__))
+    query = unique_query()
+    monkeypatch.setattr(main.intent_classifier, "get_video_keywords", lambda intent: [query])
+
+    first = await main.get_intent_videos("anxiety")
+    second = await main.get_intent_videos("anxiety")
+
+    assert first == second
+    assert len(stub.requests) == 1
+    assert saved == ["save_search_results"]
+
+async def test_concurrent_identical_searches_make_one_api_call(make_service, monkeypatch):
+    stub = StubApi()
+    service = make_service(stub)
+    monkeypatch.setattr(main.background_writer, "submit", lambda job, *args: None)
+    query = unique_query()
+
+    results = await asyncio.gather(*(service.search_videos(query, 3) for _ in range(500)))
+
+    assert len(stub.requests) == 1
+    assert service.api_calls == 1
+    assert all([video["id"] for video in videos] == ["vid0", "vid1", "vid2"] for videos in results)
+    assert service.inflight.stats() == {"in_flight": 0, "calls": 1, "coalesced": 499}
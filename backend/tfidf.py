@@ -0,0 +1,64 @@
+from typing import Dict, Iterable, List, Tuple
+import re
+import numpy as np
+from scipy import sparse
+
+# Same default token pattern as scikit-learn's CountVectorizer
+TOKEN_PATTERN = re.compile(r"(?u)\b\w\w+\b")
+
+class TfidfModel:
+    """Inference-only TF-IDF transform matching a fitted TfidfVectorizer.
+
+    Reproduces TfidfVectorizer(stop_words=..., ngram_range=...) with its
+    defaults (lowercase, word analyzer, raw term counts, smoothed idf, L2
+    norm) from the fitted vocabulary, idf weights and stop-word list, so
+    scikit-learn is only needed to fit the model.
+    """
+
+    def __init__(self, vocabulary: List[str], idf: np.ndarray,
+                 stop_words: Iterable[str], ngram_range: Tuple[int, int] = (1, 1)):
+        self.vocabulary: Dict[str, int] = {term: column for column, term in enumerate(vocabulary)}
+        self.idf = np.asarray(idf, dtype=np.float64)
+        self.stop_words = frozenset(stop_words)
+        self.ngram_range = tuple(ngram_range)
+
+    def analyze(self, text: str) -> List[str]:
+        """Terms of a text: stop-word-filtered tokens joined into n-grams"""
+        tokens = [token for token in TOKEN_PATTERN.findall(text.lower()) if token not in self.stop_words]
+        min_n, max_n = self.ngram_range
+        terms = list(tokens) if min_n == 1 else []
+        for n in range(max(min_n, 2), max_n + 1):
+            terms.extend(" ".join(tokens[i:i + n]) for i in range(len(tokens) - n + 1))
+        return terms
+
+    def transform(self, texts: List[str]) -> sparse.csr_matrix:
+        """L2-normalized TF-IDF rows, one per text"""
+        indptr = [0]
+        indices: List[int] = []
+        counts: List[int] = []
+        for text in texts:
+            row: Dict[int, int] = {}
+            for term in self.analyze(text):
+                column = self.vocabulary.get(term)
+                if column is not None:
+                    row[column] = row.get(column, 0) + 1
+            for column in sorted(row):
+                indices.append(column)
+                counts.append(row[column])
+            indptr.append(len(indices))
+
+        indices_array = np.array(indices, dtype=np.int64)
+        data = np.array(counts, dtype=np.float64) * self.idf[indices_array]
+
+        # Row-wise L2 norm; rows with no known terms stay all-zero
+        squares = np.zeros(len(texts))
+        row_ids = np.repeat(np.arange(len(texts)), np.diff(indptr))
+        np.add.at(squares, row_ids, data ** 2)
+        norms = np.sqrt(squares)
+        norms[norms == 0] = 1.0
+        data /= norms[row_ids]
+
+        return sparse.csr_matrix(
+            (data, indices_array, np.array(indptr, dtype=np.int64)),
+            shape=(len(texts), len(self.vocabulary))
+        )
@@ -5,6 +5,7 @@ import {
   handleSignup as apiSignup, 
   getUserData as getStoredUserData,
   clearAuthData,
+  revokeRefreshToken,
   setAuthData,
   isAuthenticated as checkAuth,
   type User
@@ -94,6 +95,7 @@ export const AuthProvider: React.FC<AuthProviderProps> = ({ children }) => {
   };
 
   const logout = () => {
+    revokeRefreshToken();
     clearAuthData();
     setUser(null);
   };
@@ -15,14 +15,50 @@ axios.interceptors.request.use(
   }
 );
 
+// One refresh at a time; concurrent 401s wait for the same attempt
+let refreshPromise: Promise<string | null> | null = null;
+
+const refreshAccessToken = (): Promise<string | null> => {
+  if (!refreshPromise) {
+    refreshPromise = (async () => {
+      const refreshToken = localStorage.getItem('refresh_token');
+      if (!refreshToken) {
+        return null;
+      }
+      try {
+        const response = await axios.post<AuthResponse>(`${API_BASE_URL}/auth/refresh`, {
+          refresh_token: refreshToken
+        });
+        setAuthData(response.data);
+        return response.data.access_token;
+      } catch {
+        return null;
+      } finally {
+        refreshPromise = null;
+      }
+    })();
+  }
+  return refreshPromise;
+};
+
 // Configure axios to handle auth errors
 axios.interceptors.response.use(
   (response) => response,
-  (error) => {
-    if (error.response?.status === 401) {
+  async (error) => {
+    const original = error.config;
+    const isRefreshCall = original?.url?.endsWith('/auth/refresh');
+    if (error.response?.status === 401 && original && !original._retried && !isRefreshCall) {
+      // Access token expired: renew it with the refresh token and retry once
+      original._retried = true;
+      const accessToken = await refreshAccessToken();
+      if (accessToken) {
+        original.headers.Authorization = `Bearer ${accessToken}`;
+        return axios(original);
+      }
+    }
+    if (error.response?.status === 401 && !isRefreshCall) {
       // Token is invalid, clear auth data and redirect to login
-      localStorage.removeItem('auth_token');
-      localStorage.removeItem('user_data');
+      clearAuthData();
       window.location.href = '/login';
     }
     return Promise.reject(error);
@@ -44,6 +80,7 @@ export interface AuthResponse {
   access_token: string;
   token_type: string;
   user: User;
+  refresh_token?: string;
 }
 
 export interface SignupRequest {
@@ -95,8 +132,19 @@ export interface VideoSearchRequest {
 
 export const chatApi = {
   async sendMessage(request: ChatRequest): Promise<ChatResponse> {
-    const response = await axios.post<ChatResponse>(`${API_BASE_URL}/chat`, request);
-    return response.data;
+    // Same key on every attempt, so a retried message is answered and stored only once
+    const config = { headers: { 'Idempotency-Key': crypto.randomUUID() } };
+    try {
+      const response = await axios.post<ChatResponse>(`${API_BASE_URL}/chat`, request, config);
+      return response.data;
+    } catch (error) {
+      // No response at all (network hiccup): the server may still have processed it
+      if (axios.isAxiosError(error) && !error.response) {
+        const response = await axios.post<ChatResponse>(`${API_BASE_URL}/chat`, request, config);
+        return response.data;
+      }
+      throw error;
+    }
   },
 
   async searchVideos(request: VideoSearchRequest): Promise<{ videos: Video[] }> {
@@ -152,7 +200,16 @@ export const handleLogin = async (email: string, password: string): Promise<{ su
     return { success: false, error: errorMessage };
   }
 };
+// Revoke the stored refresh token server-side; failures are not fatal to logout
+export const revokeRefreshToken = (): void => {
+  const refreshToken = localStorage.getItem('refresh_token');
+  if (refreshToken) {
+    axios.post(`${API_BASE_URL}/auth/logout`, { refresh_token: refreshToken }).catch(() => {});
+  }
+};
+
 export const handleLogout = (): void => {
+  revokeRefreshToken();
   clearAuthData();
   window.location.href = '/login';
 };
@@ -180,9 +237,13 @@ export const getAuthToken = (): string | null => {
 export const setAuthData = (authResponse: AuthResponse): void => {
   localStorage.setItem('auth_token', authResponse.access_token);
   localStorage.setItem('user_data', JSON.stringify(authResponse.user));
+  if (authResponse.refresh_token) {
+    localStorage.setItem('refresh_token', authResponse.refresh_token);
+  }
 };
 
 export const clearAuthData = (): void => {
   localStorage.removeItem('auth_token');
   localStorage.removeItem('user_data');
+  localStorage.removeItem('refresh_token');
 };
\ No newline at end of file